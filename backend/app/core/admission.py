@@ -0,0 +1,150 @@
+import uuid
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional, Tuple
+from fastapi import HTTPException, status
+from core.authguard import extract_token
+from core.config import settings
+from core.redis_config import run_redis_command
+from core.request_context import CURRENT_REQUEST
+from core.security import decode_token
+
+RATE_LIMIT_KEY = "limite:{classe}:{usuario}"  # HASH (tokens, ts) do balde de um usuário
+SLOTS_KEY = "limite:calculos:{prefixo}"  # ZSET com os cálculos em andamento de um KPI (vaga -> início)
+
+# Balde de tokens: reposição contínua de `taxa` tokens/s até `capacidade`. Lido e gravado no
+# Redis em um único script (atômico entre os workers), com o relógio do próprio Redis.
+TOKEN_BUCKET_LUA = """
+local taxa, capacidade, custo = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+local agora = redis.call('TIME')
+agora = tonumber(agora[1]) + tonumber(agora[2]) / 1000000
+local estado = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(estado[1]) or capacidade
+local ts = tonumber(estado[2]) or agora
+tokens = math.min(capacidade, tokens + math.max(0, agora - ts) * taxa)
+local espera = 0
+if tokens >= custo then
+    tokens = tokens - custo
+else
+    espera = (custo - tokens) / taxa
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(agora))
+redis.call('EXPIRE', KEYS[1], math.ceil(capacidade / taxa) + 1)
+return tostring(espera)
+"""
+
+# Semáforo: uma vaga por cálculo em andamento. Vagas mais velhas que o lease (worker que morreu
+# no meio do cálculo) são descartadas antes de contar.
+ACQUIRE_SLOT_LUA = """
+local limite, lease, vaga = tonumber(ARGV[1]), tonumber(ARGV[2]), ARGV[3]
+local agora = redis.call('TIME')
+agora = tonumber(agora[1]) + tonumber(agora[2]) / 1000000
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', agora - lease)
+if redis.call('ZCARD', KEYS[1]) >= limite then
+    return 0
+end
+redis.call('ZADD', KEYS[1], agora, vaga)
+redis.call('EXPIRE', KEYS[1], math.ceil(lease))
+return 1
+"""
+
+
+# Classes de endpoint do balde: (tokens por segundo, capacidade)
+def rate_classes() -> Dict[str, Tuple[float, int]]:
+    return {
+        "kpi": (settings.RATE_LIMIT_KPI_PER_SECOND, settings.RATE_LIMIT_KPI_BURST),
+        "busca": (settings.RATE_LIMIT_BUSCA_PER_SECOND, settings.RATE_LIMIT_BUSCA_BURST),
+    }
+
+
+class AdmissionDenied(Exception):
+    # Recusa do controle de admissão: 429 (balde do usuário vazio) ou 503 (KPI saturado)
+    def __init__(self, status_code: int, detail: str, retry_after: float):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.retry_after = max(1, int(retry_after + 0.999))
+
+    def to_http(self) -> HTTPException:
+        return HTTPException(
+            status_code=self.status_code,
+            detail=self.detail,
+            headers={"Retry-After": str(self.retry_after)},
+        )
+
+
+def request_user_key() -> Optional[str]:
+    # Usuário do JWT da requisição corrente, sem ir ao banco; None fora de requisição (aquecedor)
+    request = CURRENT_REQUEST.get()
+    token = extract_token(request) if request is not None else None
+    payload = decode_token(token) if token else None
+    user_id = payload.get("user_id") if payload else None
+    return str(user_id) if user_id is not None else None
+
+
+def check_rate(usuario: Optional[str], classe: str, custo: int = 1):
+    # Consome `custo` tokens do balde do usuário na classe. Sem usuário ou sem Redis, deixa passar:
+    # o limitador protege o banco de excesso de uso, não é autenticação
+    if not settings.ADMISSION_ENABLED or usuario is None:
+        return
+    taxa, capacidade = rate_classes()[classe]
+    # Um lote que custa mais que o balde inteiro nunca seria admitido (os tokens param na
+    # capacidade): cobra o balde cheio, e o usuário espera a reposição completa para o próximo
+    custo = min(custo, capacidade)
+    key = RATE_LIMIT_KEY.format(classe=classe, usuario=usuario)
+    espera = run_redis_command(lambda r: r.eval(TOKEN_BUCKET_LUA, 1, key, taxa, capacidade, custo))
+    if espera is not None and float(espera) > 0:
+        raise AdmissionDenied(
+            status.HTTP_429_TOO_MANY_REQUESTS,
+            "Limite de consultas excedido. Tente novamente em instantes.",
+            float(espera),
+        )
+
+
+def acquire_slot(cache_key_prefix: str) -> Optional[str]:
+    # Reserva uma vaga de cálculo do KPI; None sem Redis (segue sem limite de concorrência)
+    if not settings.ADMISSION_ENABLED:
+        return None
+    vaga = uuid.uuid4().hex
+    key = SLOTS_KEY.format(prefixo=cache_key_prefix)
+    acquired = run_redis_command(lambda r: r.eval(
+        ACQUIRE_SLOT_LUA, 1, key, settings.KPI_MISS_CONCURRENCY, settings.KPI_MISS_LEASE_SECONDS, vaga,
+    ))
+    if acquired == 0:
+        raise AdmissionDenied(
+            status.HTTP_503_SERVICE_UNAVAILABLE,
+            "Muitos cálculos deste indicador em andamento. Tente novamente em instantes.",
+            settings.KPI_MISS_RETRY_AFTER_SECONDS,
+        )
+    return vaga if acquired else None
+
+
+def release_slot(cache_key_prefix: str, vaga: Optional[str]):
+    if vaga is not None:
+        run_redis_command(lambda r: r.zrem(SLOTS_KEY.format(prefixo=cache_key_prefix), vaga))
+
+
+@contextmanager
+def computation_slot(cache_key_prefix: str) -> Iterator[None]:
+    vaga = acquire_slot(cache_key_prefix)
+    try:
+        yield
+    finally:
+        release_slot(cache_key_prefix, vaga)
+
+
+@contextmanager
+def admit(cache_key_prefix: str, usuario: Optional[str]) -> Iterator[None]:
+    # Um recálculo fora do cache: primeiro o balde do usuário (classe kpi), depois a vaga do KPI
+    check_rate(usuario, "kpi")
+    with computation_slot(cache_key_prefix):
+        yield
+
+
+def rate_limit(classe: str):
+    # Dependência para endpoints sem cache (ex.: autocomplete): cada requisição consome um token
+    def dependency() -> Any:
+        try:
+            check_rate(request_user_key(), classe)
+        except AdmissionDenied as denied:
+            raise denied.to_http()
+    return dependency
@@ -0,0 +1,194 @@
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from sqlalchemy import event
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+from core.config import settings
+from core.database import QuarentenaModel
+from core.redis_config import run_redis_command
+from models.coleta import ColetaCreate, FUEL_TYPE_CODES, VEHICLE_TANK_CAPACITY
+
+MODE_QUARANTINE = "quarentena"
+MODE_FLAG = "sinalizar"
+MODE_OFF = "desligado"
+
+# Estatística do combustível em todos os postos, usada enquanto o posto ainda tem poucas leituras
+ALL_POSTOS = "*"
+
+# (motivo, score) de uma leitura anômala
+Anomaly = Tuple[str, float]
+
+# MAD x 1,4826 estima o desvio padrão de uma distribuição normal, sem o peso dos outliers
+MAD_TO_STD = 1.4826
+
+STAGED_INFO_KEY = "estatisticas_pendentes"  # em Session.info: leituras avaliadas na transação ainda aberta
+
+
+class RollingPriceStatistics:
+    # Últimos ANOMALY_WINDOW preços (em centavos) por tenant x posto x combustível, num hash do Redis
+    # compartilhado entre os workers, com cópia local para quando o Redis está fora. O centro é a
+    # mediana e a dispersão o MAD: até metade da janela pode ser de leituras anômalas sem deslocar
+    # nenhum dos dois, por isso as retidas também entram. Uma mudança de preço que se mantém vira a
+    # mediana depois de meia janela, e a partir daí as leituras no preço novo deixam de ser retidas.
+    def __init__(self, key: str, window: int):
+        self.key = key
+        self.window = window
+        self._local: Dict[str, Tuple[int, ...]] = {}
+        self._lock = threading.Lock()
+
+    def _windows(self, keys: Sequence[str]) -> List[Tuple[int, ...]]:
+        # Um HMGET por lote; cada valor é a janela de centavos separados por vírgula
+        raw = run_redis_command(lambda r: r.hmget(self.key, list(keys)))
+        windows = []
+        with self._lock:
+            for i, key in enumerate(keys):
+                value = raw[i] if raw is not None else None
+                if value is not None:
+                    windows.append(tuple(int(part) for part in value.split(",")))
+                else:
+                    windows.append(self._local.get(key, ()))
+        return windows
+
+    def load(self, keys: Sequence[str]) -> np.ndarray:
+        # Matriz (len(keys), 3) com n, mediana e desvio estimado pelo MAD (1,4826 x MAD), em reais
+        stats = np.zeros((len(keys), 3))
+        for i, window in enumerate(self._windows(keys)):
+            if window:
+                precos = np.array(window) / 100
+                median = np.median(precos)
+                stats[i] = [len(precos), median, MAD_TO_STD * np.median(np.abs(precos - median))]
+        return stats
+
+    def merge(self, keys: np.ndarray, precos: np.ndarray):
+        # Acrescenta as leituras à janela de cada chave, na ordem do lote. Workers concorrentes podem
+        # sobrescrever a atualização um do outro; para uma estatística móvel isso é aceitável e evita
+        # uma transação no Redis por lote.
+        if len(keys) == 0:
+            return
+        centavos: Dict[str, List[int]] = {}
+        for key, preco in zip(keys.tolist(), np.rint(precos * 100).astype(int).tolist()):
+            centavos.setdefault(key, []).append(preco)
+
+        unique_keys = list(centavos)
+        updated = {
+            key: (window + tuple(centavos[key]))[-self.window:]
+            for key, window in zip(unique_keys, self._windows(unique_keys))
+        }
+        with self._lock:
+            self._local.update(updated)
+        run_redis_command(lambda r: r.hset(self.key, mapping={
+            key: ",".join(map(str, window)) for key, window in updated.items()
+        }))
+
+
+PRICE_STATISTICS = RollingPriceStatistics(key="anomalia:estatisticas", window=settings.ANOMALY_WINDOW)
+
+
+def _stat_keys(coletas: List[ColetaCreate], posto: Optional[str] = None) -> np.ndarray:
+    # O tenant abre o campo: os preços de um cliente não entram na média (nem na quarentena) de outro
+    return np.array([
+        f"{coleta.coreid}|{posto or coleta.posto_identificador}|{FUEL_TYPE_CODES[coleta.tipo_combustivel]}"
+        for coleta in coletas
+    ])
+
+
+def score_coletas(coletas: List[ColetaCreate]) -> List[Optional[Anomaly]]:
+    # Avalia o lote inteiro de uma vez: z-score robusto do preço (mediana e MAD) contra a janela do
+    # posto (ou do combustível, com poucas leituras no posto) e volume contra a capacidade do veículo
+    if settings.ANOMALY_MODE == MODE_OFF or not coletas:
+        return [None] * len(coletas)
+
+    precos = np.array([float(coleta.preco_venda) for coleta in coletas])
+    volumes = np.array([float(coleta.volume_vendido) for coleta in coletas])
+    capacidades = np.array([VEHICLE_TANK_CAPACITY[coleta.tipo_veiculo] for coleta in coletas])
+
+    posto_keys = _stat_keys(coletas)
+    global_keys = _stat_keys(coletas, posto=ALL_POSTOS)
+    unique_keys, inverse = np.unique(np.concatenate([posto_keys, global_keys]), return_inverse=True)
+    stats = PRICE_STATISTICS.load(unique_keys.tolist())[inverse]
+    posto_stats, global_stats = stats[:len(coletas)], stats[len(coletas):]
+
+    use_posto = posto_stats[:, 0] >= settings.ANOMALY_MIN_SAMPLES
+    stats = np.where(use_posto[:, None], posto_stats, global_stats)
+    count, median, std = stats[:, 0], stats[:, 1], stats[:, 2]
+
+    # Postos com preço tabelado têm MAD ~0: um piso relativo evita sinalizar centavos de diferença
+    std = np.maximum(std, median * settings.ANOMALY_MIN_STD_RATIO)
+    z = np.divide(np.abs(precos - median), std, out=np.zeros_like(precos), where=std > 0)
+    z[count < settings.ANOMALY_MIN_SAMPLES] = 0.0
+
+    preco_anomalo = z > settings.ANOMALY_ZSCORE_LIMIT
+    volume_ratio = volumes / capacidades
+    volume_anomalo = volume_ratio > 1.0
+
+    result: List[Optional[Anomaly]] = []
+    for i in range(len(coletas)):
+        if preco_anomalo[i]:
+            result.append((f"preco_venda fora do padrão (mediana {median[i]:.2f}, z={z[i]:.1f})", float(z[i])))
+        elif volume_anomalo[i]:
+            result.append((f"volume_vendido acima da capacidade do veículo ({capacidades[i]} L)", float(volume_ratio[i])))
+        else:
+            result.append(None)
+    return result
+
+
+def update_statistics(coletas: List[ColetaCreate]):
+    if settings.ANOMALY_MODE == MODE_OFF or not coletas:
+        return
+    precos = np.array([float(coleta.preco_venda) for coleta in coletas])
+    PRICE_STATISTICS.merge(
+        np.concatenate([_stat_keys(coletas), _stat_keys(coletas, posto=ALL_POSTOS)]),
+        np.concatenate([precos, precos]),
+    )
+
+
+def stage_statistics(db: Session, coletas: List[ColetaCreate]):
+    # As leituras só entram nas janelas depois do commit: num rollback elas não foram gravadas nem
+    # retidas, e um reenvio do mesmo lote as contaria duas vezes
+    db.info.setdefault(STAGED_INFO_KEY, []).extend(coletas)
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_staged(session: Session):
+    update_statistics(session.info.pop(STAGED_INFO_KEY, []))
+
+
+# Rollback, ou sessão fechada sem commit: o que sobrou não chegou ao banco
+@event.listens_for(Session, "after_transaction_end")
+def _discard_staged(session: Session, transaction):
+    if transaction.parent is None:
+        session.info.pop(STAGED_INFO_KEY, None)
+
+
+def record_anomalies(
+    db: Session,
+    entries: List[Tuple[ColetaCreate, str, Anomaly, Optional[int]]],
+    status: str,
+) -> List[int]:
+    # Registra as leituras (coleta, chave natural, anomalia, coleta_id) num único upsert; a chave
+    # natural evita entradas repetidas quando a mesma leitura é reenviada
+    if not entries:
+        return []
+
+    rows = {}
+    for coleta, chave, (motivo, score), coleta_id in entries:
+        rows[chave] = {
+            "chave": chave,
+            "payload": coleta.model_dump_json(),
+            "coreid": coleta.coreid,
+            "posto_identificador": coleta.posto_identificador,
+            "motivo": motivo,
+            "score": score,
+            "status": status,
+            "coleta_id": coleta_id,
+        }
+
+    stmt = pg_insert(QuarentenaModel).values(list(rows.values()))
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["chave"],
+        set_={"motivo": stmt.excluded.motivo, "score": stmt.excluded.score},
+    ).returning(QuarentenaModel.id, QuarentenaModel.chave)
+
+    ids_by_chave = {row.chave: row.id for row in db.execute(stmt)}
+    return [ids_by_chave[chave] for _, chave, _, _ in entries]
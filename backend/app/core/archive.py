@@ -0,0 +1,258 @@
+import os
+import threading
+from contextlib import suppress
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional
+import numpy as np
+from sqlalchemy import Integer, any_, delete, func, literal, select
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.orm import Session
+from core.cache_utils import mark_data_changed
+from core.coletas_cache import coleta_filter_values, invalidate_coletas_cache
+from core.config import settings
+from core.database import ArquivoColetasModel, ColetaModel, SessionLocal
+from core.dimensions import coleta_text_columns, join_dimensions
+
+# Um worker por vez arquiva (advisory lock por transação; ver MIGRATION_LOCK_ID em migrations/env.py)
+ARCHIVE_LOCK_ID = 7311002
+
+# Colunas de texto (lidas das dimensões) gravadas como estão; preço e volume já são inteiros
+# (centavos e centilitros). O arquivo guarda os textos da época: não depende das dimensões
+TEXT_COLUMNS = (
+    "posto_identificador", "posto_nome", "cidade", "estado", "tipo_combustivel",
+    "motorista_nome", "motorista_cpf", "veiculo_placa", "tipo_veiculo",
+)
+ARCHIVE_COLUMNS = ("id", "coreid", "data_coleta", "preco_centavos", "volume_centilitros", *TEXT_COLUMNS)
+
+
+def archive_cutoff(retention_days: int) -> datetime:
+    # Meia-noite: um dia nunca fica metade arquivado, e o corte vale como marca para os agregados
+    return datetime.combine(date.today() - timedelta(days=retention_days), datetime.min.time())
+
+
+def write_archive(rows: List[Any], path: str):
+    # Um array por coluna em um .npz comprimido: leitura seletiva por coluna e sem pickle
+    arrays = {
+        "id": np.array([row.id for row in rows], dtype=np.int64),
+        "coreid": np.array([row.coreid for row in rows], dtype=str),
+        "data_coleta": np.array([row.data_coleta for row in rows], dtype="datetime64[us]"),
+        "preco_centavos": np.array([row.preco_centavos for row in rows], dtype=np.int64),
+        "volume_centilitros": np.array([row.volume_centilitros for row in rows], dtype=np.int64),
+        **{column: np.array([getattr(row, column) for row in rows], dtype=str) for column in TEXT_COLUMNS},
+    }
+    # Grava ao lado e renomeia: um arquivo com o nome final está sempre completo, e o parcial de uma
+    # gravação que falhou (disco cheio, por exemplo) não fica no diretório
+    tmp_path = f"{path}.tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            np.savez_compressed(f, **arrays)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        with suppress(FileNotFoundError):
+            os.remove(tmp_path)
+        raise
+
+
+def read_archive(
+    path: str,
+    tenant: str,
+    inicio: datetime,
+    fim: datetime,
+    posto_identificador: Optional[str] = None,
+    veiculo_placa: Optional[str] = None,
+) -> Dict[str, np.ndarray]:
+    # Carrega só as colunas dos filtros; as demais apenas para as linhas selecionadas
+    with np.load(path, allow_pickle=False) as arquivo:
+        datas = arquivo["data_coleta"]
+        mask = (datas >= np.datetime64(inicio)) & (datas < np.datetime64(fim))
+        if "coreid" in arquivo.files:
+            mask &= arquivo["coreid"] == tenant
+        elif tenant != settings.TENANT_LEGACY_COREID:
+            mask[:] = False  # arquivo anterior à migração 0005: só linhas do tenant legado
+        if posto_identificador:
+            mask &= arquivo["posto_identificador"] == posto_identificador
+        if veiculo_placa:
+            mask &= arquivo["veiculo_placa"] == veiculo_placa
+        indices = np.flatnonzero(mask)
+        return {column: arquivo[column][indices] for column in arquivo.files}
+
+
+def archive_rows(colunas: Dict[str, np.ndarray]) -> List[Dict[str, Any]]:
+    # Colunas de um arquivo -> linhas no formato do GET de coletas (data como 'AAAA/MM/DD - HH:MI');
+    # preço e volume seguem em ponto fixo, convertidos pelo modelo Coleta
+    datas = [
+        value.replace("-", "/").replace("T", " - ")
+        for value in np.datetime_as_string(colunas["data_coleta"], unit="m")
+    ]
+    return [
+        {
+            "id": int(colunas["id"][i]),
+            "data_coleta": datas[i],
+            "preco_centavos": int(colunas["preco_centavos"][i]),
+            "volume_centilitros": int(colunas["volume_centilitros"][i]),
+            **{column: str(colunas[column][i]) for column in TEXT_COLUMNS},
+        }
+        for i in range(len(datas))
+    ]
+
+
+def query_archive(
+    db: Session,
+    tenant: str,
+    data_inicio: date,
+    data_fim: date,
+    posto_identificador: Optional[str] = None,
+    veiculo_placa: Optional[str] = None,
+    skip: int = 0,
+    limit: int = 100,
+) -> List[Dict[str, Any]]:
+    # O manifesto diz quais arquivos cobrem o período; só eles são abertos, em ordem de id
+    inicio = datetime.combine(data_inicio, datetime.min.time())
+    fim = datetime.combine(data_fim + timedelta(days=1), datetime.min.time())
+    arquivos = (
+        db.query(ArquivoColetasModel.arquivo)
+        .filter(ArquivoColetasModel.inicio < fim, ArquivoColetasModel.fim >= inicio)
+        .order_by(ArquivoColetasModel.id)
+        .all()
+    )
+
+    result: List[Dict[str, Any]] = []
+    for (arquivo,) in arquivos:
+        path = os.path.join(settings.ARCHIVE_DIR, arquivo)
+        try:
+            colunas = read_archive(path, tenant, inicio, fim, posto_identificador, veiculo_placa)
+        except FileNotFoundError:
+            print(f"ERRO: arquivo de coletas {path} não encontrado (ARCHIVE_DIR sem volume persistente?).")
+            continue
+
+        encontradas = len(colunas["id"])
+        if skip >= encontradas:
+            skip -= encontradas
+            continue
+        selecionadas = {column: values[skip:skip + limit - len(result)] for column, values in colunas.items()}
+        skip = 0
+        result.extend(archive_rows(selecionadas))
+        if len(result) >= limit:
+            break
+    return result
+
+
+class ColetasArchiver:
+    # Move de coletas para arquivos .npz as linhas anteriores ao horizonte de retenção, em lotes.
+    # Cada lote grava o arquivo, registra o manifesto e apaga as linhas na mesma transação; se a
+    # transação falhar o arquivo é removido (e um arquivo órfão fora do manifesto nunca é lido).
+    # Os agregados não são tocados: as linhas entraram neles na ingestão e continuam lá.
+    def __init__(self, directory: str, retention_days: int, interval: float, batch_rows: int):
+        self.directory = directory
+        self.retention_days = retention_days
+        self.interval = interval
+        self.batch_rows = batch_rows
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _archive_batch(self, corte: datetime) -> Dict[str, int]:
+        # Retorna as linhas arquivadas por tenant (vazio quando não há mais o que arquivar)
+        with SessionLocal() as db:
+            if not db.execute(select(func.pg_try_advisory_xact_lock(ARCHIVE_LOCK_ID))).scalar():
+                return {}  # outro worker está arquivando
+
+            stored_columns = [getattr(ColetaModel, column) for column in ARCHIVE_COLUMNS if column not in TEXT_COLUMNS]
+            rows = (
+                join_dimensions(db.query(*stored_columns, *coleta_text_columns(*TEXT_COLUMNS)))
+                .filter(ColetaModel.data_coleta < corte)
+                .order_by(ColetaModel.id)
+                .limit(self.batch_rows)
+                .with_for_update(skip_locked=True, of=ColetaModel)
+                .all()
+            )
+            if not rows:
+                return {}
+
+            ids = [row.id for row in rows]
+            arquivo = f"coletas-{ids[0]}-{ids[-1]}.npz"
+            path = os.path.join(self.directory, arquivo)
+            try:
+                write_archive(rows, path)
+                db.add(ArquivoColetasModel(
+                    arquivo=arquivo,
+                    inicio=min(row.data_coleta for row in rows),
+                    fim=max(row.data_coleta for row in rows),
+                    corte=corte,
+                    linhas=len(rows),
+                ))
+                db.execute(
+                    delete(ColetaModel)
+                    .where(ColetaModel.id == any_(literal(ids, ARRAY(Integer))))
+                    .execution_options(synchronize_session=False)
+                )
+                db.commit()
+            except Exception:
+                db.rollback()
+                with suppress(FileNotFoundError):
+                    os.remove(path)
+                raise
+
+        por_tenant: Dict[str, List[Any]] = {}
+        for row in rows:
+            por_tenant.setdefault(row.coreid, []).append(row)
+        for tenant, tenant_rows in por_tenant.items():
+            assinaturas = {tuple(coleta_filter_values(row).items()) for row in tenant_rows}
+            invalidate_coletas_cache(
+                changed=[dict(values) for values in assinaturas],
+                coleta_ids=[row.id for row in tenant_rows],
+                tenant=tenant,
+            )
+        print(f"ARQUIVAMENTO: {len(rows)} coletas movidas para {arquivo}.")
+        return {tenant: len(tenant_rows) for tenant, tenant_rows in por_tenant.items()}
+
+    def archive_once(self) -> int:
+        os.makedirs(self.directory, exist_ok=True)
+        corte = archive_cutoff(self.retention_days)
+        total = 0
+        tenants = set()
+        while not self._stop_event.is_set():
+            archived = self._archive_batch(corte)
+            if not archived:
+                break
+            total += sum(archived.values())
+            tenants.update(archived)
+
+        # Os KPIs do cubo não mudam, mas históricos de motoristas e listagens de coletas sim
+        for tenant in sorted(tenants):
+            mark_data_changed(tenant)
+        return total
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            try:
+                self.archive_once()
+            except Exception as e:
+                print(f"ERRO no arquivamento de coletas: {e}")
+            self._stop_event.wait(self.interval)
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="coletas-archiver", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+
+
+ARCHIVER = ColetasArchiver(
+    directory=settings.ARCHIVE_DIR,
+    retention_days=settings.ARCHIVE_RETENTION_DAYS,
+    interval=settings.ARCHIVE_INTERVAL_SECONDS,
+    batch_rows=settings.ARCHIVE_BATCH_ROWS,
+)
+
+def start_archiver():
+    if settings.ARCHIVE_ENABLED:
+        ARCHIVER.start()
+
+def stop_archiver():
+    ARCHIVER.stop()
@@ -1,32 +1,43 @@
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Query, status
 from starlette.requests import Request 
-from sqlalchemy.orm import Session
-from typing import Annotated
-from core.database import get_db, UserModel 
+from typing import Annotated, Optional
+from core.database import ReadSessionLocal, UserModel 
 from core.security import decode_token 
 from models.user import TokenData
 
-def get_current_user(
-    request: Request, 
-    db: Session = Depends(get_db) 
-) -> UserModel:
+credentials_exception = HTTPException(
+    status_code=status.HTTP_401_UNAUTHORIZED,
+    detail="Credenciais inválidas. Faça login novamente.",
+    headers={"WWW-Authenticate": "Bearer"},
+)
 
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Credenciais inválidas. Faça login novamente.",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
-    
+def extract_token(request: Request) -> Optional[str]:
     auth_header = request.headers.get("Authorization")
     
     if not auth_header:
-        raise credentials_exception
+        return None
 
     if auth_header.lower().startswith("bearer "):
-        token = auth_header.split(" ")[1]
-    else:
-        token = auth_header 
+        return auth_header.split(" ")[1]
+    return auth_header 
+
+def get_current_user(
+    request: Request
+) -> UserModel:
+    token = extract_token(request)
     
+    if not token:
+        raise credentials_exception
+    
+    return get_user_from_token(token)
+
+# EventSource (SSE) não envia cabeçalhos: o token vem na query string
+def get_current_user_from_query(
+    token: str = Query(..., description="JWT obtido no /api/v1/auth/token.")
+) -> UserModel:
+    return get_user_from_token(token)
+
+def get_user_from_token(token: str) -> UserModel:
     payload = decode_token(token)
     
     if payload is None:
@@ -39,11 +50,28 @@ def get_current_user(
     
     token_data = TokenData(id=user_id) 
 
-    user = db.query(UserModel).filter(UserModel.id == token_data.id).first()
+    # Sessão curta no pool de leitura: a conexão volta ao pool antes do handler rodar
+    with ReadSessionLocal() as db:
+        user = db.query(UserModel).filter(UserModel.id == token_data.id).first()
+        if user is not None:
+            db.expunge(user)
     
     if user is None:
         raise credentials_exception
         
     return user
 
-CurrentUser = Annotated[UserModel, Depends(get_current_user)]
\ No newline at end of file
+CurrentUser = Annotated[UserModel, Depends(get_current_user)]
+QueryTokenUser = Annotated[UserModel, Depends(get_current_user_from_query)]
+
+# Tenant das consultas e escritas: o coreid do usuário autenticado (nunca um parâmetro do cliente)
+def get_current_tenant(current_user: CurrentUser) -> str:
+    return current_user.coreid
+
+# Tenant do JWT sem ir ao banco (ETag, 304): None para token inválido ou anterior ao claim
+def token_tenant(request: Request) -> Optional[str]:
+    token = extract_token(request)
+    payload = decode_token(token) if token else None
+    return payload.get("coreid") if payload else None
+
+Tenant = Annotated[str, Depends(get_current_tenant)]
\ No newline at end of file
@@ -1,116 +1,274 @@
 import json
 import time 
-from typing import Callable, Any, List, Optional
-from functools import lru_cache, wraps 
+from typing import Callable, Any, Dict, List, Optional, Sequence, Tuple
+from functools import wraps 
+from datetime import date, datetime
 from decimal import Decimal
-import redis
-from pydantic_settings import BaseSettings, SettingsConfigDict
+from fastapi import Response
+from core.admission import AdmissionDenied, admit, request_user_key
+from core.compression import accepts_encoding, decode_payload, encode_payload, payload_encoding
+from core.config import settings
+from core.events import publish_data_changed
+from core.redis_config import run_redis_command
+from core.replicas import cache_fill_session, record_write_position
+from core.request_context import CURRENT_REQUEST
 
-
-class RedisSettings(BaseSettings):
-    REDIS_HOST: str = "localhost"
-    REDIS_PORT: int = 6379
-    REDIS_DB: int = 0
-    
-    model_config = SettingsConfigDict(env_file=".env", extra='ignore')
-
-@lru_cache()
-def get_redis_settings() -> RedisSettings:
-    return RedisSettings()
-
-def get_redis_client() -> redis.Redis:
-    settings = get_redis_settings()
-    try:
-        r = redis.Redis(
-            host=settings.REDIS_HOST,
-            port=settings.REDIS_PORT,
-            db=settings.REDIS_DB,
-            decode_responses=True 
-        )
-        r.ping() 
-        return r
-    except redis.exceptions.ConnectionError:
-        print("AVISO: Erro ao conectar ao Redis. O cache está desativado.")
-        return None 
-
-REDIS_CLIENT = get_redis_client()
 DEFAULT_TTL = 3600  # 1 hora (Time To Live)
 LAST_UPDATE_KEY = "dashboard:last_data_ingestion"
+DATA_VERSION_KEY = "dashboard:data_version"  # contador incrementado a cada escrita (ETag)
+CACHE_INDEX_PREFIX = "cache_index:"  # SET com as chaves em cache de cada prefixo (por tenant)
+TENANT_KWARG = "tenant"  # parâmetro Tenant dos endpoints: namespace da chave, não um filtro dela
+STALE_PREFIX = "stale:"  # cópia de cada KPI que sobrevive à invalidação (servida sob sobrecarga)
+
+# Prefixos que dependem dos dados de coletas e precisam ser invalidados a cada escrita
+DASHBOARD_CACHE_KEYS = [
+    "kpi_historico_preco", 
+    "kpi_media_preco", 
+    "kpi_percentis_preco",
+    "kpi_cubo",
+    "kpi_volume_veiculo", 
+    "kpi_ranking_estado",
+    "kpi_volume_total",
+    "kpi_maior_consumidor",
+    "kpi_receita_total",
+    "motorista_historico",
+    "motorista_ranking_agregado",
+]
 
 def json_default_converter(obj):
     if isinstance(obj, Decimal):
         # Converte Decimal para float para ser serializável
         return float(obj) 
+    if isinstance(obj, (date, datetime)):
+        return obj.isoformat()
     raise TypeError(f'Object of type {obj.__class__.__name__} is not JSON serializable')
 
 
+def cached_response(payload: bytes, stale: bool = False) -> Any:
+    # Dentro de uma requisição, os bytes do cache vão direto para o cliente: comprimidos se ele
+    # aceita a codificação, senão só descomprimidos, sem json.loads + nova serialização
+    request = CURRENT_REQUEST.get()
+    if request is None:
+        return json.loads(decode_payload(payload))
+
+    headers = dict(getattr(request.state, "cache_headers", {}))
+    if stale:
+        # Cópia antiga: sem validadores da versão atual (um 304 depois a eternizaria no cliente)
+        headers.pop("ETag", None)
+        headers.pop("Last-Modified", None)
+        headers["Cache-Control"] = "no-store"
+        headers["Warning"] = '110 - "Response is Stale"'
+
+    encoding = payload_encoding(payload)
+    if encoding is not None:
+        headers["Vary"] = "Accept-Encoding"
+        if accepts_encoding(request.headers.get("Accept-Encoding", ""), encoding):
+            headers["Content-Encoding"] = encoding
+        else:
+            payload = decode_payload(payload)
+
+    return Response(content=payload, media_type="application/json", headers=headers)
+
+
+def read_cached(cache_key: str) -> Optional[bytes]:
+    cached_result = run_redis_command(lambda r: r.get(cache_key), binary=True)
+    if cached_result:
+        print(f"CACHE HIT: {cache_key}")
+        return cached_result
+    print(f"CACHE MISS: {cache_key}")
+    return None
+
+
+def read_stale(cache_key: str) -> Optional[bytes]:
+    return run_redis_command(lambda r: r.get(f"{STALE_PREFIX}{cache_key}"), binary=True)
+
+
+def serialize_for_cache(cache_key: str, result: Any) -> Optional[bytes]:
+    # mode="json" gera exatamente o JSON que o FastAPI devolveria (ex.: Decimal como string), já que
+    # os bytes em cache vão direto para o cliente sem passar de novo pelo response_model
+    try:
+        if isinstance(result, list):
+            data_to_cache = [item.model_dump(mode="json") if hasattr(item, 'model_dump') else item for item in result]
+        elif hasattr(result, 'model_dump'):
+            data_to_cache = result.model_dump(mode="json")
+        else:
+            data_to_cache = result
+
+        serialized_data = json.dumps(
+            data_to_cache, 
+            default=json_default_converter
+        )
+    except Exception as e:
+        print(f"ERRO DE SERIALIZAÇÃO NO CACHE para {cache_key}: {e}")
+        return None
+
+    return encode_payload(serialized_data.encode("utf-8"))
+
+
+def store_cached(cache_key: str, payload: bytes, ttl: int, index_keys: List[str], stale_ttl: int = 0):
+    # Grava a entrada e a registra nos índices (SETs) usados para invalidá-la depois; a cópia
+    # stale (opcional) fica fora dos índices
+    def store(r):
+        pipe = r.pipeline(transaction=False)
+        pipe.set(cache_key, payload, ex=ttl)
+        if stale_ttl:
+            pipe.set(f"{STALE_PREFIX}{cache_key}", payload, ex=stale_ttl)
+        for index_key in index_keys:
+            pipe.sadd(index_key, cache_key)
+            pipe.expire(index_key, ttl)
+        pipe.execute()
+
+    run_redis_command(store, binary=True)
+
+
+def evict_indexed(index_keys: List[str], cache_keys: Sequence[str] = ()) -> Optional[int]:
+    # Remove os índices, todas as entradas registradas neles e as chaves avulsas; None sem Redis
+    if not index_keys and not cache_keys:
+        return 0
+
+    def evict(r):
+        pipe = r.pipeline(transaction=False)
+        for index_key in index_keys:
+            pipe.smembers(index_key)
+        cached_keys = set(index_keys) | set(cache_keys)
+        for members in pipe.execute():
+            cached_keys.update(members)
+        return r.unlink(*cached_keys)
+
+    return run_redis_command(evict)
+
+
+def tenant_namespace(tenant: Optional[str]) -> str:
+    # Chaves de um tenant ficam sob "tenant:{coreid}:": um cliente nunca lê nem invalida as de outro
+    return f"tenant:{tenant}:" if tenant else ""
+
+
+def tenant_scoped(key: str, tenant: Optional[str]) -> str:
+    # Contadores por tenant (versão dos dados, última atualização); sem tenant, o global
+    return f"{key}:{tenant}" if tenant else key
+
+
+def index_key(cache_key_prefix: str, tenant: Optional[str]) -> str:
+    return f"{CACHE_INDEX_PREFIX}{tenant_namespace(tenant)}{cache_key_prefix}"
+
+
+def build_cache_key(cache_key_prefix: str, kwargs: Dict[str, Any]) -> str:
+    # Parâmetros em ordem alfabética: a mesma consulta gera a mesma chave venha de uma requisição
+    # ou do aquecedor de cache (core/cache_warmer.py)
+    key_parts = [cache_key_prefix]
+    for k, v in sorted(kwargs.items()):
+        if k not in ['db', 'current_user', TENANT_KWARG] and v is not None:
+            str_v = str(v) 
+            key_parts.append(f"{k}:{str_v}")
+    return tenant_namespace(kwargs.get(TENANT_KWARG)) + ":".join(key_parts)
+
+
+def compute_and_cache(
+    func: Callable, cache_key_prefix: str, ttl: int, kwargs: Dict[str, Any]
+) -> Tuple[Any, Optional[bytes]]:
+    # Retorna o resultado e os bytes gravados no cache (None se vazio ou não serializável)
+    cache_key = build_cache_key(cache_key_prefix, kwargs)
+    db_result = func(**kwargs)
+
+    payload = None
+    if db_result:
+        payload = serialize_for_cache(cache_key, db_result)
+        if payload:
+            store_cached(
+                cache_key, payload, ttl, [index_key(cache_key_prefix, kwargs.get(TENANT_KWARG))],
+                stale_ttl=settings.KPI_STALE_TTL_SECONDS,
+            )
+
+    return db_result, payload
+
+
 def cached_data(cache_key_prefix: str, ttl: int = DEFAULT_TTL):
     def decorator(func: Callable) -> Callable:
         @wraps(func) 
-        def wrapper(*args, **kwargs) -> Any:
-            key_parts = [cache_key_prefix]
-            for k, v in kwargs.items():
-                if k not in ['db', 'current_user'] and v is not None:
-                    str_v = str(v) 
-                    key_parts.append(f"{k}:{str_v}")
-            
-            cache_key = ":".join(key_parts)
-            
-            if REDIS_CLIENT:
-                cached_result = REDIS_CLIENT.get(cache_key)
-                if cached_result:
-                    print(f"CACHE HIT: {cache_key}")
-                    return json.loads(cached_result) 
-            
-            print(f"CACHE MISS: {cache_key}")
-            db_result = func(*args, **kwargs)
-
-            if REDIS_CLIENT and db_result:
-                try:
-                    if isinstance(db_result, list):
-                        data_to_cache = [item.model_dump() for item in db_result]
-                    elif hasattr(db_result, 'model_dump'):
-                        data_to_cache = db_result.model_dump()
-                    else:
-                        data_to_cache = db_result
-
-                    serialized_data = json.dumps(
-                        data_to_cache, 
-                        default=json_default_converter
-                    )
-                
-                except Exception as e:
-                    print(f"ERRO DE SERIALIZAÇÃO NO CACHE para {cache_key}: {e}")
-                    serialized_data = None 
-                    
-                if serialized_data:
-                    REDIS_CLIENT.setex(cache_key, ttl, serialized_data)
-                
-            return db_result
+        def wrapper(**kwargs) -> Any:
+            cache_key = build_cache_key(cache_key_prefix, kwargs)
+            cached_result = read_cached(cache_key)
+            if cached_result:
+                return cached_response(cached_result)
+
+            # Só o recálculo passa pelo controle de admissão; recusado, responde a cópia antiga
+            # se houver, senão 429/503 com Retry-After
+            try:
+                with admit(cache_key_prefix, request_user_key()), cache_fill_session(kwargs.get("db"), kwargs.get(TENANT_KWARG)) as db:
+                    return compute_and_cache(func, cache_key_prefix, ttl, {**kwargs, "db": db} if db is not None else kwargs)[0]
+            except AdmissionDenied as denied:
+                stale_result = read_stale(cache_key)
+                if stale_result is None:
+                    raise denied.to_http()
+                print(f"CACHE STALE: {cache_key} ({denied.status_code})")
+                return cached_response(stale_result, stale=True)
         
+        wrapper.cache_key_prefix = cache_key_prefix
+        wrapper.cache_ttl = ttl
         return wrapper
         
     return decorator
 
-def invalidate_dashboard_cache(keys_to_delete: List[str]):
-    if REDIS_CLIENT:
-        full_keys = [f"kpi_{key}" for key in keys_to_delete]
-        deleted_count = REDIS_CLIENT.delete(*full_keys)
-        print(f"CACHE INVALIDATED: {deleted_count} chaves excluídas do Redis.")
-    else:
+def invalidate_dashboard_cache(cache_key_prefixes: List[str], tenant: Optional[str] = None):
+    # Remove todas as variações (com e sem parâmetros) de cada prefixo do tenant usando o índice dele
+    deleted_count = evict_indexed([index_key(prefix, tenant) for prefix in cache_key_prefixes])
+    if deleted_count is None:
         print("AVISO: Redis não está ativo. Não foi possível invalidar o cache.")
+    else:
+        print(f"CACHE INVALIDATED: {deleted_count} chaves excluídas do Redis.")
 
-def set_last_update_timestamp():
-    if REDIS_CLIENT:
-        timestamp = int(time.time())
-        REDIS_CLIENT.set(LAST_UPDATE_KEY, timestamp)
+def set_last_update_timestamp(tenant: str) -> int:
+    timestamp = int(time.time())
+    run_redis_command(lambda r: r.mset({LAST_UPDATE_KEY: timestamp, tenant_scoped(LAST_UPDATE_KEY, tenant): timestamp}))
+    return timestamp
 
-def get_last_update_timestamp() -> Optional[int]:
-    if REDIS_CLIENT:
-        ts_str = REDIS_CLIENT.get(LAST_UPDATE_KEY)
-        if ts_str:
-            try:
-                return int(ts_str)
-            except ValueError:
-                return None
-    return None
\ No newline at end of file
+def get_last_update_timestamp(tenant: Optional[str] = None) -> Optional[int]:
+    ts_str = run_redis_command(lambda r: r.get(tenant_scoped(LAST_UPDATE_KEY, tenant)))
+    if ts_str:
+        try:
+            return int(ts_str)
+        except ValueError:
+            return None
+    return None
+
+def _init_data_version(pipe, version_key: str):
+    # Se o Redis perder a chave, a versão recomeça do relógio (ms) e não de 1: ETags antigos
+    # guardados pelos clientes nunca coincidem com uma versão nova
+    pipe.set(version_key, int(time.time() * 1000), nx=True)
+
+def bump_data_version(tenant: str):
+    # A versão global muda a cada escrita de qualquer tenant (aquecedor de cache); a do tenant,
+    # usada nos ETags dele, só com as escritas dele
+    def bump(r):
+        pipe = r.pipeline(transaction=False)
+        for version_key in (DATA_VERSION_KEY, tenant_scoped(DATA_VERSION_KEY, tenant)):
+            _init_data_version(pipe, version_key)
+            pipe.incr(version_key)
+        pipe.execute()
+
+    run_redis_command(bump)
+
+def get_data_state(tenant: Optional[str] = None) -> Optional[Tuple[int, Optional[int]]]:
+    # (versão dos dados, timestamp da última atualização) do tenant em uma ida ao Redis; None sem Redis
+    version_key = tenant_scoped(DATA_VERSION_KEY, tenant)
+
+    def read(r):
+        pipe = r.pipeline(transaction=False)
+        _init_data_version(pipe, version_key)
+        pipe.mget(version_key, tenant_scoped(LAST_UPDATE_KEY, tenant))
+        return pipe.execute()[-1]
+
+    values = run_redis_command(read)
+    if values is None or values[0] is None:
+        return None
+    version, last_update = values
+    return int(version), int(last_update) if last_update else None
+
+def mark_data_changed(tenant: str):
+    # Só o cache, a versão e os dashboards do tenant que escreveu: os demais clientes não perdem nada
+    record_write_position(tenant)
+    invalidate_dashboard_cache(DASHBOARD_CACHE_KEYS, tenant)
+    bump_data_version(tenant)
+    timestamp = set_last_update_timestamp(tenant)
+    # Avisa os dashboards conectados (SSE) depois que o cache já foi invalidado
+    publish_data_changed(timestamp, tenant)
@@ -0,0 +1,190 @@
+import inspect
+import os
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, Union
+import redis
+from pydantic.fields import FieldInfo
+from sqlalchemy.orm import Session
+from core.cache_utils import TENANT_KWARG, build_cache_key, compute_and_cache, get_data_state
+from core.config import settings
+from core.database import ReadSessionLocal, UserModel
+from core.redis_config import run_redis_command
+
+WARM_LOCK_KEY = "cache_warmer:lock"
+WARM_STATE_KEY = "cache_warmer:estado"  # versão dos dados aquecida e quando
+
+# Variantes de parâmetros de um endpoint: lista fixa ou função que as descobre no banco
+Variants = Union[Sequence[Dict[str, Any]], Callable[[Session], Sequence[Dict[str, Any]]]]
+
+# Endpoints @cached_data registrados com @warm_cache, com suas variantes
+WARM_TARGETS: List[Tuple[Callable, Variants]] = []
+
+
+def warm_cache(variants: Variants = ({},)):
+    # Fica entre o @router.get e o @cached_data: registra o endpoint já com cache
+    def decorator(func: Callable) -> Callable:
+        if not hasattr(func, "cache_key_prefix"):
+            raise TypeError(f"{func.__name__}: @warm_cache deve decorar uma função com @cached_data.")
+        WARM_TARGETS.append((func, variants))
+        return func
+    return decorator
+
+
+def _default_kwargs(func: Callable) -> Dict[str, Any]:
+    # Os mesmos valores que o FastAPI passaria numa requisição sem query string (Query(None) -> None)
+    kwargs = {}
+    for name, param in inspect.signature(func).parameters.items():
+        if name in ("db", "current_user", TENANT_KWARG):
+            continue
+        default = param.default
+        if isinstance(default, FieldInfo):
+            default = default.default
+        if default is not inspect.Parameter.empty:
+            kwargs[name] = default
+    return kwargs
+
+
+class CacheWarmer:
+    # Um thread por worker observa a versão dos dados; quando ela muda (ou as entradas envelhecem),
+    # o worker que pegar o lock no Redis recalcula as variantes com concorrência limitada e grava
+    # no cache. Os demais veem a versão já aquecida e não repetem o trabalho. Lê do primário (pool
+    # de leitura): logo após uma escrita, uma réplica atrasada gravaria no cache o resultado antigo.
+    def __init__(self, poll_interval: float, min_interval: float, refresh_interval: float, concurrency: int):
+        self.poll_interval = poll_interval
+        self.min_interval = min_interval
+        self.refresh_interval = refresh_interval
+        self.concurrency = concurrency
+        self.owner = f"{socket.gethostname()}-{os.getpid()}"
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _plan(self) -> List[Tuple[Callable, Dict[str, Any], str]]:
+        # Cada variante para cada tenant com usuários: o cache de um cliente nunca serve outro
+        plan = []
+        with ReadSessionLocal() as db:
+            tenants = [coreid for (coreid,) in db.query(UserModel.coreid).distinct().order_by(UserModel.coreid)]
+            for func, variants in WARM_TARGETS:
+                defaults = _default_kwargs(func)
+                for variant in (variants(db) if callable(variants) else variants):
+                    for tenant in tenants:
+                        kwargs = {**defaults, **variant, TENANT_KWARG: tenant}
+                        plan.append((func, kwargs, build_cache_key(func.cache_key_prefix, kwargs)))
+        return plan
+
+    def _stale(self, plan: List[Tuple[Callable, Dict[str, Any], str]]) -> List[Tuple[Callable, Dict[str, Any], str]]:
+        # Um TTL por chave em um pipeline: recalcula as ausentes e as que expiram antes da próxima renovação
+        def ttls(r: redis.Redis) -> List[int]:
+            pipe = r.pipeline(transaction=False)
+            for _, _, cache_key in plan:
+                pipe.ttl(cache_key)
+            return pipe.execute()
+
+        remaining = run_redis_command(ttls)
+        if remaining is None:
+            return []
+        return [
+            item for item, ttl in zip(plan, remaining)
+            if ttl == -2 or 0 <= ttl < self.refresh_interval * 2
+        ]
+
+    @staticmethod
+    def _compute(func: Callable, kwargs: Dict[str, Any], cache_key: str) -> bool:
+        try:
+            with ReadSessionLocal() as db:
+                compute_and_cache(
+                    func.__wrapped__, func.cache_key_prefix, func.cache_ttl,
+                    {**kwargs, "db": db},
+                )
+            return True
+        except Exception as e:
+            # Ex.: ranking vazio responde 404; a próxima requisição real segue o caminho normal
+            print(f"AVISO: aquecimento de {cache_key} falhou: {e}")
+            return False
+
+    def _due(self, version: int) -> bool:
+        state = run_redis_command(lambda r: r.hgetall(WARM_STATE_KEY)) or {}
+        if not state:
+            return True
+        elapsed = time.time() - float(state.get("em", 0))
+        if state.get("versao") != str(version):
+            return elapsed >= self.min_interval
+        return elapsed >= self.refresh_interval
+
+    def warm_once(self) -> Optional[int]:
+        # Retorna quantas entradas foram recalculadas, ou None se não era a vez deste worker
+        data_state = get_data_state()
+        if data_state is None:
+            return None  # sem Redis não há cache para aquecer
+        version = data_state[0]
+        if not self._due(version):
+            return None
+
+        acquired = run_redis_command(lambda r: r.set(
+            WARM_LOCK_KEY, self.owner, nx=True, ex=settings.CACHE_WARM_LOCK_SECONDS
+        ))
+        if not acquired:
+            return None
+
+        try:
+            started = time.perf_counter()
+            stale = self._stale(self._plan())
+            with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="cache-warmer") as executor:
+                warmed = sum(executor.map(lambda item: self._compute(*item), stale))
+
+            run_redis_command(lambda r: r.hset(WARM_STATE_KEY, mapping={"versao": version, "em": time.time()}))
+            if stale:
+                print(f"CACHE WARM: {warmed}/{len(stale)} entradas recalculadas em {time.perf_counter() - started:.2f}s.")
+            return warmed
+        finally:
+            self._release()
+
+    def _release(self):
+        # Só apaga o lock se ainda for dele (pode ter expirado e sido pego por outro worker)
+        def release(r: redis.Redis):
+            with r.pipeline() as pipe:
+                try:
+                    pipe.watch(WARM_LOCK_KEY)
+                    if pipe.get(WARM_LOCK_KEY) == self.owner:
+                        pipe.multi()
+                        pipe.delete(WARM_LOCK_KEY)
+                        pipe.execute()
+                except redis.WatchError:
+                    pass
+
+        run_redis_command(release)
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            try:
+                self.warm_once()
+            except Exception as e:
+                print(f"ERRO no aquecimento do cache: {e}")
+            self._stop_event.wait(self.poll_interval)
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="cache-warmer", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+
+
+CACHE_WARMER = CacheWarmer(
+    poll_interval=settings.CACHE_WARM_POLL_SECONDS,
+    min_interval=settings.CACHE_WARM_MIN_INTERVAL_SECONDS,
+    refresh_interval=settings.CACHE_WARM_REFRESH_SECONDS,
+    concurrency=settings.CACHE_WARM_CONCURRENCY,
+)
+
+def start_cache_warmer():
+    if settings.CACHE_WARMER_ENABLED:
+        CACHE_WARMER.start()
+
+def stop_cache_warmer():
+    CACHE_WARMER.stop()
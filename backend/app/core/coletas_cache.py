@@ -0,0 +1,123 @@
+from itertools import product
+from typing import Any, Dict, Iterable, List, Mapping, Optional
+from core.cache_utils import evict_indexed, read_cached, serialize_for_cache, store_cached
+from core.config import settings
+
+COLETAS_PAGE_PREFIX = "coletas_lista"
+COLETA_DETAIL_PREFIX = "coleta"
+TAG_PREFIX = "cache_tag:coletas:"  # SET com as páginas em cache de uma assinatura de filtros
+TAIL_SUFFIX = ":cauda"  # só as páginas incompletas (o fim da listagem) da assinatura
+
+# Filtros da listagem de coletas, na ordem usada na assinatura. O tenant abre toda assinatura e
+# nunca é curinga: páginas e invalidações de um cliente não alcançam as de outro
+TENANT_FIELD = "coreid"
+FILTER_FIELDS = ("estado", "cidade", "tipo_combustivel", "tipo_veiculo")
+ANY = "*"
+
+# Valores de filtro de uma coleta ou de uma requisição: {campo: valor ou None}, mais o tenant
+FilterValues = Dict[str, Optional[str]]
+
+
+def normalize_filters(
+    tenant: str,
+    estado: Optional[str] = None,
+    cidade: Optional[str] = None,
+    tipo_combustivel: Optional[str] = None,
+    tipo_veiculo: Optional[str] = None,
+) -> FilterValues:
+    # A listagem compara estado e cidade com upper(): "sp" e "SP" são a mesma página
+    return {
+        TENANT_FIELD: tenant,
+        "estado": estado.upper() if estado else None,
+        "cidade": cidade.upper() if cidade else None,
+        "tipo_combustivel": tipo_combustivel,
+        "tipo_veiculo": tipo_veiculo,
+    }
+
+
+def coleta_filter_values(coleta: Any) -> FilterValues:
+    # Valores gravados de uma coleta (ColetaCreate, linha lida pelas dimensões ou dict de campos),
+    # como a listagem os compara
+    if isinstance(coleta, Mapping):
+        return {field: coleta[field] for field in (TENANT_FIELD, *FILTER_FIELDS)}
+    return {field: getattr(coleta, field) for field in (TENANT_FIELD, *FILTER_FIELDS)}
+
+
+def filter_signature(filters: FilterValues) -> str:
+    return f"{TENANT_FIELD}={filters[TENANT_FIELD]}|" + "|".join(
+        f"{field}={filters.get(field) or ANY}" for field in FILTER_FIELDS
+    )
+
+
+def _matching_signatures(values: FilterValues) -> List[str]:
+    # As 2^4 assinaturas do tenant cujas páginas podem conter a coleta: cada filtro ausente ou igual ao valor dela
+    return [
+        filter_signature({TENANT_FIELD: values[TENANT_FIELD], **dict(zip(FILTER_FIELDS, combination))})
+        for combination in product(*[(values[field], None) for field in FILTER_FIELDS])
+    ]
+
+
+def page_key(signature: str, skip: int, limit: int) -> str:
+    return f"{COLETAS_PAGE_PREFIX}:{signature}:skip:{skip}:limit:{limit}"
+
+
+def detail_key(tenant: str, coleta_id: int) -> str:
+    return f"{COLETA_DETAIL_PREFIX}:{tenant}:{coleta_id}"
+
+
+def read_cached_page(filters: FilterValues, skip: int, limit: int) -> Optional[bytes]:
+    return read_cached(page_key(filter_signature(filters), skip, limit))
+
+
+def store_page(filters: FilterValues, skip: int, limit: int, page: List[Any]):
+    signature = filter_signature(filters)
+    cache_key = page_key(signature, skip, limit)
+    payload = serialize_for_cache(cache_key, page)
+    if payload is None:
+        return
+
+    tags = [f"{TAG_PREFIX}{signature}"]
+    if len(page) < limit:
+        tags.append(f"{TAG_PREFIX}{signature}{TAIL_SUFFIX}")
+    store_cached(cache_key, payload, settings.COLETAS_CACHE_TTL_SECONDS, tags)
+
+
+def read_cached_detail(tenant: str, coleta_id: int) -> Optional[bytes]:
+    return read_cached(detail_key(tenant, coleta_id))
+
+
+def store_detail(tenant: str, coleta_id: int, coleta: Any):
+    cache_key = detail_key(tenant, coleta_id)
+    payload = serialize_for_cache(cache_key, coleta)
+    if payload is not None:
+        store_cached(cache_key, payload, settings.COLETAS_CACHE_TTL_SECONDS, [])
+
+
+def invalidate_coletas_cache(
+    appended: Iterable[FilterValues] = (),
+    changed: Iterable[FilterValues] = (),
+    coleta_ids: Iterable[int] = (),
+    tenant: Optional[str] = None,
+):
+    # A listagem é ordenada por id e ids novos são sempre maiores: uma inserção só pode entrar
+    # nas páginas incompletas (cauda) das assinaturas que casam com ela, e as páginas cheias
+    # continuam valendo durante a ingestão. Alteração ou exclusão desloca a paginação inteira
+    # das suas assinaturas. Transações concorrentes que commitam fora da ordem dos ids podem
+    # deixar uma página cheia desatualizada; o TTL curto limita esse caso.
+    tags = set()
+    for values in appended:
+        tags.update(f"{TAG_PREFIX}{signature}{TAIL_SUFFIX}" for signature in _matching_signatures(values))
+    for values in changed:
+        for signature in _matching_signatures(values):
+            tags.add(f"{TAG_PREFIX}{signature}")
+            tags.add(f"{TAG_PREFIX}{signature}{TAIL_SUFFIX}")
+    # Detalhes por id só existem no tenant dono das coletas alteradas
+    details = [detail_key(tenant, coleta_id) for coleta_id in coleta_ids] if tenant else []
+
+    if not tags and not details:
+        return
+    deleted_count = evict_indexed(sorted(tags), details)
+    if deleted_count is None:
+        print("AVISO: Redis não está ativo. Não foi possível invalidar o cache de coletas.")
+    else:
+        print(f"CACHE INVALIDATED: {deleted_count} chaves de coletas excluídas do Redis.")
@@ -0,0 +1,49 @@
+import gzip
+from typing import Optional
+from core.config import settings
+
+try:
+    import zstandard
+except ImportError:  # dependência opcional: sem ela, gzip
+    zstandard = None
+
+GZIP_MAGIC = b"\x1f\x8b"
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+if settings.CACHE_COMPRESSION == "zstd" and zstandard is None:
+    print("AVISO: CACHE_COMPRESSION=zstd, mas o pacote 'zstandard' não está instalado. Usando gzip.")
+
+
+def encode_payload(data: bytes) -> bytes:
+    # Entradas pequenas ficam em JSON puro: comprimir não compensa o custo de CPU
+    if len(data) < settings.CACHE_COMPRESSION_MIN_BYTES:
+        return data
+    if settings.CACHE_COMPRESSION == "zstd" and zstandard is not None:
+        return zstandard.ZstdCompressor(level=3).compress(data)
+    return gzip.compress(data, compresslevel=6)
+
+
+# O formato é detectado pelos bytes mágicos, então trocar CACHE_COMPRESSION não invalida o cache
+def payload_encoding(payload: bytes) -> Optional[str]:
+    if payload.startswith(GZIP_MAGIC):
+        return "gzip"
+    if payload.startswith(ZSTD_MAGIC):
+        return "zstd"
+    return None
+
+
+def decode_payload(payload: bytes) -> bytes:
+    encoding = payload_encoding(payload)
+    if encoding == "gzip":
+        return gzip.decompress(payload)
+    if encoding == "zstd":
+        return zstandard.ZstdDecompressor().decompress(payload)
+    return payload
+
+
+def accepts_encoding(accept_encoding: str, encoding: str) -> bool:
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.strip().partition(";")
+        if name.strip() == encoding:
+            return params.replace(" ", "") not in ("q=0", "q=0.0", "q=0.00", "q=0.000")
+    return False
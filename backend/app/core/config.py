@@ -11,6 +11,132 @@ class Settings(BaseSettings):
     SECRET_KEY: str
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 10080  # O token expira em 7 dias
 
+    # Pool de conexões (valores por worker: total = workers * (pool_size + max_overflow), somando os
+    # pools de escrita e de leitura; o gunicorn.conf.py limita os workers por DB_MAX_CONNECTIONS)
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 5
+    DB_POOL_TIMEOUT: int = 10  # segundos aguardando uma conexão livre antes de falhar
+    DB_POOL_RECYCLE: int = 1800  # recicla conexões antigas (segundos), evita conexões mortas
+    DB_POOL_PRE_PING: bool = False  # True = ping a cada checkout (mais seguro, mais lento)
+    DB_POOL_USE_LIFO: bool = True  # reaproveita as conexões mais quentes e deixa as ociosas expirarem
+
+    # Pool separado para as leituras pesadas do dashboard
+    DB_READ_POOL_SIZE: int = 5
+    DB_READ_MAX_OVERFLOW: int = 10
+
+    # Réplicas de leitura (hot standby), "host" ou "host:porta" separados por vírgula. Vazio = leituras no
+    # primário. Réplicas atrasadas além do limite, fora do ar ou logo após uma escrita do usuário são evitadas
+    DB_REPLICA_HOSTS: str = ""
+    DB_REPLICA_MAX_LAG_SECONDS: float = 5.0
+    DB_REPLICA_STICKY_SECONDS: int = 10  # após uma escrita, as leituras do usuário vão ao primário
+    DB_REPLICA_CONNECT_TIMEOUT: int = 3
+
+    # Modo compatível com PgBouncer (transaction pooling): sem pool local
+    DB_PGBOUNCER_MODE: bool = False
+
+    # Orçamento de conexões do Postgres para os workers do gunicorn (gunicorn.conf.py): o max_connections
+    # do servidor menos as reservadas (superusuário, migrações, psql, outros serviços)
+    DB_MAX_CONNECTIONS: int = 100
+    DB_RESERVED_CONNECTIONS: int = 10
+
+    # Health check em background (os probes respondem do snapshot em memória)
+    HEALTH_PROBE_INTERVAL_SECONDS: float = 5.0
+    HEALTH_POOL_SATURATION_LIMIT: float = 1.0  # fração do pool em uso que torna o worker "not ready"
+
+    # Ingestão assíncrona (write-behind): Redis Stream com fallback para fila local + WAL
+    INGESTION_WORKER_ENABLED: bool = True
+    INGESTION_STREAM_KEY: str = "ingestao:coletas"
+    INGESTION_CONSUMER_GROUP: str = "ingestao-workers"
+    INGESTION_BATCH_SIZE: int = 500
+    INGESTION_FLUSH_INTERVAL_SECONDS: float = 1.0
+    INGESTION_MAX_PENDING: int = 100000  # acima disso a API responde 503 (backpressure)
+    INGESTION_CLAIM_IDLE_SECONDS: int = 60  # reprocessa mensagens de consumidores que morreram
+    INGESTION_WAL_DIR: str = "./ingestao_wal"
+    INGESTION_BACKLOG_TTL_SECONDS: float = 1.0  # XLEN reaproveitado pelo enqueue por até este tempo
+    # Coleta que falha INGESTION_MAX_ATTEMPTS vezes (fora quedas do banco) vai para a fila de mortas:
+    # o stream abaixo, ou o arquivo ingestao-mortas.jsonl no INGESTION_WAL_DIR sem Redis
+    INGESTION_MAX_ATTEMPTS: int = 5
+    INGESTION_DEAD_LETTER_KEY: str = "ingestao:coletas:mortas"
+
+    # Deduplicação de coletas (filtro de Bloom no Redis antes do ON CONFLICT do banco)
+    DEDUP_FILTER_BITS: int = 2 ** 24  # 2 MB; ~1% de falsos positivos com 1,7 milhão de chaves
+    DEDUP_FILTER_HASHES: int = 7
+    DEDUP_FILTER_TTL_SECONDS: int = 86400
+
+    # Cache em memória das dimensões (postos, motoristas, veículos) por worker
+    DIMENSION_CACHE_SIZE: int = 10000
+
+    # Detecção de anomalias na ingestão: "sinalizar" grava e registra, "quarentena" retém a leitura,
+    # "desligado" não avalia. Mediana e MAD dos últimos ANOMALY_WINDOW preços por posto x combustível:
+    # um preço novo que se mantém passa a ser o normal depois de meia janela
+    ANOMALY_MODE: str = "sinalizar"
+    ANOMALY_ZSCORE_LIMIT: float = 4.0
+    ANOMALY_MIN_SAMPLES: int = 20
+    ANOMALY_WINDOW: int = 100
+    ANOMALY_MIN_STD_RATIO: float = 0.02
+
+    # Compressão das entradas grandes do cache ("gzip" ou "zstd", se o pacote zstandard estiver instalado)
+    CACHE_COMPRESSION: str = "gzip"
+    CACHE_COMPRESSION_MIN_BYTES: int = 16384
+
+    # Aquecimento do cache do dashboard (core/cache_warmer.py): um worker por vez recalcula as variantes
+    # registradas após cada mudança de dados (no máximo a cada CACHE_WARM_MIN_INTERVAL_SECONDS) e renova as
+    # entradas perto de expirar a cada CACHE_WARM_REFRESH_SECONDS
+    CACHE_WARMER_ENABLED: bool = True
+    CACHE_WARM_POLL_SECONDS: float = 1.0
+    CACHE_WARM_MIN_INTERVAL_SECONDS: float = 5.0
+    CACHE_WARM_REFRESH_SECONDS: float = 120.0
+    CACHE_WARM_CONCURRENCY: int = 4
+    CACHE_WARM_LOCK_SECONDS: int = 120
+
+    # Histórico de preços: máximo de pontos por combustível numa consulta (ex.: granularidade hora)
+    HISTORICO_MAX_PONTOS: int = 2000
+
+    # Busca de motoristas e placas (autocomplete): máximo de sugestões de cada tipo por consulta
+    MOTORISTAS_BUSCA_MAX_RESULTADOS: int = 20
+    # Sem a extensão pg_trgm a migração 0003 falha; False só registra um aviso e segue sem os índices
+    # (a busca vira varredura sequencial). Para Postgres sem contrib, como em testes locais
+    DB_TRGM_REQUIRED: bool = True
+
+    # Arquivamento (core/archive.py): coletas com mais de ARCHIVE_RETENTION_DAYS saem da tabela para
+    # arquivos colunares comprimidos (.npz) em ARCHIVE_DIR, que precisa ser um volume persistente.
+    # Os agregados (cubo e histogramas) continuam com elas; a leitura fica em GET /coletas/arquivo
+    ARCHIVE_ENABLED: bool = False
+    ARCHIVE_DIR: str = "./coletas_arquivo"
+    ARCHIVE_RETENTION_DAYS: int = 365
+    ARCHIVE_INTERVAL_SECONDS: float = 3600.0
+    ARCHIVE_BATCH_ROWS: int = 50000  # linhas por arquivo (e por transação)
+
+    # Multi-tenant: coletas, agregados e cache são separados pelo coreid do usuário (JWT). Linhas
+    # gravadas antes da coluna existir (migração 0005) pertencem a este tenant
+    TENANT_LEGACY_COREID: str = "CORE-ADMIN-001"
+
+    # Controle de admissão (core/admission.py) dos recálculos fora do cache: balde de tokens por
+    # usuário e classe de endpoint (429) e limite de cálculos simultâneos por KPI no cluster (503).
+    # Recusado, o KPI responde a última cópia em cache (KPI_STALE_TTL_SECONDS) quando existe
+    ADMISSION_ENABLED: bool = True
+    RATE_LIMIT_KPI_PER_SECOND: float = 1.0  # recálculos de KPI por usuário (cache hits não contam)
+    RATE_LIMIT_KPI_BURST: int = 30
+    RATE_LIMIT_BUSCA_PER_SECOND: float = 5.0  # consultas de autocomplete por usuário
+    RATE_LIMIT_BUSCA_BURST: int = 20
+    KPI_MISS_CONCURRENCY: int = 2  # por KPI (prefixo de cache), somando todos os workers
+    KPI_MISS_LEASE_SECONDS: float = 60.0  # vaga de um cálculo interrompido expira depois disso
+    KPI_MISS_RETRY_AFTER_SECONDS: float = 2.0
+    KPI_STALE_TTL_SECONDS: int = 86400
+
+    # Consulta de KPIs em lote (POST /dashboard/query)
+    DASHBOARD_QUERY_MAX_SPECS: int = 50
+    DASHBOARD_QUERY_CONCURRENCY: int = 4  # KPIs fora do cache calculados em paralelo por requisição
+
+    # Cache da listagem/detalhe de coletas, invalidado por assinatura de filtros (core/coletas_cache.py)
+    COLETAS_CACHE_TTL_SECONDS: int = 300
+
+    # Notificações de mudança para os dashboards (SSE), via Redis pub/sub
+    EVENTS_CHANNEL: str = "eventos:dados"
+    EVENTS_DEBOUNCE_SECONDS: float = 0.5
+    EVENTS_KEEPALIVE_SECONDS: float = 15.0
+    EVENTS_MAX_CLIENTS: int = 500
+
     model_config = SettingsConfigDict(env_file=".env", extra="ignore")
 
-settings = Settings()
\ No newline at end of file
+settings = Settings()
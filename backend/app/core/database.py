@@ -1,37 +1,264 @@
-from sqlalchemy import create_engine, Column, Integer, String, DateTime, Numeric
-from sqlalchemy.orm import sessionmaker, declarative_base
+import os
+import threading
+from typing import Any, Dict, Optional
+from sqlalchemy import (
+    create_engine, func, Column, BigInteger, Integer, SmallInteger, String, Text, Float, Date, DateTime,
+    Index, ForeignKey
+)
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session, sessionmaker, declarative_base
+from sqlalchemy.pool import NullPool, QueuePool
 from .config import settings
 
 
-DATABASE_URL = (
-    f"postgresql://{settings.DB_USER}:{settings.DB_PASSWORD}@"
-    f"{settings.DB_HOST}:{settings.DB_PORT}/{settings.DB_NAME}"
-)
+def _database_url(host: str, port: int) -> str:
+    return (
+        f"postgresql+psycopg2://{settings.DB_USER}:{settings.DB_PASSWORD}@"
+        f"{host}:{port}/{settings.DB_NAME}"
+    )
+
+DATABASE_URL = _database_url(settings.DB_HOST, settings.DB_PORT)
+
+def _replica_urls(hosts: str) -> Dict[str, str]:
+    urls = {}
+    for entry in filter(None, (part.strip() for part in hosts.split(","))):
+        host, _, port = entry.partition(":")
+        urls[f"replica-{entry}"] = _database_url(host, int(port or settings.DB_PORT))
+    return urls
+
+# Réplicas de leitura configuradas, por nome do pool ("replica-host:porta")
+REPLICA_URLS = _replica_urls(settings.DB_REPLICA_HOSTS)
+
+
+def build_engine(
+    pool_size: int,
+    max_overflow: int,
+    application_name: str,
+    url: str = DATABASE_URL,
+    connect_timeout: Optional[int] = None,
+) -> Engine:
+    # Identifica o pool no pg_stat_activity
+    connect_args: Dict[str, Any] = {"application_name": application_name}
+    if connect_timeout is not None:
+        connect_args["connect_timeout"] = connect_timeout
+
+    engine_kwargs: Dict[str, Any] = {
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+        "connect_args": connect_args,
+    }
+
+    if settings.DB_PGBOUNCER_MODE:
+        # O PgBouncer já faz o pool. O psycopg2 não usa prepared statements no servidor,
+        # então basta não manter conexões presas no worker.
+        engine_kwargs["poolclass"] = NullPool
+    else:
+        engine_kwargs.update(
+            poolclass=QueuePool,
+            pool_size=pool_size,
+            max_overflow=max_overflow,
+            pool_timeout=settings.DB_POOL_TIMEOUT,
+            pool_recycle=settings.DB_POOL_RECYCLE,
+            pool_use_lifo=settings.DB_POOL_USE_LIFO,
+        )
+
+    return create_engine(url, **engine_kwargs)
+
+
+# Engines preguiçosos: nada é criado no import. Com o app pré-carregado no processo pai (gunicorn
+# --preload), cada worker cria os próprios pools depois do fork, sem herdar sockets do pai.
+_engines: Dict[str, Engine] = {}
+_engines_lock = threading.Lock()
+
+def _get_or_build_engine(name: str, pool_size: int, max_overflow: int, **kwargs: Any) -> Engine:
+    db_engine = _engines.get(name)
+    if db_engine is None:
+        with _engines_lock:
+            db_engine = _engines.get(name)
+            if db_engine is None:
+                db_engine = _engines[name] = build_engine(pool_size, max_overflow, f"fuelsense-{name}", **kwargs)
+    return db_engine
+
+# Pool de escrita (ingestão IoT, CRUD de coletas, autenticação)
+def get_engine() -> Engine:
+    return _get_or_build_engine("escrita", settings.DB_POOL_SIZE, settings.DB_MAX_OVERFLOW)
 
+# Pool de leitura no primário (agregações do dashboard e consultas de motoristas sem réplica disponível)
+def get_read_engine() -> Engine:
+    return _get_or_build_engine("leitura", settings.DB_READ_POOL_SIZE, settings.DB_READ_MAX_OVERFLOW)
 
-engine = create_engine(DATABASE_URL, pool_pre_ping=True)
+# Pool de leitura numa réplica (ver core/replicas.py para a escolha da réplica)
+def get_replica_engine(name: str) -> Engine:
+    return _get_or_build_engine(
+        name, settings.DB_READ_POOL_SIZE, settings.DB_READ_MAX_OVERFLOW,
+        url=REPLICA_URLS[name], connect_timeout=settings.DB_REPLICA_CONNECT_TIMEOUT,
+    )
 
+def reset_engines():
+    # Após o fork: descarta os pools herdados sem fechar as conexões, que pertencem ao pai
+    for db_engine in _engines.values():
+        db_engine.dispose(close=False)
+    _engines.clear()
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+os.register_at_fork(after_in_child=reset_engines)
+
+
+_session_factory = sessionmaker(autocommit=False, autoflush=False)
+
+def SessionLocal() -> Session:
+    return _session_factory(bind=get_engine())
+
+def ReadSessionLocal() -> Session:
+    return _session_factory(bind=get_read_engine())
+
+def ReplicaSessionLocal(name: str) -> Session:
+    return _session_factory(bind=get_replica_engine(name))
 
 Base = declarative_base()
 
+# Dimensões: cada posto, motorista e veículo é gravado uma vez por tenant e referenciado por chave
+# inteira. A chave natural inclui o coreid (migração 0007): o nome que um cliente envia não renomeia
+# o posto ou o motorista de outro
+class PostoModel(Base):
+    __tablename__ = "postos"
+
+    id = Column(Integer, primary_key=True)
+    coreid = Column(String, nullable=False)
+    identificador = Column(String, nullable=False)
+    nome = Column(String, nullable=False)
+    cidade = Column(String, nullable=False)
+    estado = Column(String(2), index=True, nullable=False)
+
+    __table_args__ = (
+        Index("uq_postos_tenant_identificador", "coreid", "identificador", unique=True),
+    )
+
+class MotoristaModel(Base):
+    __tablename__ = "motoristas"
+
+    id = Column(Integer, primary_key=True)
+    coreid = Column(String, nullable=False)
+    cpf = Column(String, nullable=False)
+    nome = Column(String, nullable=False)
+
+    __table_args__ = (
+        Index("uq_motoristas_tenant_cpf", "coreid", "cpf", unique=True),
+        # Busca por trecho do nome (ILIKE '%termo%') no autocomplete (migração 0003, pg_trgm)
+        Index("ix_motoristas_nome_trgm", "nome", postgresql_using="gin", postgresql_ops={"nome": "gin_trgm_ops"}),
+    )
+
+class VeiculoModel(Base):
+    __tablename__ = "veiculos"
+
+    id = Column(Integer, primary_key=True)
+    coreid = Column(String, nullable=False)
+    placa = Column(String, nullable=False)
+    tipo_veiculo_codigo = Column(SmallInteger, nullable=False)
+
+    __table_args__ = (
+        Index("uq_veiculos_tenant_placa", "coreid", "placa", unique=True),
+        Index("ix_veiculos_placa_trgm", "placa", postgresql_using="gin", postgresql_ops={"placa": "gin_trgm_ops"}),
+    )
+
 class ColetaModel(Base):
     __tablename__ = "coletas"
 
     id = Column(Integer, primary_key=True, index=True)
-    posto_identificador = Column(String, index=True, nullable=False)
-    posto_nome = Column(String, nullable=False)
-    cidade = Column(String, nullable=False)
-    estado = Column(String, nullable=False)
+    coreid = Column(String, nullable=False)  # tenant dono da coleta (coreid do usuário que a enviou)
     data_coleta = Column(DateTime, nullable=False)
-    tipo_combustivel = Column(String, nullable=False)
-    preco_venda = Column(Numeric(10, 2), nullable=False)
-    volume_vendido = Column(Numeric(10, 2), nullable=False)
-    motorista_nome = Column(String, nullable=False)
-    motorista_cpf = Column(String, nullable=False)
-    veiculo_placa = Column(String, index=True, nullable=False)
-    tipo_veiculo = Column(String, nullable=False)
+    # Ponto fixo (migração 0006): a API converte de/para reais e litros (models/coleta.py)
+    preco_centavos = Column(Integer, nullable=False)
+    volume_centilitros = Column(Integer, nullable=False)
+
+    # Chaves das dimensões e códigos smallint de FuelType/VehicleType. Os textos (posto, cidade,
+    # estado, motorista, placa, tipos) vêm das dimensões: ver COLETA_TEXT_COLUMNS em core/dimensions.py
+    posto_id = Column(Integer, ForeignKey("postos.id"), index=True, nullable=False)
+    motorista_id = Column(Integer, ForeignKey("motoristas.id"), index=True, nullable=False)
+    veiculo_id = Column(Integer, ForeignKey("veiculos.id"), index=True, nullable=False)
+    tipo_combustivel_codigo = Column(SmallInteger, nullable=False)
+    tipo_veiculo_codigo = Column(SmallInteger, nullable=False)
+
+    # Chave natural: retries do mesmo dispositivo não geram linhas duplicadas. O tenant abre todos os
+    # índices usados pelas consultas (migração 0005): cada cliente varre só a própria faixa do índice.
+    # Posto e veículo pelas chaves das dimensões (migração 0008), únicas por tenant e identificador/placa
+    __table_args__ = (
+        Index(
+            "uq_coletas_tenant_chave_natural",
+            "coreid", "posto_id", "data_coleta", "veiculo_id",
+            unique=True,
+        ),
+        # Histórico de preços por hora: combustível e período só no índice (migrações 0002 e 0005)
+        Index(
+            "ix_coletas_tenant_combustivel_data",
+            "coreid", "tipo_combustivel_codigo", "data_coleta",
+            postgresql_include=["preco_centavos"],
+        ),
+        # Listagem paginada por id, ranking de motoristas e autocomplete, por tenant
+        Index("ix_coletas_tenant_id", "coreid", "id"),
+        Index("ix_coletas_tenant_motorista", "coreid", "motorista_id"),
+        Index("ix_coletas_tenant_veiculo", "coreid", "veiculo_id"),
+    )
+
+# Histograma de preços por centavo (tenant x combustível x estado x dia): um sketch de quantis exato
+# e mesclável, mantido na mesma transação das escritas em coletas (ver core/rollups.py)
+class PrecoHistogramaModel(Base):
+    __tablename__ = "preco_histograma"
+
+    coreid = Column(String, primary_key=True)
+    tipo_combustivel_codigo = Column(SmallInteger, primary_key=True)
+    estado = Column(String(2), primary_key=True)
+    dia = Column(Date, primary_key=True)
+    preco_centavos = Column(Integer, primary_key=True)
+    quantidade = Column(Integer, nullable=False)
+
+# Cubo de KPIs: uma célula por tenant x estado x cidade x posto x combustível x veículo x dia, mantida
+# junto com o histograma. Médias saem de soma_preco_centavos / quantidade; nada aqui depende de ler
+# coletas. Medidas inteiras, como em coletas; a receita em centésimos de centavo (centavos x centilitros)
+class KpiCuboModel(Base):
+    __tablename__ = "kpi_cubo"
+
+    coreid = Column(String, primary_key=True)
+    estado = Column(String(2), primary_key=True)
+    cidade = Column(String, primary_key=True)
+    posto_id = Column(Integer, primary_key=True)
+    tipo_combustivel_codigo = Column(SmallInteger, primary_key=True)
+    tipo_veiculo_codigo = Column(SmallInteger, primary_key=True)
+    dia = Column(Date, primary_key=True)
+    quantidade = Column(Integer, nullable=False)
+    volume_centilitros = Column(BigInteger, nullable=False)
+    soma_preco_centavos = Column(BigInteger, nullable=False)
+    receita_centesimos_centavo = Column(BigInteger, nullable=False)
+
+    __table_args__ = (
+        Index("ix_kpi_cubo_dia", "dia"),
+    )
+
+# Arquivos de coletas arquivadas (core/archive.py): um por lote, em settings.ARCHIVE_DIR
+class ArquivoColetasModel(Base):
+    __tablename__ = "coletas_arquivo"
+
+    id = Column(Integer, primary_key=True)
+    arquivo = Column(String, unique=True, nullable=False)  # nome do .npz, relativo ao ARCHIVE_DIR
+    inicio = Column(DateTime, nullable=False)  # menor e maior data_coleta do arquivo
+    fim = Column(DateTime, nullable=False)
+    corte = Column(DateTime, nullable=False)  # horizonte da execução: todo o arquivo é anterior a ele
+    linhas = Column(Integer, nullable=False)
+    criado_em = Column(DateTime, nullable=False, server_default=func.now())
+
+# Leituras retidas (ou só sinalizadas) pela detecção de anomalias da ingestão
+class QuarentenaModel(Base):
+    __tablename__ = "coletas_quarentena"
+
+    id = Column(Integer, primary_key=True, index=True)
+    chave = Column(String, unique=True, nullable=False)  # chave natural (tenant|posto|data|placa)
+    payload = Column(Text, nullable=False)  # ColetaCreate em JSON, como recebido
+    coreid = Column(String, index=True, nullable=False)
+    posto_identificador = Column(String, index=True)
+    motivo = Column(String, nullable=False)
+    score = Column(Float)
+    status = Column(String(20), nullable=False, index=True)  # quarentena | sinalizada | readmitida | descartada
+    coleta_id = Column(Integer, ForeignKey("coletas.id", ondelete="SET NULL"), nullable=True)
+    criado_em = Column(DateTime, nullable=False, server_default=func.now())
+    resolvido_em = Column(DateTime, nullable=True)
 
 class UserModel(Base):
     __tablename__ = "usuarios"
@@ -43,11 +270,49 @@ class UserModel(Base):
     coreid = Column(String, nullable=False)
 
 def init_db():
-    Base.metadata.create_all(bind=engine)
+    # O esquema é versionado com Alembic (migrations/). Em produção as migrações rodam uma vez no
+    # entrypoint, antes dos workers; aqui é o atalho para scripts e testes.
+    from alembic import command
+    from alembic.config import Config
+
+    config = Config(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "alembic.ini"))
+    command.upgrade(config, "head")
 
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+def _pool_status(db_engine: Optional[Engine], max_overflow: int) -> Dict[str, Any]:
+    if db_engine is None:
+        return {"pool": "não inicializado"}
+
+    pool = db_engine.pool
+
+    if isinstance(pool, NullPool):
+        return {"pool": "NullPool"}
+
+    checked_out = pool.checkedout()
+    max_capacity = pool.size() + max_overflow
+
+    return {
+        "pool": type(pool).__name__,
+        "size": pool.size(),
+        "checked_in": pool.checkedin(),
+        "checked_out": checked_out,
+        "overflow": pool.overflow(),
+        "max_capacity": max_capacity,
+        "saturation": round(checked_out / max_capacity, 2) if max_capacity else 0.0,
+    }
+
+def get_pools_status() -> Dict[str, Dict[str, Any]]:
+    return {
+        "escrita": _pool_status(_engines.get("escrita"), settings.DB_MAX_OVERFLOW),
+        "leitura": _pool_status(_engines.get("leitura"), settings.DB_READ_MAX_OVERFLOW),
+        **{
+            name: _pool_status(_engines.get(name), settings.DB_READ_MAX_OVERFLOW)
+            for name in REPLICA_URLS
+        },
+    }
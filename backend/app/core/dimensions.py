@@ -0,0 +1,176 @@
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional, Sequence, Tuple
+from sqlalchemy import case, event
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Query, Session
+from core.config import settings
+from core.database import ColetaModel, MotoristaModel, PostoModel, VeiculoModel
+from models.coleta import FUEL_TYPE_BY_CODE, FUEL_TYPE_CODES, VEHICLE_TYPE_BY_CODE, VEHICLE_TYPE_CODES
+
+
+class DimensionCache:
+    # LRU em memória: (atributos da dimensão) -> id. Evita o upsert quando o posto,
+    # motorista ou veículo já foi visto por este worker com os mesmos atributos.
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._items: "OrderedDict[Hashable, int]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[int]:
+        with self._lock:
+            value = self._items.get(key)
+            if value is not None:
+                self._items.move_to_end(key)
+            return value
+
+    def put(self, key: Hashable, value: int):
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+
+POSTO_CACHE = DimensionCache(settings.DIMENSION_CACHE_SIZE)
+MOTORISTA_CACHE = DimensionCache(settings.DIMENSION_CACHE_SIZE)
+VEICULO_CACHE = DimensionCache(settings.DIMENSION_CACHE_SIZE)
+
+# Campos de texto de uma coleta na API -> de onde vêm: coletas guarda só as chaves das dimensões e os
+# códigos (migração 0008). As consultas selecionam coleta_text_columns() sobre join_dimensions()
+COLETA_TEXT_COLUMNS = {
+    "posto_identificador": PostoModel.identificador,
+    "posto_nome": PostoModel.nome,
+    "cidade": PostoModel.cidade,
+    "estado": PostoModel.estado,
+    "tipo_combustivel": case(FUEL_TYPE_BY_CODE, value=ColetaModel.tipo_combustivel_codigo),
+    "motorista_nome": MotoristaModel.nome,
+    "motorista_cpf": MotoristaModel.cpf,
+    "veiculo_placa": VeiculoModel.placa,
+    "tipo_veiculo": case(VEHICLE_TYPE_BY_CODE, value=ColetaModel.tipo_veiculo_codigo),
+}
+
+
+def coleta_text_columns(*fields: str) -> List[Any]:
+    return [COLETA_TEXT_COLUMNS[field].label(field) for field in fields or COLETA_TEXT_COLUMNS]
+
+
+def join_dimensions(query: Query) -> Query:
+    # Chamado logo após db.query(...): as colunas selecionadas podem começar por uma dimensão
+    return (
+        query.select_from(ColetaModel)
+        .join(PostoModel, PostoModel.id == ColetaModel.posto_id)
+        .join(MotoristaModel, MotoristaModel.id == ColetaModel.motorista_id)
+        .join(VeiculoModel, VeiculoModel.id == ColetaModel.veiculo_id)
+    )
+
+
+STAGED_INFO_KEY = "dimensoes_pendentes"  # em Session.info: ids upsertados na transação ainda aberta
+
+
+def _staged(db: Session) -> Dict[Tuple[DimensionCache, Hashable], int]:
+    return db.info.setdefault(STAGED_INFO_KEY, {})
+
+
+# Os ids só entram no LRU depois do commit: num rollback a linha upsertada some, e um id guardado
+# antes disso viraria ForeignKeyViolation em toda coleta seguinte do mesmo posto/motorista/veículo
+@event.listens_for(Session, "after_commit")
+def _publish_staged(session: Session):
+    for (cache, key), dimension_id in session.info.pop(STAGED_INFO_KEY, {}).items():
+        cache.put(key, dimension_id)
+
+
+# Rollback, ou sessão fechada sem commit: o que sobrou não chegou ao banco
+@event.listens_for(Session, "after_transaction_end")
+def _discard_staged(session: Session, transaction):
+    if transaction.parent is None:
+        session.info.pop(STAGED_INFO_KEY, None)
+
+
+def _resolve(
+    db: Session,
+    model,
+    natural_column: str,
+    cache: DimensionCache,
+    values: List[Dict[str, Any]],
+    update_columns: Optional[Sequence[str]] = None,
+) -> Dict[Tuple, int]:
+    # Resolve os ids de um lote; só os atributos fora do cache vão para o upsert (um por lote).
+    # A chave natural é (coreid, natural_column): cada tenant tem a própria linha da dimensão.
+    # O upsert atualiza update_columns (por padrão todos os atributos)
+    resolved: Dict[Tuple, int] = {}
+    missing: Dict[Tuple, Dict[str, Any]] = {}
+    staged = _staged(db)
+
+    for value in values:
+        key = tuple(sorted(value.items()))
+        cached_id = cache.get(key) or staged.get((cache, key))
+        if cached_id is not None:
+            resolved[key] = cached_id
+        else:
+            missing[(value["coreid"], value[natural_column])] = value
+
+    if missing:
+        natural_key = ["coreid", natural_column]
+        if update_columns is None:
+            update_columns = [column for column in next(iter(missing.values())) if column not in natural_key]
+        # Ordena pela chave natural para que workers concorrentes travem as linhas na mesma ordem
+        stmt = pg_insert(model).values([missing[natural] for natural in sorted(missing)])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=natural_key,
+            set_={column: stmt.excluded[column] for column in update_columns},
+        ).returning(model.id, model.coreid, getattr(model, natural_column))
+
+        ids_by_natural = {(row[1], row[2]): row[0] for row in db.execute(stmt)}
+        for natural_value, value in missing.items():
+            staged[(cache, tuple(sorted(value.items())))] = ids_by_natural[natural_value]
+        # Variações de atributos dentro do lote apontam para o mesmo id (prevalece a última)
+        for value in values:
+            key = tuple(sorted(value.items()))
+            if key not in resolved:
+                resolved[key] = ids_by_natural[(value["coreid"], value[natural_column])]
+
+    return resolved
+
+
+def attach_dimension_keys(db: Session, rows: List[Dict[str, Any]]):
+    # Preenche posto_id, motorista_id, veiculo_id e os códigos smallint nas linhas de coletas
+    if not rows:
+        return
+
+    postos = [
+        {"coreid": row["coreid"], "identificador": row["posto_identificador"], "nome": row["posto_nome"],
+         "cidade": row["cidade"], "estado": row["estado"]}
+        for row in rows
+    ]
+    motoristas = [
+        {"coreid": row["coreid"], "cpf": row["motorista_cpf"], "nome": row["motorista_nome"]}
+        for row in rows
+    ]
+    veiculos = [
+        {"coreid": row["coreid"], "placa": row["veiculo_placa"],
+         "tipo_veiculo_codigo": VEHICLE_TYPE_CODES[row["tipo_veiculo"]]}
+        for row in rows
+    ]
+
+    # Cidade e estado ficam os do primeiro registro do posto: são chaves do cubo e do histograma, e uma
+    # coleta já dobrada precisa sair dos agregados pelas mesmas células por onde entrou
+    posto_ids = _resolve(db, PostoModel, "identificador", POSTO_CACHE, postos, update_columns=["nome"])
+    motorista_ids = _resolve(db, MotoristaModel, "cpf", MOTORISTA_CACHE, motoristas)
+    veiculo_ids = _resolve(db, VeiculoModel, "placa", VEICULO_CACHE, veiculos)
+
+    for row, posto, motorista, veiculo in zip(rows, postos, motoristas, veiculos):
+        row["posto_id"] = posto_ids[tuple(sorted(posto.items()))]
+        row["motorista_id"] = motorista_ids[tuple(sorted(motorista.items()))]
+        row["veiculo_id"] = veiculo_ids[tuple(sorted(veiculo.items()))]
+        row["tipo_combustivel_codigo"] = FUEL_TYPE_CODES[row["tipo_combustivel"]]
+        row["tipo_veiculo_codigo"] = VEHICLE_TYPE_CODES[row["tipo_veiculo"]]
+
+
+def refresh_dimension_keys(db: Session, coleta: ColetaModel, values: Dict[str, Any]):
+    # Após um PUT que altera posto/motorista/veículo: values são os campos de texto da coleta, já com
+    # a alteração; recalcula as chaves e os códigos da linha
+    row = {**values, "coreid": coleta.coreid}
+    attach_dimension_keys(db, [row])
+    for column in ("posto_id", "motorista_id", "veiculo_id", "tipo_combustivel_codigo", "tipo_veiculo_codigo"):
+        setattr(coleta, column, row[column])
@@ -0,0 +1,138 @@
+import asyncio
+import json
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+import redis
+from core.config import settings
+from core.redis_config import get_redis_client, run_redis_command
+
+EVENT_DATA_CHANGED = "dados_atualizados"
+
+Client = Tuple[asyncio.AbstractEventLoop, "asyncio.Queue[Dict[str, Any]]"]
+
+
+class DataEventBroadcaster:
+    # Uma assinatura de pub/sub por worker, repassada aos clientes SSE conectados a ele do tenant
+    # que escreveu. Rajadas de escrita (lotes do worker de ingestão, cargas em massa) viram um único
+    # evento por tenant e janela de debounce: os dashboards recarregam uma vez, não uma vez por coleta.
+    def __init__(self, channel: str, debounce: float):
+        self.channel = channel
+        self.debounce = debounce
+        self._clients: Dict[Client, str] = {}  # cliente -> tenant
+        self._lock = threading.Lock()
+        self._pending: Dict[str, Dict[str, Any]] = {}  # tenant -> evento acumulado
+        self._deadlines: Dict[str, float] = {}
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def client_count(self) -> int:
+        return len(self._clients)
+
+    def subscribe(self, tenant: str) -> Client:
+        # Fila de tamanho 1: o evento é só um aviso de mudança, então um cliente lento
+        # não acumula notificações (a que já está na fila basta para ele recarregar)
+        client = (asyncio.get_running_loop(), asyncio.Queue(maxsize=1))
+        with self._lock:
+            self._clients[client] = tenant
+        self.start()
+        return client
+
+    def unsubscribe(self, client: Client):
+        with self._lock:
+            self._clients.pop(client, None)
+
+    def notify(self, event: Dict[str, Any]):
+        tenant = event.get("coreid")
+        with self._lock:
+            pending = self._pending.get(tenant)
+            if pending is None:
+                pending = self._pending[tenant] = {"eventos": 0, "last_update_timestamp": None}
+                self._deadlines[tenant] = time.monotonic() + self.debounce
+            pending["eventos"] += event.get("eventos", 1)
+            pending["last_update_timestamp"] = max(
+                pending["last_update_timestamp"] or 0, event.get("last_update_timestamp") or 0
+            ) or None
+
+    def _flush_due(self):
+        now = time.monotonic()
+        with self._lock:
+            due = [tenant for tenant, deadline in self._deadlines.items() if deadline <= now]
+            deliveries = []
+            for tenant in due:
+                event = self._pending.pop(tenant)
+                del self._deadlines[tenant]
+                deliveries.extend((client, event) for client, owner in self._clients.items() if owner == tenant)
+
+        for (loop, queue), event in deliveries:
+            loop.call_soon_threadsafe(self._offer, queue, event)
+
+    @staticmethod
+    def _offer(queue: asyncio.Queue, event: Dict[str, Any]):
+        try:
+            queue.put_nowait(event)
+        except asyncio.QueueFull:
+            pass
+
+    def _next_timeout(self) -> float:
+        with self._lock:
+            if not self._deadlines:
+                return 0.5
+            deadline = min(self._deadlines.values())
+        return max(0.0, min(0.5, deadline - time.monotonic()))
+
+    def _listen(self, client: redis.Redis):
+        pubsub = client.pubsub(ignore_subscribe_messages=True)
+        try:
+            pubsub.subscribe(self.channel)
+            while not self._stop_event.is_set():
+                message = pubsub.get_message(timeout=self._next_timeout())
+                if message is not None:
+                    try:
+                        self.notify(json.loads(message["data"]))
+                    except (TypeError, ValueError):
+                        print(f"AVISO: evento inválido no canal {self.channel} ignorado.")
+                self._flush_due()
+        finally:
+            pubsub.close()
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            client = get_redis_client()
+            if client is not None:
+                try:
+                    self._listen(client)
+                    continue
+                except redis.RedisError as e:
+                    print(f"AVISO: assinatura de eventos perdida ({e}). Reconectando...")
+            # Sem Redis, continua entregando os eventos publicados localmente por este worker
+            self._flush_due()
+            self._stop_event.wait(self._next_timeout() or 0.1)
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="data-events", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+
+
+DATA_EVENTS = DataEventBroadcaster(
+    channel=settings.EVENTS_CHANNEL,
+    debounce=settings.EVENTS_DEBOUNCE_SECONDS,
+)
+
+
+def publish_data_changed(timestamp: int, tenant: str):
+    event = {"eventos": 1, "last_update_timestamp": timestamp, "coreid": tenant}
+    receivers = run_redis_command(lambda r: r.publish(settings.EVENTS_CHANNEL, json.dumps(event)))
+    if receivers is None:
+        # Redis fora do ar: ao menos os dashboards conectados a este worker são avisados
+        DATA_EVENTS.notify(event)
+
+
+def stop_data_events():
+    DATA_EVENTS.stop()
@@ -0,0 +1,96 @@
+import threading
+import time
+from typing import Any, Dict, Optional
+from sqlalchemy import text
+from core.config import settings
+from core.database import get_engine, get_pools_status
+from core.redis_config import check_redis_health
+from core.replicas import REPLICA_MONITOR
+
+
+class HealthProber:
+    def __init__(self, interval: float, saturation_limit: float):
+        self.interval = interval
+        self.saturation_limit = saturation_limit
+        self._snapshot: Dict[str, Any] = {
+            "ready": False,
+            "database_status": "desconhecido",
+            "redis_status": "desconhecido",
+            "database_pools": {},
+            "replicas": {},
+            "checked_at": None,
+        }
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def snapshot(self) -> Dict[str, Any]:
+        return self._snapshot
+
+    def _check_database(self) -> str:
+        try:
+            with get_engine().connect() as conn:
+                conn.execute(text("SELECT 1"))
+            return "ok"
+        except Exception as e:
+            print(f"Erro na conexão com o DB: {e}")
+            return "error"
+
+    def probe_once(self):
+        pools = get_pools_status()
+        # Checa a saturação antes do SELECT 1, que também ocupa um slot do pool de escrita
+        pool_exhausted = any(
+            pool.get("saturation", 0.0) >= self.saturation_limit for pool in pools.values()
+        )
+        db_status = self._check_database()
+        redis_status = check_redis_health()
+        # Réplicas não afetam o readiness: sem elas as leituras voltam para o primário
+        REPLICA_MONITOR.check()
+
+        # O Redis é só cache: fora do ar ele degrada a performance, mas não tira a API do ar
+        self._snapshot = {
+            "ready": db_status == "ok" and not pool_exhausted,
+            "database_status": db_status,
+            "redis_status": redis_status,
+            "pool_exhausted": pool_exhausted,
+            "database_pools": pools,
+            "replicas": REPLICA_MONITOR.status(),
+            "checked_at": time.time(),
+        }
+
+    def is_stale(self) -> bool:
+        checked_at = self._snapshot.get("checked_at")
+        return checked_at is None or time.time() - checked_at > self.interval * 3
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            try:
+                self.probe_once()
+            except Exception as e:
+                print(f"ERRO no health probe: {e}")
+            self._stop_event.wait(self.interval)
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="health-prober", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def is_alive(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+
+HEALTH_PROBER = HealthProber(
+    interval=settings.HEALTH_PROBE_INTERVAL_SECONDS,
+    saturation_limit=settings.HEALTH_POOL_SATURATION_LIMIT,
+)
+
+def start_health_prober():
+    HEALTH_PROBER.start()
+
+def stop_health_prober():
+    HEALTH_PROBER.stop()
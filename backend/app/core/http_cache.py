@@ -0,0 +1,67 @@
+import hashlib
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Optional
+from fastapi import HTTPException, Request, Response, status
+from core.authguard import extract_token, token_tenant
+from core.cache_utils import get_data_state
+from core.security import decode_token
+
+
+def build_etag(request: Request, version: int, tenant: Optional[str] = None) -> str:
+    # Versão dos dados + tenant + rota + parâmetros (ordenados): a mesma consulta sobre os mesmos
+    # dados sempre gera o mesmo ETag, em qualquer worker
+    query = "&".join(f"{k}={v}" for k, v in sorted(request.query_params.multi_items()))
+    digest = hashlib.blake2b(f"{tenant}:{request.url.path}?{query}".encode("utf-8"), digest_size=8).hexdigest()
+    return f'W/"{version}-{digest}"'
+
+
+def _not_modified(request: Request, etag: str, last_update: Optional[int]) -> bool:
+    if_none_match = request.headers.get("If-None-Match")
+    if if_none_match is not None:
+        # If-None-Match tem precedência sobre If-Modified-Since (RFC 9110)
+        candidates = {candidate.strip() for candidate in if_none_match.split(",")}
+        return "*" in candidates or etag in candidates or etag[2:] in candidates
+
+    if_modified_since = request.headers.get("If-Modified-Since")
+    if if_modified_since and last_update is not None:
+        try:
+            return last_update <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def _has_valid_token(request: Request) -> bool:
+    token = extract_token(request)
+    payload = decode_token(token) if token else None
+    return payload is not None and payload.get("user_id") is not None
+
+
+# Dependência de router, resolvida antes do CurrentUser: um 304 custa só uma ida ao Redis e a
+# verificação da assinatura/expiração do JWT, sem consulta do usuário no banco, cache ou serialização.
+# A resposta 304 não tem corpo, então nenhum dado vaza para um token válido de usuário removido.
+def conditional_get(request: Request, response: Response):
+    if request.method not in ("GET", "HEAD"):
+        return
+
+    # Versão do tenant do token: escritas de outros clientes não invalidam os ETags deste. Token sem
+    # o claim coreid cai na versão global, que muda com qualquer escrita (nunca um 304 indevido)
+    tenant = token_tenant(request)
+    state = get_data_state(tenant)
+    if state is None:
+        return  # Sem Redis não há versão confiável: responde normalmente, sem validadores
+
+    version, last_update = state
+    headers = {
+        "ETag": build_etag(request, version, tenant),
+        "Cache-Control": "private, no-cache",
+    }
+    if last_update is not None:
+        headers["Last-Modified"] = formatdate(last_update, usegmt=True)
+
+    if _not_modified(request, headers["ETag"], last_update) and _has_valid_token(request):
+        raise HTTPException(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    response.headers.update(headers)
+    # Respostas devolvidas direto do cache (bytes) não passam pelo merge de headers do FastAPI
+    request.state.cache_headers = headers
@@ -0,0 +1,146 @@
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Set, Tuple
+from sqlalchemy import tuple_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+from core.database import ColetaModel, PostoModel, VeiculoModel
+from core.dedup import DUPLICATE_FILTER, NaturalKey, natural_key_str
+from core.anomaly import MODE_QUARANTINE, record_anomalies, score_coletas, stage_statistics
+from core.config import settings
+from core.dimensions import attach_dimension_keys
+from core.rollups import fold_rollups
+from models.coleta import ColetaCreate, to_storage
+
+# Chave natural como a API a recebe (posto e placa em texto), lida pelas dimensões. No banco o índice
+# único é o equivalente com as chaves delas (STORED_KEY_COLUMNS)
+NATURAL_KEY_COLUMNS = [
+    ColetaModel.coreid,
+    PostoModel.identificador,
+    ColetaModel.data_coleta,
+    VeiculoModel.placa,
+]
+STORED_KEY_COLUMNS = [ColetaModel.coreid, ColetaModel.posto_id, ColetaModel.data_coleta, ColetaModel.veiculo_id]
+# Campos de coleta_to_row que são colunas de coletas (os textos ficam nas dimensões)
+STORED_COLUMNS = [column.name for column in ColetaModel.__table__.columns if column.name != "id"]
+
+
+def coleta_to_row(coleta: ColetaCreate) -> Dict[str, Any]:
+    # Preço e volume em ponto fixo, como nas colunas de coletas
+    row = to_storage(coleta.model_dump())
+    # A coluna é "timestamp without time zone": datas com fuso são gravadas em UTC,
+    # assim a chave natural calculada aqui é a mesma que volta do banco
+    data_coleta: datetime = row["data_coleta"]
+    if data_coleta.tzinfo is not None:
+        row["data_coleta"] = data_coleta.astimezone(timezone.utc).replace(tzinfo=None)
+    return row
+
+
+def natural_key(row: Dict[str, Any]) -> NaturalKey:
+    return (row["coreid"], row["posto_identificador"], row["data_coleta"], row["veiculo_placa"])
+
+
+def _by_natural_key(query):
+    return (
+        query.select_from(ColetaModel)
+        .join(PostoModel, PostoModel.id == ColetaModel.posto_id)
+        .join(VeiculoModel, VeiculoModel.id == ColetaModel.veiculo_id)
+    )
+
+
+def _existing_keys(db: Session, keys: Set[NaturalKey]) -> Set[NaturalKey]:
+    rows = (
+        _by_natural_key(db.query(*NATURAL_KEY_COLUMNS))
+        .filter(tuple_(*NATURAL_KEY_COLUMNS).in_(list(keys)))
+        .all()
+    )
+    return {tuple(row) for row in rows}
+
+
+def find_coleta_id(db: Session, coleta: ColetaCreate) -> Optional[int]:
+    key = natural_key(coleta_to_row(coleta))
+    return (
+        _by_natural_key(db.query(ColetaModel.id))
+        .filter(tuple_(*NATURAL_KEY_COLUMNS) == key)
+        .scalar()
+    )
+
+
+# Ponto único de escrita de coletas, usado pelo POST síncrono, pelo lote e pelo worker da fila.
+# Retorna, na ordem de entrada, o id gravado ou None para duplicatas; o commit fica com o chamador.
+def insert_coletas(db: Session, coletas: List[ColetaCreate]) -> List[Optional[int]]:
+    if not coletas:
+        return []
+
+    rows = [coleta_to_row(coleta) for coleta in coletas]
+    keys = [natural_key(row) for row in rows]
+
+    # 1. Filtro de Bloom: só as chaves "talvez vistas" são confirmadas no banco (um SELECT por lote)
+    maybe_seen = DUPLICATE_FILTER.might_contain([natural_key_str(key) for key in keys])
+    suspects = {key for key, seen in zip(keys, maybe_seen) if seen}
+    already_stored = _existing_keys(db, suspects) if suspects else set()
+
+    # 2. Descarta duplicatas confirmadas e repetições dentro do próprio lote
+    pending: Dict[NaturalKey, Dict[str, Any]] = {}
+    for key, row in zip(keys, rows):
+        if key not in already_stored and key not in pending:
+            pending[key] = row
+
+    # 3. INSERT em lote; o índice único resolve as corridas entre workers e os falsos negativos
+    inserted: Dict[NaturalKey, int] = {}
+    if pending:
+        attach_dimension_keys(db, list(pending.values()))
+        by_stored_key = {
+            tuple(row[column.name] for column in STORED_KEY_COLUMNS): key for key, row in pending.items()
+        }
+        stmt = (
+            pg_insert(ColetaModel)
+            .on_conflict_do_nothing(index_elements=[column.name for column in STORED_KEY_COLUMNS])
+            .returning(ColetaModel.id, *STORED_KEY_COLUMNS)
+        )
+        values = [{column: row[column] for column in STORED_COLUMNS} for row in pending.values()]
+        for row in db.execute(stmt, values):
+            inserted[by_stored_key[(row.coreid, row.posto_id, row.data_coleta, row.veiculo_id)]] = row.id
+        DUPLICATE_FILTER.add([natural_key_str(key) for key in inserted])
+        # Agregados na mesma transação: só as linhas realmente gravadas entram
+        if inserted:
+            fold_rollups(db, ColetaModel.id.in_(list(inserted.values())))
+
+    ids: List[Optional[int]] = []
+    for key in keys:
+        ids.append(inserted.pop(key, None))
+    return ids
+
+
+# Etapa de validação + gravação usada pelas rotas e pelo worker. Leituras anômalas são retidas na
+# quarentena (ou gravadas e só sinalizadas, conforme ANOMALY_MODE). Retorna, alinhados com a entrada,
+# o id gravado em coletas e o id da quarentena das leituras retidas.
+def ingest_coletas(db: Session, coletas: List[ColetaCreate]) -> Tuple[List[Optional[int]], List[Optional[int]]]:
+    anomalies = score_coletas(coletas)
+    hold = settings.ANOMALY_MODE == MODE_QUARANTINE
+
+    admitted = [coleta for coleta, anomaly in zip(coletas, anomalies) if anomaly is None or not hold]
+    admitted_ids = iter(insert_coletas(db, admitted))
+    ids = [None if anomaly is not None and hold else next(admitted_ids) for anomaly in anomalies]
+
+    # Anomalias retidas sempre entram na quarentena; sinalizadas só quando foram de fato gravadas
+    recorded = [
+        i for i, (anomaly, coleta_id) in enumerate(zip(anomalies, ids))
+        if anomaly is not None and (hold or coleta_id is not None)
+    ]
+    entries = [
+        (coletas[i], natural_key_str(natural_key(coleta_to_row(coletas[i]))), anomalies[i], ids[i])
+        for i in recorded
+    ]
+    entry_ids = record_anomalies(db, entries, status="quarentena" if hold else "sinalizada")
+
+    quarantine_ids: List[Optional[int]] = [None] * len(coletas)
+    if hold:
+        for i, entry_id in zip(recorded, entry_ids):
+            quarantine_ids[i] = entry_id
+
+    # Gravadas e retidas entram nas janelas de preço (a mediana tolera as anômalas); duplicatas não
+    stage_statistics(db, [
+        coleta for coleta, coleta_id, quarantine_id in zip(coletas, ids, quarantine_ids)
+        if coleta_id is not None or quarantine_id is not None
+    ])
+    return ids, quarantine_ids
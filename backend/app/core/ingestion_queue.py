@@ -0,0 +1,393 @@
+import fcntl
+import glob
+import json
+import os
+import socket
+import threading
+import time
+from collections import deque
+from itertools import islice
+from typing import Any, Deque, Dict, List, Optional, Tuple
+import redis
+from sqlalchemy.exc import InterfaceError, OperationalError
+from core.config import settings
+from core.database import SessionLocal
+from core.cache_utils import mark_data_changed
+from core.coletas_cache import coleta_filter_values, invalidate_coletas_cache
+from core.ingestion import ingest_coletas
+from core.redis_config import run_redis_command
+from models.coleta import ColetaCreate
+
+# Banco fora do ar ou conexão perdida: a coleta não tem culpa, tenta de novo sem limite de tentativas
+TRANSIENT_ERRORS = (OperationalError, InterfaceError)
+DEAD_LETTER_FILE = "ingestao-mortas.jsonl"
+
+
+class IngestionQueueFull(Exception):
+    pass
+
+
+class IngestionQueueUnavailable(Exception):
+    pass
+
+
+class LocalWriteAheadQueue:
+    # Fila em memória com WAL em disco (uma linha JSON por coleta, fsync a cada append).
+    # Cada processo escreve no próprio arquivo e mantém um flock nele; arquivos sem dono
+    # (processos que morreram) são absorvidos na inicialização.
+    def __init__(self, wal_dir: str):
+        os.makedirs(wal_dir, exist_ok=True)
+        self.wal_dir = wal_dir
+        self.path = os.path.join(wal_dir, f"ingestao-{socket.gethostname()}-{os.getpid()}.wal")
+        self._items: Deque[str] = deque()
+        self._lock = threading.Lock()
+
+        self._file = open(self.path, "a+", encoding="utf-8")
+        fcntl.flock(self._file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        # Mesmo PID de uma execução anterior (comum em containers): reaproveita o conteúdo
+        self._file.seek(0)
+        self._items.extend(line.strip() for line in self._file if line.strip())
+        self._recover_orphans()
+
+    def _recover_orphans(self):
+        for path in glob.glob(os.path.join(self.wal_dir, "*.wal")):
+            if path == self.path:
+                continue
+            try:
+                with open(path, "r", encoding="utf-8") as orphan:
+                    try:
+                        fcntl.flock(orphan, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    except BlockingIOError:
+                        continue  # pertence a um processo vivo
+                    if os.fstat(orphan.fileno()).st_nlink == 0:
+                        continue  # já recuperado por outro processo
+                    payloads = [line.strip() for line in orphan if line.strip()]
+                    for payload in payloads:
+                        self.append(payload)
+                    os.remove(path)
+                if payloads:
+                    print(f"INGESTÃO: {len(payloads)} coletas recuperadas do WAL {path}.")
+            except FileNotFoundError:
+                continue
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def append(self, payload: str):
+        with self._lock:
+            self._file.write(payload + "\n")
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._items.append(payload)
+
+    def peek(self, count: int) -> List[str]:
+        with self._lock:
+            return list(islice(self._items, count))
+
+    def ack(self, count: int):
+        with self._lock:
+            for _ in range(count):
+                self._items.popleft()
+            # O WAL só é truncado quando a fila esvazia; um crash antes disso reprocessa
+            # o arquivo inteiro na próxima inicialização.
+            if not self._items:
+                self._file.truncate(0)
+                self._file.flush()
+                os.fsync(self._file.fileno())
+
+    def close(self):
+        self._file.close()
+
+
+class IngestionWorker:
+    def __init__(self):
+        self.stream_key = settings.INGESTION_STREAM_KEY
+        self.group = settings.INGESTION_CONSUMER_GROUP
+        self.consumer = f"{socket.gethostname()}-{os.getpid()}"
+        self.batch_size = settings.INGESTION_BATCH_SIZE
+        self.interval = settings.INGESTION_FLUSH_INTERVAL_SECONDS
+        self.local_queue: Optional[LocalWriteAheadQueue] = None
+
+        self._stream_backlog = 0
+        self._stream_backlog_at = 0.0
+        self._failures: Dict[str, int] = {}  # payload -> falhas seguidas (ver _flush_isolating)
+        self._loop_error: Optional[str] = None
+        self._group_ready = False
+        self._last_claim_at = 0.0
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._metrics: Dict[str, Any] = {
+            "processed_total": 0,
+            "invalid_total": 0,
+            "duplicates_total": 0,
+            "quarantined_total": 0,
+            "dead_letter_total": 0,
+            "batches_total": 0,
+            "last_batch_size": 0,
+            "last_batch_duplicates": 0,
+            "last_batch_seconds": None,
+            "last_flush_at": None,
+            "last_error": None,
+        }
+
+    # --- Produtor (chamado pelas requisições) ---
+
+    def backlog(self) -> int:
+        # O stream é compartilhado por todos os processos: o XLEN é relido a cada
+        # INGESTION_BACKLOG_TTL_SECONDS, não só quando o worker deste processo roda
+        if time.monotonic() - self._stream_backlog_at >= settings.INGESTION_BACKLOG_TTL_SECONDS:
+            self._refresh_backlog()
+        return self._stream_backlog + (len(self.local_queue) if self.local_queue else 0)
+
+    def enqueue(self, coleta: ColetaCreate) -> Tuple[str, Optional[str]]:
+        if self.backlog() >= settings.INGESTION_MAX_PENDING:
+            raise IngestionQueueFull()
+
+        payload = coleta.model_dump_json()
+        message_id = run_redis_command(
+            lambda r: r.xadd(self.stream_key, {"payload": payload})
+        )
+        if message_id:
+            self._stream_backlog += 1
+            return "redis", message_id
+
+        if self.local_queue is None:
+            raise IngestionQueueUnavailable()
+
+        self.local_queue.append(payload)
+        return "local", None
+
+    # --- Consumidor (thread em background) ---
+
+    def _ensure_group(self) -> bool:
+        if self._group_ready:
+            return True
+
+        def create_group(r: redis.Redis) -> bool:
+            try:
+                r.xgroup_create(self.stream_key, self.group, id="0", mkstream=True)
+            except redis.exceptions.ResponseError as e:
+                if "BUSYGROUP" not in str(e):
+                    raise
+            return True
+
+        self._group_ready = bool(run_redis_command(create_group, default=False))
+        return self._group_ready
+
+    def _read_stream(self, r: redis.Redis) -> List[Tuple[str, Dict[str, str]]]:
+        now = time.monotonic()
+        if now - self._last_claim_at >= settings.INGESTION_CLAIM_IDLE_SECONDS:
+            self._last_claim_at = now
+            claimed = r.xautoclaim(
+                self.stream_key, self.group, self.consumer,
+                min_idle_time=settings.INGESTION_CLAIM_IDLE_SECONDS * 1000,
+                start_id="0-0", count=self.batch_size,
+            )
+            if claimed[1]:
+                return claimed[1]
+
+        response = r.xreadgroup(self.group, self.consumer, {self.stream_key: ">"}, count=self.batch_size)
+        return response[0][1] if response else []
+
+    def _flush(self, payloads: List[str]):
+        started = time.perf_counter()
+        coletas = []
+        for payload in payloads:
+            try:
+                coleta = ColetaCreate.model_validate_json(payload)
+            except ValueError as e:
+                self._metrics["invalid_total"] += 1
+                print(f"ERRO: coleta inválida descartada da fila de ingestão: {e}")
+                continue
+            # Mensagens enfileiradas antes da migração 0005 não trazem o tenant
+            coleta.coreid = coleta.coreid or settings.TENANT_LEGACY_COREID
+            coletas.append(coleta)
+
+        with SessionLocal() as db:
+            ids, quarantine_ids = ingest_coletas(db, coletas)
+            db.commit()
+
+        inserted = len(ids) - ids.count(None)
+        quarantined = len(quarantine_ids) - quarantine_ids.count(None)
+        duplicates = ids.count(None) - quarantined
+
+        # Uma invalidação de cache e um timestamp por lote e tenant, não por coleta
+        if inserted:
+            gravadas = [coleta for coleta, coleta_id in zip(coletas, ids) if coleta_id is not None]
+            for tenant in sorted({coleta.coreid for coleta in gravadas}):
+                mark_data_changed(tenant)
+            invalidate_coletas_cache(appended=[coleta_filter_values(coleta) for coleta in gravadas])
+
+        self._metrics["processed_total"] += inserted
+        self._metrics["duplicates_total"] += duplicates
+        self._metrics["quarantined_total"] += quarantined
+        self._metrics["batches_total"] += 1
+        self._metrics["last_batch_size"] = inserted
+        self._metrics["last_batch_duplicates"] = duplicates
+        self._metrics["last_batch_seconds"] = round(time.perf_counter() - started, 4)
+        self._metrics["last_flush_at"] = time.time()
+
+    def _flush_isolating(self, payloads: List[str], source: str) -> List[int]:
+        # Grava o lote; se falhar, grava coleta a coleta para isolar as que falham. Cada uma delas
+        # soma uma tentativa e, na INGESTION_MAX_ATTEMPTS, vai para a fila de mortas. Retorna as
+        # posições que ainda devem ser tentadas de novo. Regravar uma coleta que já entrou só
+        # conta como duplicata (chave natural).
+        try:
+            self._flush(payloads)
+            failed: List[Tuple[int, Exception]] = []
+        except TRANSIENT_ERRORS:
+            raise
+        except Exception as e:
+            failed = [(0, e)] if len(payloads) == 1 else self._flush_each(payloads)
+
+        retry = []
+        for index, error in failed:
+            payload = payloads[index]
+            attempts = self._failures.get(payload, 0) + 1
+            if attempts >= settings.INGESTION_MAX_ATTEMPTS:
+                self._dead_letter(payload, error, source, attempts)
+                self._failures.pop(payload, None)
+            else:
+                self._failures[payload] = attempts
+                self._loop_error = f"{source}: {error}"
+                retry.append(index)
+
+        retrying = {payloads[index] for index in retry}
+        for payload in payloads:
+            if payload not in retrying:
+                self._failures.pop(payload, None)
+        return retry
+
+    def _flush_each(self, payloads: List[str]) -> List[Tuple[int, Exception]]:
+        failed = []
+        for index, payload in enumerate(payloads):
+            try:
+                self._flush([payload])
+            except TRANSIENT_ERRORS:
+                raise
+            except Exception as e:
+                failed.append((index, e))
+        return failed
+
+    def _dead_letter(self, payload: str, error: Exception, source: str, attempts: int):
+        fields = {"payload": payload, "erro": str(error)[:1000], "origem": source, "tentativas": str(attempts)}
+        message_id = run_redis_command(lambda r: r.xadd(settings.INGESTION_DEAD_LETTER_KEY, fields))
+        if message_id is None:
+            os.makedirs(settings.INGESTION_WAL_DIR, exist_ok=True)
+            path = os.path.join(settings.INGESTION_WAL_DIR, DEAD_LETTER_FILE)
+            with open(path, "a", encoding="utf-8") as dead_letter:
+                dead_letter.write(json.dumps(fields, ensure_ascii=False) + "\n")
+                dead_letter.flush()
+                os.fsync(dead_letter.fileno())
+        self._metrics["dead_letter_total"] += 1
+        print(f"ERRO: coleta movida para a fila de mortas após {attempts} tentativas ({source}): {error}")
+
+    def _drain_local(self) -> int:
+        if self.local_queue is None:
+            return 0
+        payloads = self.local_queue.peek(self.batch_size)
+        if not payloads:
+            return 0
+        # A fila local só confirma pela frente: para antes da primeira coleta a tentar de novo
+        retry = self._flush_isolating(payloads, "wal")
+        acked = retry[0] if retry else len(payloads)
+        self.local_queue.ack(acked)
+        return acked
+
+    def _drain_stream(self) -> int:
+        if not self._ensure_group():
+            return 0
+
+        messages = run_redis_command(self._read_stream, default=[])
+        if not messages:
+            return 0
+
+        # As que ainda serão tentadas ficam pendentes (PEL) e voltam pelo XAUTOCLAIM
+        retry = set(self._flush_isolating([fields["payload"] for _, fields in messages], "stream"))
+        message_ids = [message_id for index, (message_id, _) in enumerate(messages) if index not in retry]
+        if not message_ids:
+            return 0
+
+        def ack(r: redis.Redis):
+            pipe = r.pipeline(transaction=False)
+            pipe.xack(self.stream_key, self.group, *message_ids)
+            pipe.xdel(self.stream_key, *message_ids)
+            pipe.execute()
+
+        run_redis_command(ack)
+        return len(message_ids)
+
+    def _refresh_backlog(self):
+        backlog = run_redis_command(lambda r: r.xlen(self.stream_key))
+        if backlog is not None:
+            self._stream_backlog = backlog
+            self._stream_backlog_at = time.monotonic()
+
+    def _drain(self, source: str, drain) -> int:
+        # Cada fonte no próprio try: um erro no WAL não impede o stream de andar, e vice-versa.
+        # Mensagens não confirmadas continuam no WAL / na PEL do stream e são reprocessadas
+        try:
+            return drain()
+        except Exception as e:
+            self._loop_error = f"{source}: {e}"
+            print(f"ERRO no worker de ingestão ({source}): {e}")
+            return 0
+
+    def drain_once(self) -> int:
+        self._loop_error = None
+        processed = self._drain("wal", self._drain_local) + self._drain("stream", self._drain_stream)
+        self._metrics["last_error"] = self._loop_error
+        self._refresh_backlog()
+        return processed
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            if self.drain_once() == 0:
+                self._stop_event.wait(self.interval)
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        if self.local_queue is None:
+            self.local_queue = LocalWriteAheadQueue(settings.INGESTION_WAL_DIR)
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="ingestion-worker", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval * 5)
+
+    def metrics(self) -> Dict[str, Any]:
+        def stream_stats(r: redis.Redis) -> Dict[str, Any]:
+            pipe = r.pipeline(transaction=False)
+            pipe.xlen(self.stream_key)
+            pipe.xrange(self.stream_key, count=1)
+            length, first = pipe.execute()
+            oldest_age = None
+            if first:
+                oldest_ms = int(first[0][0].split("-")[0])
+                oldest_age = round(time.time() - oldest_ms / 1000, 3)
+            return {"stream_length": length, "oldest_pending_seconds": oldest_age}
+
+        stats = run_redis_command(stream_stats, default={"stream_length": None, "oldest_pending_seconds": None})
+
+        return {
+            **self._metrics,
+            **stats,
+            "local_queue_length": len(self.local_queue) if self.local_queue else 0,
+            "backlog": self.backlog(),
+            "max_pending": settings.INGESTION_MAX_PENDING,
+            "worker_running": self._thread is not None and self._thread.is_alive(),
+        }
+
+
+INGESTION_WORKER = IngestionWorker()
+
+def start_ingestion_worker():
+    if settings.INGESTION_WORKER_ENABLED:
+        INGESTION_WORKER.start()
+
+def stop_ingestion_worker():
+    INGESTION_WORKER.stop()
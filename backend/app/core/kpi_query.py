@@ -0,0 +1,146 @@
+import inspect
+import json
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple, Type
+from fastapi import HTTPException, status
+from pydantic import BaseModel, ConfigDict, ValidationError, create_model
+from sqlalchemy.orm import Session
+from core.admission import AdmissionDenied, check_rate, computation_slot, request_user_key
+from core.cache_utils import TENANT_KWARG, build_cache_key, compute_and_cache, read_stale, serialize_for_cache
+from core.compression import decode_payload
+from core.config import settings
+from core.redis_config import run_redis_command
+from models.kpis import KpiConsulta
+
+# Resultado de uma consulta: (status, veio do cache, JSON da resposta ou None, detalhe do erro,
+# cópia antiga servida pelo controle de admissão)
+Outcome = Tuple[int, bool, Optional[bytes], Any, bool]
+
+
+def params_model(func: Callable) -> Type[BaseModel]:
+    # Valida os params de uma consulta com as mesmas anotações e Query(...) do endpoint GET,
+    # então chave de cache e regras (ex.: estado com 2 letras) são as mesmas. O tenant não é um
+    # parâmetro da consulta: vem do usuário autenticado (params com "tenant" são rejeitados)
+    fields = {
+        name: (param.annotation, param.default)
+        for name, param in inspect.signature(func).parameters.items()
+        if name not in ("db", "current_user", TENANT_KWARG)
+    }
+    return create_model(f"{func.__name__}_params", __config__=ConfigDict(extra="forbid"), **fields)
+
+
+class KpiRegistry:
+    # KPIs consultáveis em lote: os endpoints @cached_data de um router, pelo caminho
+    def __init__(self, routers):
+        self._routers = routers
+        self._kpis: Optional[Dict[str, Tuple[Callable, Type[BaseModel]]]] = None
+
+    def get(self, name: str) -> Optional[Tuple[Callable, Type[BaseModel]]]:
+        if self._kpis is None:
+            self._kpis = {
+                route.path.lstrip("/"): (route.endpoint, params_model(route.endpoint))
+                for router in self._routers
+                for route in router.routes
+                if hasattr(getattr(route, "endpoint", None), "cache_key_prefix")
+            }
+        return self._kpis.get(name)
+
+
+def _denied(cache_key: str, denied: AdmissionDenied) -> Outcome:
+    # Recusado pelo controle de admissão: a cópia antiga do KPI, se houver, senão o 429/503
+    stale = read_stale(cache_key)
+    if stale is not None:
+        return status.HTTP_200_OK, True, decode_payload(stale), None, True
+    return denied.status_code, False, None, denied.detail, False
+
+
+def _compute(func: Callable, kwargs: Dict[str, Any], cache_key: str, open_session: Callable[[], Session]) -> Outcome:
+    try:
+        with computation_slot(func.cache_key_prefix), open_session() as db:
+            result, payload = compute_and_cache(
+                func.__wrapped__, func.cache_key_prefix, func.cache_ttl,
+                {**kwargs, "db": db},
+            )
+    except AdmissionDenied as denied:
+        return _denied(cache_key, denied)
+    except HTTPException as e:
+        return e.status_code, False, None, e.detail, False
+    except Exception as e:
+        print(f"ERRO na consulta em lote de {cache_key}: {e}")
+        return status.HTTP_500_INTERNAL_SERVER_ERROR, False, None, "Erro ao calcular o KPI.", False
+
+    # Resultados vazios não vão para o cache, mas entram na resposta
+    payload = payload or serialize_for_cache(cache_key, result)
+    if payload is None:
+        return status.HTTP_500_INTERNAL_SERVER_ERROR, False, None, "Erro ao serializar o KPI.", False
+    return status.HTTP_200_OK, False, payload, None, False
+
+
+def run_kpi_queries(
+    consultas: List[KpiConsulta],
+    registry: KpiRegistry,
+    open_session: Callable[[], Session],
+    tenant: str,
+) -> bytes:
+    # 1) valida cada consulta e monta a chave de cache; 2) um MGET para todas as chaves distintas;
+    # 3) calcula as faltantes em paralelo (uma vez por chave, mesmo repetida no lote)
+    outcomes: Dict[str, Outcome] = {}
+    keys: List[Optional[str]] = []
+    pending: Dict[str, Tuple[Callable, Dict[str, Any]]] = {}
+
+    for consulta in consultas:
+        kpi = registry.get(consulta.kpi)
+        if kpi is None:
+            error_key = f"erro:{len(keys)}"
+            outcomes[error_key] = (status.HTTP_404_NOT_FOUND, False, None, f"KPI '{consulta.kpi}' não encontrado.", False)
+            keys.append(error_key)
+            continue
+
+        func, model = kpi
+        try:
+            kwargs = {**model.model_validate(consulta.params).model_dump(), TENANT_KWARG: tenant}
+        except ValidationError as e:
+            error_key = f"erro:{len(keys)}"
+            outcomes[error_key] = (
+                status.HTTP_422_UNPROCESSABLE_ENTITY, False, None, json.loads(e.json(include_url=False)), False
+            )
+            keys.append(error_key)
+            continue
+
+        cache_key = build_cache_key(func.cache_key_prefix, kwargs)
+        pending.setdefault(cache_key, (func, kwargs))
+        keys.append(cache_key)
+
+    cache_keys = list(pending)
+    cached = run_redis_command(lambda r: r.mget(cache_keys), binary=True) if cache_keys else []
+    for cache_key, payload in zip(cache_keys, cached or [None] * len(cache_keys)):
+        if payload:
+            outcomes[cache_key] = (status.HTTP_200_OK, True, decode_payload(payload), None, False)
+
+    misses = [cache_key for cache_key in cache_keys if cache_key not in outcomes]
+    print(f"CONSULTA EM LOTE: {len(consultas)} consultas, {len(cache_keys) - len(misses)} do cache, {len(misses)} calculadas.")
+    # Cada recálculo consome um token do balde do usuário (todos ou nenhum)
+    if misses:
+        try:
+            check_rate(request_user_key(), "kpi", len(misses))
+        except AdmissionDenied as denied:
+            outcomes.update((cache_key, _denied(cache_key, denied)) for cache_key in misses)
+            misses = []
+    if misses:
+        workers = min(settings.DASHBOARD_QUERY_CONCURRENCY, len(misses))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="kpi-query") as executor:
+            computed = executor.map(
+                lambda cache_key: _compute(*pending[cache_key], cache_key, open_session), misses
+            )
+            outcomes.update(zip(misses, computed))
+
+    # Monta a resposta emendando os JSONs já serializados, sem json.loads + dumps de cada resultado
+    parts = []
+    for consulta, key in zip(consultas, keys):
+        status_code, from_cache, payload, erro, stale = outcomes[key]
+        meta = json.dumps({
+            "kpi": consulta.kpi, "params": consulta.params, "status": status_code, "cache": from_cache,
+            "desatualizado": stale, "erro": erro,
+        }, default=str)
+        parts.append(meta[:-1].encode("utf-8") + b', "dados": ' + (payload or b"null") + b"}")
+    return b"[" + b", ".join(parts) + b"]"
@@ -1,32 +1,149 @@
+import os
+import threading
+import time
 import redis
 from functools import lru_cache
 from pydantic_settings import BaseSettings, SettingsConfigDict
-from typing import Optional
+from typing import Any, Callable, Dict, Optional
 
 class RedisSettings(BaseSettings):
-    REDIS_HOST: str = "localhost" 
+    REDIS_HOST: str = "localhost"
     REDIS_PORT: int = 6379
     REDIS_DB: int = 0
-    
+    REDIS_MAX_CONNECTIONS: int = 50
+    REDIS_SOCKET_TIMEOUT: float = 0.5  # segundos; o cache nunca deve segurar uma requisição
+    REDIS_SOCKET_CONNECT_TIMEOUT: float = 0.5
+    REDIS_BREAKER_FAILURE_THRESHOLD: int = 3  # falhas seguidas até abrir o circuito
+    REDIS_BREAKER_RESET_SECONDS: float = 5.0  # tempo com o circuito aberto antes de tentar de novo
+
     model_config = SettingsConfigDict(env_file=".env", extra='ignore')
 
 @lru_cache()
 def get_redis_settings():
     return RedisSettings()
 
-# Inicializa o cliente Redis
-def get_redis_client() -> redis.Redis:
+
+class CircuitBreaker:
+    # Fechado: comandos passam. Aberto: o cache é ignorado até reset_seconds.
+    # Depois disso uma única requisição de teste (meio-aberto) decide se fecha de novo.
+    def __init__(self, failure_threshold: int, reset_seconds: float):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial_in_progress = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return "fechado"
+        if time.monotonic() - self._opened_at >= self.reset_seconds:
+            return "meio-aberto"
+        return "aberto"
+
+    def allow_request(self) -> bool:
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at < self.reset_seconds or self._trial_in_progress:
+                return False
+            self._trial_in_progress = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            if self._opened_at is not None:
+                print("REDIS: conexão restabelecida, circuito fechado.")
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_progress = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_in_progress = False
+            if self._opened_at is not None or self._failures >= self.failure_threshold:
+                if self._opened_at is None:
+                    print(f"AVISO: Redis indisponível, circuito aberto por {self.reset_seconds}s. O cache será ignorado.")
+                self._opened_at = time.monotonic()
+
+
+_settings = get_redis_settings()
+REDIS_BREAKER = CircuitBreaker(
+    failure_threshold=_settings.REDIS_BREAKER_FAILURE_THRESHOLD,
+    reset_seconds=_settings.REDIS_BREAKER_RESET_SECONDS,
+)
+
+# Um cliente de texto (decode_responses=True, o padrão) e um binário para valores comprimidos
+_clients: Dict[bool, redis.Redis] = {}
+_client_lock = threading.Lock()
+
+
+def _build_client(binary: bool = False) -> redis.Redis:
     settings = get_redis_settings()
+    pool = redis.ConnectionPool(
+        host=settings.REDIS_HOST,
+        port=settings.REDIS_PORT,
+        db=settings.REDIS_DB,
+        max_connections=settings.REDIS_MAX_CONNECTIONS,
+        socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+        socket_connect_timeout=settings.REDIS_SOCKET_CONNECT_TIMEOUT,
+        health_check_interval=30,
+        decode_responses=not binary,
+    )
+    return redis.Redis(connection_pool=pool)
+
+
+def _get_or_build_client(binary: bool = False) -> redis.Redis:
+    client = _clients.get(binary)
+    if client is None:
+        with _client_lock:
+            client = _clients.get(binary)
+            if client is None:
+                client = _clients[binary] = _build_client(binary)
+    return client
+
+
+def reset_redis_client():
+    # Após o fork: cada worker abre o próprio pool (conexões não podem ser compartilhadas entre processos)
+    _clients.clear()
+
+os.register_at_fork(after_in_child=reset_redis_client)
+
+
+# Clientes preguiçosos: nenhuma conexão é aberta no import.
+# Retorna None enquanto o circuito estiver aberto, para o chamador seguir sem cache.
+def get_redis_client(binary: bool = False) -> Optional[redis.Redis]:
+    if not REDIS_BREAKER.allow_request():
+        return None
+    return _get_or_build_client(binary)
+
+
+def run_redis_command(operation: Callable[[redis.Redis], Any], default: Any = None, binary: bool = False) -> Any:
+    client = get_redis_client(binary)
+    if client is None:
+        return default
+
+    try:
+        result = operation(client)
+    except redis.exceptions.RedisError as e:
+        REDIS_BREAKER.record_failure()
+        print(f"ERRO no Redis: {e}")
+        return default
+
+    REDIS_BREAKER.record_success()
+    return result
+
+
+def check_redis_health() -> str:
+    # Usado pelo health probe: ignora o circuito para detectar a volta do Redis
     try:
-        r = redis.Redis(
-            host=settings.REDIS_HOST,
-            port=settings.REDIS_PORT,
-            db=settings.REDIS_DB,
-            decode_responses=True
-        )
-        # Testa a conexão
-        r.ping() 
-        return r
-    except redis.exceptions.ConnectionError as e:
-        print(f"Erro ao conectar ao Redis: {e}")
-        return None
\ No newline at end of file
+        _get_or_build_client().ping()
+    except redis.exceptions.RedisError as e:
+        REDIS_BREAKER.record_failure()
+        print(f"Erro na conexão com o Redis: {e}")
+        return "error"
+
+    REDIS_BREAKER.record_success()
+    return "ok"
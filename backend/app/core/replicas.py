@@ -0,0 +1,199 @@
+import random
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional
+from fastapi import Request
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+from core.authguard import extract_token
+from core.config import settings
+from core.database import REPLICA_URLS, ReadSessionLocal, ReplicaSessionLocal, get_engine, get_replica_engine
+from core.redis_config import run_redis_command
+from core.request_context import CURRENT_REQUEST
+from core.security import decode_token
+
+RECENT_WRITE_KEY = "leitura:escrita_recente:{user_id}"
+REPLICA_INFO_KEY = "replica"  # em Session.info: nome da réplica da sessão
+WRITE_POSITION_KEY = "leitura:lsn_escrita"  # ZSET: posição do WAL (bytes) da última escrita de cada tenant
+
+# Posição do WAL em bytes: no primário, a atual (já depois do commit da escrita); numa réplica, a
+# última aplicada. Comparáveis entre si porque réplicas físicas replicam o mesmo WAL
+WRITE_POSITION_SQL = text("SELECT pg_current_wal_lsn() - '0/0'::pg_lsn")
+REPLAY_POSITION_SQL = text("""
+    SELECT CASE WHEN pg_is_in_recovery() THEN pg_last_wal_replay_lsn() ELSE pg_current_wal_lsn() END - '0/0'::pg_lsn
+""")
+
+# Atraso de replay em segundos. Réplica que já aplicou todo o WAL recebido está em dia (0), mesmo
+# com o primário ocioso; atrasada e sem transação aplicada ainda, o atraso é desconhecido (NULL)
+REPLICA_LAG_SQL = text("""
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+    END
+""")
+
+
+class ReplicaMonitor:
+    # Atraso de cada réplica, medido pelo HealthProber em background. As requisições só consultam
+    # o snapshot em memória: escolher a réplica não custa nenhuma ida ao banco.
+    def __init__(self, names, max_lag: float, stale_after: float):
+        self.names = list(names)
+        self.max_lag = max_lag
+        self.stale_after = stale_after
+        self._lags: Dict[str, Optional[float]] = {}
+        self._checked_at: Optional[float] = None
+
+    def _measure(self, name: str) -> Optional[float]:
+        try:
+            with get_replica_engine(name).connect() as conn:
+                lag = conn.execute(REPLICA_LAG_SQL).scalar()
+            return None if lag is None else max(float(lag), 0.0)
+        except Exception as e:
+            print(f"AVISO: réplica {name} indisponível ({e}). Leituras seguem no primário.")
+            return None
+
+    def check(self):
+        if not self.names:
+            return
+        self._lags = {name: self._measure(name) for name in self.names}
+        self._checked_at = time.time()
+
+    def status(self) -> Dict[str, Dict[str, Any]]:
+        result = {}
+        for name in self.names:
+            lag = self._lags.get(name)
+            if lag is None:
+                state = "error" if self._checked_at is not None else "desconhecido"
+            else:
+                state = "ok" if lag <= self.max_lag else "atrasada"
+            result[name] = {"status": state, "lag_seconds": None if lag is None else round(lag, 3)}
+        return result
+
+    def pick(self) -> Optional[str]:
+        # Medição velha (prober parado) vale tanto quanto nenhuma: na dúvida, primário
+        if self._checked_at is None or time.time() - self._checked_at > self.stale_after:
+            return None
+        candidates = [
+            name for name, lag in self._lags.items() if lag is not None and lag <= self.max_lag
+        ]
+        return random.choice(candidates) if candidates else None
+
+
+REPLICA_MONITOR = ReplicaMonitor(
+    names=REPLICA_URLS,
+    max_lag=settings.DB_REPLICA_MAX_LAG_SECONDS,
+    stale_after=settings.HEALTH_PROBE_INTERVAL_SECONDS * 3,
+)
+
+
+def _request_user_id(request: Request) -> Optional[Any]:
+    token = extract_token(request)
+    payload = decode_token(token) if token else None
+    return payload.get("user_id") if payload else None
+
+
+# Read-your-writes: cada commit feito dentro de uma requisição autenticada marca o usuário por
+# DB_REPLICA_STICKY_SECONDS (no Redis, visível a todos os workers), e as leituras dele nesse
+# intervalo vão ao primário. O worker de ingestão não tem requisição e não marca ninguém.
+@event.listens_for(Session, "after_commit")
+def _mark_recent_write(session: Session):
+    if not REPLICA_URLS:
+        return
+    request = CURRENT_REQUEST.get()
+    user_id = _request_user_id(request) if request is not None else None
+    if user_id is None:
+        return
+    run_redis_command(lambda r: r.set(
+        RECENT_WRITE_KEY.format(user_id=user_id), 1, ex=settings.DB_REPLICA_STICKY_SECONDS
+    ))
+
+
+def _wrote_recently(request: Request) -> bool:
+    user_id = _request_user_id(request)
+    if user_id is None:
+        return False
+    # Sem Redis não dá para saber: trata como escrita recente e lê do primário
+    recent = run_redis_command(lambda r: r.exists(RECENT_WRITE_KEY.format(user_id=user_id)))
+    return recent is None or bool(recent)
+
+
+def open_read_session(request: Request) -> Session:
+    name = REPLICA_MONITOR.pick()
+    if name is not None and not _wrote_recently(request):
+        db = ReplicaSessionLocal(name)
+        db.info[REPLICA_INFO_KEY] = name
+        return db
+    return ReadSessionLocal()
+
+
+def record_write_position(tenant: str):
+    # Chamado pelo mark_data_changed, antes de invalidar o cache: um recálculo que já veja o cache vazio
+    # também vê a posição nova. ZADD GT: com escritas concorrentes do tenant fica a maior posição
+    if not REPLICA_URLS:
+        return
+    try:
+        with get_engine().connect() as conn:
+            position = int(conn.execute(WRITE_POSITION_SQL).scalar())
+    except Exception as e:
+        print(f"AVISO: posição do WAL indisponível ({e}). Caches de {tenant} podem vir de réplica atrasada.")
+        return
+    run_redis_command(lambda r: r.zadd(WRITE_POSITION_KEY, {tenant: position}, gt=True))
+
+
+def _replica_caught_up(db: Session, tenant: Optional[str]) -> bool:
+    # A réplica já aplicou a última escrita do tenant? Tenant sem escrita registrada: nada a esperar.
+    # Sem Redis, ou sem resposta da réplica, não dá para saber: o cache é preenchido pelo primário
+    if tenant is None:
+        return False
+    written = run_redis_command(lambda r: r.zscore(WRITE_POSITION_KEY, tenant) or 0)
+    if written is None:
+        return False
+    if not written:
+        return True
+    try:
+        return int(db.execute(REPLAY_POSITION_SQL).scalar()) >= written
+    except Exception as e:
+        db.rollback()
+        print(f"AVISO: réplica {db.info.get(REPLICA_INFO_KEY)} sem posição do WAL ({e}). Cache lido do primário.")
+        return False
+
+
+# O que vai para o cache fica na réplica só se ela já aplicou a última escrita do tenant (posição do
+# WAL registrada no commit, ver record_write_position); senão é lido do primário. Sem isso, logo
+# depois do mark_data_changed uma réplica atrasada gravaria no cache (e no ETag e na cópia antiga)
+# o resultado de antes da escrita, por todo o TTL. O worker de ingestão também registra a posição.
+@contextmanager
+def cache_fill_session(db: Optional[Session], tenant: Optional[str]) -> Iterator[Optional[Session]]:
+    if db is None or REPLICA_INFO_KEY not in db.info or _replica_caught_up(db, tenant):
+        yield db
+        return
+    with ReadSessionLocal() as primary:
+        yield primary
+
+
+def cache_fill_factory(tenant: str) -> Callable[[], Session]:
+    # Para o lote de KPIs, que abre uma sessão por cálculo em paralelo: a réplica é escolhida e
+    # conferida uma vez, e todas as sessões vão a ela ou ao primário
+    name = REPLICA_MONITOR.pick()
+    if name is None:
+        return ReadSessionLocal
+    with ReplicaSessionLocal(name) as replica:
+        replica.info[REPLICA_INFO_KEY] = name
+        if not _replica_caught_up(replica, tenant):
+            return ReadSessionLocal
+
+    def open_replica() -> Session:
+        db = ReplicaSessionLocal(name)
+        db.info[REPLICA_INFO_KEY] = name
+        return db
+    return open_replica
+
+
+# Variante do get_db para as rotas somente leitura (dashboard, motoristas, GET de coletas)
+def get_read_db(request: Request):
+    db = open_read_session(request)
+    try:
+        yield db
+    finally:
+        db.close()
@@ -0,0 +1,24 @@
+from contextvars import ContextVar
+from typing import Optional
+from starlette.requests import Request
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+# Requisição HTTP corrente, para código fora da assinatura dos endpoints (ex.: o decorator de cache)
+CURRENT_REQUEST: ContextVar[Optional[Request]] = ContextVar("current_request", default=None)
+
+
+class RequestContextMiddleware:
+    # Middleware ASGI puro (sem BaseHTTPMiddleware) para não bufferizar respostas em streaming (SSE)
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        token = CURRENT_REQUEST.set(Request(scope, receive))
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            CURRENT_REQUEST.reset(token)
@@ -0,0 +1,126 @@
+from typing import Dict, List, Sequence, Tuple
+from sqlalchemy import and_, cast, delete, func, select, text, true, tuple_, BigInteger, Date
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.elements import ColumnElement
+from core.database import ArquivoColetasModel, ColetaModel, KpiCuboModel, PostoModel, PrecoHistogramaModel
+
+ROLLUP_MODELS = [PrecoHistogramaModel, KpiCuboModel]
+
+
+# Agregados mantidos incrementalmente. Cada escrita em coletas "dobra" as linhas afetadas
+# nos agregados, na mesma transação: sign=+1 ao inserir, -1 antes de remover/alterar.
+# Cidade e estado são os do posto (fixos desde o primeiro registro, core/dimensions.py)
+def fold_rollups(db: Session, where_clause: ColumnElement, sign: int = 1):
+    dia = cast(ColetaModel.data_coleta, Date)
+    estado = func.upper(PostoModel.estado)
+    where_clause = and_(PostoModel.id == ColetaModel.posto_id, where_clause)
+
+    _fold(db, PrecoHistogramaModel, where_clause, sign,
+          keys={
+              "coreid": ColetaModel.coreid,
+              "tipo_combustivel_codigo": ColetaModel.tipo_combustivel_codigo,
+              "estado": estado,
+              "dia": dia,
+              "preco_centavos": ColetaModel.preco_centavos,
+          },
+          measures={"quantidade": func.count()})
+
+    _fold(db, KpiCuboModel, where_clause, sign,
+          keys={
+              "coreid": ColetaModel.coreid,
+              "estado": estado,
+              "cidade": PostoModel.cidade,
+              "posto_id": ColetaModel.posto_id,
+              "tipo_combustivel_codigo": ColetaModel.tipo_combustivel_codigo,
+              "tipo_veiculo_codigo": ColetaModel.tipo_veiculo_codigo,
+              "dia": dia,
+          },
+          measures={
+              "quantidade": func.count(),
+              "volume_centilitros": func.sum(ColetaModel.volume_centilitros),
+              "soma_preco_centavos": func.sum(ColetaModel.preco_centavos),
+              # Produto em bigint: centavos x centilitros passa do limite do integer
+              "receita_centesimos_centavo": func.sum(
+                  cast(ColetaModel.preco_centavos, BigInteger) * ColetaModel.volume_centilitros
+              ),
+          })
+
+
+def _fold(
+    db: Session,
+    model,
+    where_clause: ColumnElement,
+    sign: int,
+    keys: Dict[str, ColumnElement],
+    measures: Dict[str, ColumnElement],
+):
+    # Um INSERT ... SELECT ... GROUP BY com upsert somando as medidas; "quantidade" é obrigatória.
+    # ORDER BY pela chave: dobras concorrentes (worker de ingestão, PATCH em lote) bloqueiam as
+    # células na mesma ordem, sem deadlock
+    contribuicoes = (
+        select(*keys.values(), *[measure * sign for measure in measures.values()])
+        .where(where_clause)
+        .group_by(*keys.values())
+        .order_by(*keys.values())
+    )
+    stmt = pg_insert(model).from_select([*keys, *measures], contribuicoes)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=list(keys),
+        set_={name: getattr(model, name) + stmt.excluded[name] for name in measures},
+    )
+    if sign > 0:
+        db.execute(stmt)
+        return
+
+    # Na retirada, apaga só as células que zeraram (devolvidas pelo próprio upsert)
+    key_columns = [getattr(model, name) for name in keys]
+    stmt = stmt.returning(*key_columns, model.quantidade)
+    emptied = [tuple(row[:-1]) for row in db.execute(stmt) if row[-1] <= 0]
+    if emptied:
+        db.execute(delete(model).where(tuple_(*key_columns).in_(emptied)))
+
+
+def rebuild_rollups(db_engine: Engine, only_if_empty: bool = True) -> bool:
+    # Reconstrói os agregados a partir de coletas (migração inicial, agregado novo ou correção manual)
+    with Session(db_engine) as db:
+        if only_if_empty and all(db.query(model).first() is not None for model in ROLLUP_MODELS):
+            return False
+
+        # Dias anteriores ao último corte do arquivamento (core/archive.py) não estão mais inteiros em
+        # coletas: as células deles são preservadas e só o período a partir do corte é reconstruído
+        marca = db.query(func.max(ArquivoColetasModel.corte)).scalar()
+        if marca is None:
+            db.execute(text("TRUNCATE " + ", ".join(model.__tablename__ for model in ROLLUP_MODELS)))
+            fold_rollups(db, true())
+        else:
+            for model in ROLLUP_MODELS:
+                db.execute(delete(model).where(model.dia >= marca.date()))
+            fold_rollups(db, ColetaModel.data_coleta >= marca)
+        db.commit()
+    return True
+
+
+def percentile_from_histogram(buckets: Sequence[Tuple[int, int]], p: float) -> float:
+    # buckets: (preco_centavos, quantidade) em ordem crescente de preço. Interpolação linear entre
+    # as posições vizinhas, equivalente ao percentile_cont do Postgres sobre os dados originais.
+    total = sum(quantidade for _, quantidade in buckets)
+    rank = p * (total - 1)
+    lower_rank, upper_rank = int(rank), min(int(rank) + 1, total - 1)
+
+    lower = upper = None
+    seen = 0
+    for preco, quantidade in buckets:
+        seen += quantidade
+        if lower is None and lower_rank < seen:
+            lower = preco
+        if upper_rank < seen:
+            upper = preco
+            break
+
+    return round((lower + (upper - lower) * (rank - int(rank))) / 100, 2)
+
+
+def histogram_percentiles(buckets: List[Tuple[int, int]], percentis: Sequence[float]) -> List[float]:
+    return [percentile_from_histogram(buckets, p) for p in percentis]
@@ -0,0 +1,50 @@
+import multiprocessing
+import os
+
+from core.config import settings
+
+# Workers fazem fork de um processo pai com o app já importado (preload): o custo de import
+# é pago uma vez. DB e Redis são preguiçosos e descartados após o fork (os.register_at_fork),
+# então nenhuma conexão do pai é compartilhada. "main:app" é a instância criada no import do
+# main: "main:create_app()" criaria um segundo app no pai.
+wsgi_app = "main:app"
+preload_app = True
+worker_class = "uvicorn.workers.UvicornWorker"
+
+
+# Cada worker abre até pool_size + max_overflow conexões no pool de escrita e no de leitura do
+# primário (as réplicas têm o próprio max_connections). O padrão é o menor entre 2 * CPUs + 1 e o
+# que cabe no orçamento; WEB_CONCURRENCY acima do orçamento só gera um aviso.
+def connections_per_worker() -> int:
+    return (
+        settings.DB_POOL_SIZE + settings.DB_MAX_OVERFLOW
+        + settings.DB_READ_POOL_SIZE + settings.DB_READ_MAX_OVERFLOW
+    )
+
+
+def max_workers() -> int:
+    # Com o PgBouncer (NullPool) quem limita as conexões ao Postgres é ele
+    if settings.DB_PGBOUNCER_MODE:
+        return multiprocessing.cpu_count() * 2 + 1
+    budget = settings.DB_MAX_CONNECTIONS - settings.DB_RESERVED_CONNECTIONS
+    return max(1, budget // connections_per_worker())
+
+
+def default_workers() -> int:
+    configured = os.getenv("WEB_CONCURRENCY")
+    if configured is None:
+        return min(multiprocessing.cpu_count() * 2 + 1, max_workers())
+    if int(configured) > max_workers():
+        print(
+            f"AVISO: WEB_CONCURRENCY={configured} com {connections_per_worker()} conexões por worker "
+            f"passa de DB_MAX_CONNECTIONS - DB_RESERVED_CONNECTIONS "
+            f"({settings.DB_MAX_CONNECTIONS} - {settings.DB_RESERVED_CONNECTIONS})."
+        )
+    return int(configured)
+
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+workers = default_workers()
+graceful_timeout = int(os.getenv("GRACEFUL_TIMEOUT", "30"))
+timeout = int(os.getenv("WORKER_TIMEOUT", "60"))
+keepalive = 5
@@ -2,55 +2,19 @@ from fastapi import FastAPI, Security
 from fastapi.security import HTTPBearer
 from fastapi.middleware.cors import CORSMiddleware
 from core.config import settings
-from core.database import init_db
-from routes import coletas, health, motoristas, dashboard, auth
+from core.health_probe import start_health_prober, stop_health_prober
+from core.ingestion_queue import start_ingestion_worker, stop_ingestion_worker
+from core.events import stop_data_events
+from core.cache_warmer import start_cache_warmer, stop_cache_warmer
+from core.archive import start_archiver, stop_archiver
+from core.request_context import RequestContextMiddleware
+from routes import coletas, health, motoristas, dashboard, auth, quarentena, eventos
 import time
 from datetime import datetime
 from core.cache_utils import get_last_update_timestamp
 from core.authguard import CurrentUser
 from models.kpis import DashboardStatus 
 
-app = FastAPI(
-    title=settings.API_TITLE,
-    version=settings.API_VERSION,
-    description="API para Coleta e Gestão de Dados de Vendas de Combustível.",
-    on_startup=[init_db],
-     
-    # Configuração do swagger e security
-    openapi_extra={
-        "security": [
-            {
-                "BearerAuth": [], 
-            }
-        ],
-        "components": {
-            "securitySchemes": {
-                "BearerAuth": {
-                    "type": "http",
-                    "scheme": "bearer",
-                    "bearerFormat": "JWT",
-                    "description": "Insira o JWT Token obtido no /api/v1/auth/token."
-                }
-            }
-        }
-    }
-)
-
-origins = [
-    "http://localhost:4200", 
-    "http://127.0.0.1:4200",
-    "http://localhost",       
-    "http://127.0.0.1",       
-]
-
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"], 
-    allow_headers=["*"], 
-)
-
 def format_timedelta_to_friendly_string(seconds: int) -> str:
     if seconds is None or seconds < 0:
         return "Status de atualização indisponível."
@@ -66,17 +30,10 @@ def format_timedelta_to_friendly_string(seconds: int) -> str:
     return f"Atualizado há {days} dia{'s' if days != 1 else ''}."
 
 
-@app.get(
-    "/api/v1/status-dados", 
-    response_model=DashboardStatus, 
-    summary="Retorna o momento da última ingestão de dados, indicando o freshness do cache do Dashboard.",
-    tags =["Raiz"],
-    dependencies=[Security(HTTPBearer())]
-)
 def get_data_freshness_status(
     current_user: CurrentUser
 ):
-    last_ts = get_last_update_timestamp()
+    last_ts = get_last_update_timestamp(current_user.coreid)
     current_ts = int(time.time())
     seconds_ago = None
     last_dt = None
@@ -95,13 +52,79 @@ def get_data_freshness_status(
         friendly_status=friendly_msg
     )
 
-app.include_router(health.router, prefix="/api/v1")
-app.include_router(coletas.router, prefix="/api/v1/coletas")
-app.include_router(motoristas.router, prefix="/api/v1/motoristas")
-app.include_router(dashboard.router, prefix="/api/v1/dashboard")
-app.include_router(auth.router, prefix="/api/v1")
-
 
-@app.get("/", tags =["Raiz"])
 def read_root():
-    return {"message": "Bem-vindo à API de Coleta de Combustível. Veja /docs para documentação."}
\ No newline at end of file
+    return {"message": "Bem-vindo à API de Coleta de Combustível. Veja /docs para documentação."}
+
+
+# Fábrica da aplicação. Nada aqui abre conexões: DB e Redis são criados sob demanda em cada
+# worker, e o esquema é migrado pelo entrypoint (alembic upgrade head) antes dos workers subirem.
+# Compatível com o preload do gunicorn (gunicorn.conf.py): os workers herdam os imports prontos.
+def create_app() -> FastAPI:
+    app = FastAPI(
+        title=settings.API_TITLE,
+        version=settings.API_VERSION,
+        description="API para Coleta e Gestão de Dados de Vendas de Combustível.",
+        on_startup=[start_health_prober, start_ingestion_worker, start_cache_warmer, start_archiver],
+        on_shutdown=[stop_health_prober, stop_ingestion_worker, stop_data_events, stop_cache_warmer, stop_archiver],
+     
+        # Configuração do swagger e security
+        openapi_extra={
+            "security": [
+                {
+                    "BearerAuth": [], 
+                }
+            ],
+            "components": {
+                "securitySchemes": {
+                    "BearerAuth": {
+                        "type": "http",
+                        "scheme": "bearer",
+                        "bearerFormat": "JWT",
+                        "description": "Insira o JWT Token obtido no /api/v1/auth/token."
+                    }
+                }
+            }
+        }
+    )
+
+    origins = [
+        "http://localhost:4200", 
+        "http://127.0.0.1:4200",
+        "http://localhost",       
+        "http://127.0.0.1",       
+    ]
+
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],
+        allow_credentials=True,
+        allow_methods=["*"], 
+        allow_headers=["*"], 
+    )
+    app.add_middleware(RequestContextMiddleware)
+
+    app.add_api_route(
+        "/api/v1/status-dados",
+        get_data_freshness_status,
+        methods=["GET"],
+        response_model=DashboardStatus,
+        summary="Retorna o momento da última ingestão de dados, indicando o freshness do cache do Dashboard.",
+        tags=["Raiz"],
+        dependencies=[Security(HTTPBearer())],
+    )
+
+    app.include_router(health.router, prefix="/api/v1")
+    app.include_router(coletas.router, prefix="/api/v1/coletas")
+    app.include_router(quarentena.router, prefix="/api/v1")
+    app.include_router(motoristas.router, prefix="/api/v1/motoristas")
+    app.include_router(dashboard.router, prefix="/api/v1/dashboard")
+    app.include_router(eventos.router, prefix="/api/v1")
+    app.include_router(auth.router, prefix="/api/v1")
+
+    app.add_api_route("/", read_root, methods=["GET"], tags=["Raiz"])
+
+    return app
+
+
+app = create_app()
@@ -0,0 +1,201 @@
+"""esquema inicial
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-19
+
+Cria o esquema completo em bancos novos. Bancos criados pelo antigo init_db (create_all) são
+adotados: só as tabelas ausentes são criadas e as correções que o init_db aplicava em coletas
+(colunas de dimensão, remoção de duplicatas e índice da chave natural) rodam aqui uma última vez.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "0001"
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _create_usuarios():
+    op.create_table(
+        "usuarios",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("nome", sa.String(), nullable=False),
+        sa.Column("email", sa.String(), nullable=False),
+        sa.Column("senha_hash", sa.String(), nullable=False),
+        sa.Column("cpf", sa.String(), nullable=False, unique=True),
+        sa.Column("coreid", sa.String(), nullable=False),
+    )
+    op.create_index("ix_usuarios_id", "usuarios", ["id"])
+    op.create_index("ix_usuarios_email", "usuarios", ["email"], unique=True)
+
+
+def _create_postos():
+    op.create_table(
+        "postos",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("identificador", sa.String(), nullable=False, unique=True),
+        sa.Column("nome", sa.String(), nullable=False),
+        sa.Column("cidade", sa.String(), nullable=False),
+        sa.Column("estado", sa.String(2), nullable=False),
+    )
+    op.create_index("ix_postos_estado", "postos", ["estado"])
+
+
+def _create_motoristas():
+    op.create_table(
+        "motoristas",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("cpf", sa.String(), nullable=False, unique=True),
+        sa.Column("nome", sa.String(), nullable=False),
+    )
+
+
+def _create_veiculos():
+    op.create_table(
+        "veiculos",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("placa", sa.String(), nullable=False, unique=True),
+        sa.Column("tipo_veiculo_codigo", sa.SmallInteger(), nullable=False),
+    )
+
+
+def _create_coletas():
+    op.create_table(
+        "coletas",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("posto_identificador", sa.String(), nullable=False),
+        sa.Column("posto_nome", sa.String(), nullable=False),
+        sa.Column("cidade", sa.String(), nullable=False),
+        sa.Column("estado", sa.String(), nullable=False),
+        sa.Column("data_coleta", sa.DateTime(), nullable=False),
+        sa.Column("tipo_combustivel", sa.String(), nullable=False),
+        sa.Column("preco_venda", sa.Numeric(10, 2), nullable=False),
+        sa.Column("volume_vendido", sa.Numeric(10, 2), nullable=False),
+        sa.Column("motorista_nome", sa.String(), nullable=False),
+        sa.Column("motorista_cpf", sa.String(), nullable=False),
+        sa.Column("veiculo_placa", sa.String(), nullable=False),
+        sa.Column("tipo_veiculo", sa.String(), nullable=False),
+        sa.Column("posto_id", sa.Integer(), sa.ForeignKey("postos.id")),
+        sa.Column("motorista_id", sa.Integer(), sa.ForeignKey("motoristas.id")),
+        sa.Column("veiculo_id", sa.Integer(), sa.ForeignKey("veiculos.id")),
+        sa.Column("tipo_combustivel_codigo", sa.SmallInteger()),
+        sa.Column("tipo_veiculo_codigo", sa.SmallInteger()),
+    )
+    op.create_index("ix_coletas_id", "coletas", ["id"])
+    op.create_index("ix_coletas_posto_identificador", "coletas", ["posto_identificador"])
+    op.create_index("ix_coletas_veiculo_placa", "coletas", ["veiculo_placa"])
+    op.create_index("ix_coletas_posto_id", "coletas", ["posto_id"])
+    op.create_index("ix_coletas_motorista_id", "coletas", ["motorista_id"])
+    op.create_index("ix_coletas_veiculo_id", "coletas", ["veiculo_id"])
+    op.create_index(
+        "uq_coletas_chave_natural", "coletas",
+        ["posto_identificador", "data_coleta", "veiculo_placa"], unique=True,
+    )
+
+
+def _create_preco_histograma():
+    op.create_table(
+        "preco_histograma",
+        sa.Column("tipo_combustivel_codigo", sa.SmallInteger(), primary_key=True),
+        sa.Column("estado", sa.String(2), primary_key=True),
+        sa.Column("dia", sa.Date(), primary_key=True),
+        sa.Column("preco_centavos", sa.Integer(), primary_key=True),
+        sa.Column("quantidade", sa.Integer(), nullable=False),
+    )
+
+
+def _create_kpi_cubo():
+    op.create_table(
+        "kpi_cubo",
+        sa.Column("estado", sa.String(2), primary_key=True),
+        sa.Column("cidade", sa.String(), primary_key=True),
+        sa.Column("posto_id", sa.Integer(), primary_key=True),
+        sa.Column("tipo_combustivel_codigo", sa.SmallInteger(), primary_key=True),
+        sa.Column("tipo_veiculo_codigo", sa.SmallInteger(), primary_key=True),
+        sa.Column("dia", sa.Date(), primary_key=True),
+        sa.Column("quantidade", sa.Integer(), nullable=False),
+        sa.Column("volume_total", sa.Numeric(15, 2), nullable=False),
+        sa.Column("soma_preco", sa.Numeric(15, 2), nullable=False),
+        sa.Column("receita_total", sa.Numeric(18, 4), nullable=False),
+    )
+    op.create_index("ix_kpi_cubo_dia", "kpi_cubo", ["dia"])
+
+
+def _create_coletas_quarentena():
+    op.create_table(
+        "coletas_quarentena",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("chave", sa.String(), nullable=False, unique=True),
+        sa.Column("payload", sa.Text(), nullable=False),
+        sa.Column("posto_identificador", sa.String()),
+        sa.Column("motivo", sa.String(), nullable=False),
+        sa.Column("score", sa.Float()),
+        sa.Column("status", sa.String(20), nullable=False),
+        sa.Column("coleta_id", sa.Integer(), sa.ForeignKey("coletas.id", ondelete="SET NULL")),
+        sa.Column("criado_em", sa.DateTime(), nullable=False, server_default=sa.func.now()),
+        sa.Column("resolvido_em", sa.DateTime()),
+    )
+    op.create_index("ix_coletas_quarentena_id", "coletas_quarentena", ["id"])
+    op.create_index("ix_coletas_quarentena_posto_identificador", "coletas_quarentena", ["posto_identificador"])
+    op.create_index("ix_coletas_quarentena_status", "coletas_quarentena", ["status"])
+
+
+# Em ordem de dependência (chaves estrangeiras)
+TABLES = [
+    ("usuarios", _create_usuarios),
+    ("postos", _create_postos),
+    ("motoristas", _create_motoristas),
+    ("veiculos", _create_veiculos),
+    ("coletas", _create_coletas),
+    ("preco_histograma", _create_preco_histograma),
+    ("kpi_cubo", _create_kpi_cubo),
+    ("coletas_quarentena", _create_coletas_quarentena),
+]
+
+
+def _adopt_legacy_coletas():
+    # coletas criada por versões antigas do create_all: colunas de dimensão e chave natural
+    op.execute("""
+        ALTER TABLE coletas
+            ADD COLUMN IF NOT EXISTS posto_id INTEGER REFERENCES postos (id),
+            ADD COLUMN IF NOT EXISTS motorista_id INTEGER REFERENCES motoristas (id),
+            ADD COLUMN IF NOT EXISTS veiculo_id INTEGER REFERENCES veiculos (id),
+            ADD COLUMN IF NOT EXISTS tipo_combustivel_codigo SMALLINT,
+            ADD COLUMN IF NOT EXISTS tipo_veiculo_codigo SMALLINT
+    """)
+    op.execute("CREATE INDEX IF NOT EXISTS ix_coletas_posto_id ON coletas (posto_id)")
+    op.execute("CREATE INDEX IF NOT EXISTS ix_coletas_motorista_id ON coletas (motorista_id)")
+    op.execute("CREATE INDEX IF NOT EXISTS ix_coletas_veiculo_id ON coletas (veiculo_id)")
+
+    indexes = {index["name"] for index in sa.inspect(op.get_bind()).get_indexes("coletas")}
+    if "uq_coletas_chave_natural" not in indexes:
+        op.execute("""
+            DELETE FROM coletas c
+            USING coletas d
+            WHERE c.posto_identificador = d.posto_identificador
+              AND c.data_coleta = d.data_coleta
+              AND c.veiculo_placa = d.veiculo_placa
+              AND c.id > d.id
+        """)
+        op.create_index(
+            "uq_coletas_chave_natural", "coletas",
+            ["posto_identificador", "data_coleta", "veiculo_placa"], unique=True,
+        )
+
+
+def upgrade() -> None:
+    existing = set(sa.inspect(op.get_bind()).get_table_names())
+    for table, create in TABLES:
+        if table not in existing:
+            create()
+    if "coletas" in existing:
+        _adopt_legacy_coletas()
+
+
+def downgrade() -> None:
+    for table, _ in reversed(TABLES):
+        op.drop_table(table)
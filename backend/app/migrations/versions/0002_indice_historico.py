@@ -0,0 +1,38 @@
+"""índice do histórico de preços
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-19
+
+Índice (tipo_combustivel_codigo, data_coleta) com preco_venda incluído: o histórico de preços por
+hora vira uma varredura de intervalo só no índice, por combustível e período. Criado com
+CONCURRENTLY para não bloquear as escritas em coletas durante a migração.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+revision: str = "0002"
+down_revision: Union[str, None] = "0001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_coletas_combustivel_data", "coletas",
+            ["tipo_combustivel_codigo", "data_coleta"],
+            postgresql_include=["preco_venda"],
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_coletas_combustivel_data", table_name="coletas",
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
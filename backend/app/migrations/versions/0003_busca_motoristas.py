@@ -0,0 +1,68 @@
+"""busca de motoristas e placas
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-19
+
+Índices de trigramas (pg_trgm) no nome dos motoristas e na placa dos veículos: o autocomplete
+(GET /motoristas/search) busca nas dimensões, uma linha por motorista/placa, com ILIKE
+'%termo%' atendido pelo índice em vez de varrer coletas.
+"""
+import logging
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from core.config import settings
+
+revision: str = "0003"
+down_revision: Union[str, None] = "0002"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TRGM_INDEXES = [
+    ("ix_motoristas_nome_trgm", "motoristas", "nome"),
+    ("ix_veiculos_placa_trgm", "veiculos", "placa"),
+]
+
+log = logging.getLogger("alembic.runtime.migration")
+
+
+def upgrade() -> None:
+    available = op.get_bind().execute(
+        sa.text("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'")
+    ).scalar()
+    if not available:
+        # Sem os índices a busca funciona, mas varre as dimensões inteiras: por padrão a migração
+        # falha em vez de terminar "com sucesso" nesse estado
+        create = "; ".join(
+            f"CREATE INDEX CONCURRENTLY {name} ON {table} USING gin ({column} gin_trgm_ops)"
+            for name, table, column in TRGM_INDEXES
+        )
+        message = (
+            "extensão pg_trgm indisponível no servidor: a busca de motoristas e placas fica sem índice. "
+            f"Instale o contrib e crie os índices: CREATE EXTENSION pg_trgm; {create}"
+        )
+        if settings.DB_TRGM_REQUIRED:
+            raise RuntimeError(message + " (ou DB_TRGM_REQUIRED=false para seguir sem eles)")
+        log.warning(message)
+        return
+
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    with op.get_context().autocommit_block():
+        for name, table, column in TRGM_INDEXES:
+            op.create_index(
+                name, table, [column],
+                postgresql_using="gin",
+                postgresql_ops={column: "gin_trgm_ops"},
+                postgresql_concurrently=True,
+                if_not_exists=True,
+            )
+
+
+def downgrade() -> None:
+    # A extensão fica: pode estar em uso por outros objetos do banco
+    with op.get_context().autocommit_block():
+        for name, table, _ in TRGM_INDEXES:
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
@@ -0,0 +1,36 @@
+"""arquivamento de coletas
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-19
+
+Manifesto dos arquivos de coletas antigas (core/archive.py): cada lote arquivado vira um .npz
+comprimido no disco e uma linha aqui, gravada na mesma transação que apaga as linhas de coletas.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "0004"
+down_revision: Union[str, None] = "0003"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "coletas_arquivo",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("arquivo", sa.String(), nullable=False, unique=True),
+        sa.Column("inicio", sa.DateTime(), nullable=False),
+        sa.Column("fim", sa.DateTime(), nullable=False),
+        sa.Column("corte", sa.DateTime(), nullable=False),
+        sa.Column("linhas", sa.Integer(), nullable=False),
+        sa.Column("criado_em", sa.DateTime(), nullable=False, server_default=sa.func.now()),
+    )
+
+
+def downgrade() -> None:
+    # Os arquivos .npz ficam no disco; sem o manifesto eles não são mais lidos
+    op.drop_table("coletas_arquivo")
@@ -0,0 +1,101 @@
+"""tenant (coreid) em coletas, quarentena e agregados
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-19
+
+Cada coleta passa a pertencer ao tenant (coreid) do usuário que a enviou. As linhas existentes
+ficam com settings.TENANT_LEGACY_COREID: o ADD COLUMN com DEFAULT constante não reescreve a
+tabela no Postgres 11+, e o default é retirado em seguida (toda escrita nova informa o tenant).
+
+O tenant vira a primeira coluna da chave natural, do índice do histórico e das chaves primárias
+do cubo e do histograma: as consultas de um cliente leem só a faixa dele em cada índice. Os
+índices de coletas são recriados com CONCURRENTLY, sem bloquear a ingestão; as tabelas de
+agregados são pequenas e trocam a chave primária dentro da transação.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from core.config import settings
+
+revision: str = "0005"
+down_revision: Union[str, None] = "0004"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TENANT_TABLES = ("coletas", "coletas_quarentena", "kpi_cubo", "preco_histograma")
+
+# Chaves primárias dos agregados, sem o tenant (ver core/database.py)
+ROLLUP_KEYS = {
+    "kpi_cubo": ["estado", "cidade", "posto_id", "tipo_combustivel_codigo", "tipo_veiculo_codigo", "dia"],
+    "preco_histograma": ["tipo_combustivel_codigo", "estado", "dia", "preco_centavos"],
+}
+
+
+def upgrade() -> None:
+    for table in TENANT_TABLES:
+        op.add_column(table, sa.Column(
+            "coreid", sa.String(), nullable=False, server_default=settings.TENANT_LEGACY_COREID,
+        ))
+        op.alter_column(table, "coreid", server_default=None)
+
+    for table, keys in ROLLUP_KEYS.items():
+        op.drop_constraint(f"{table}_pkey", table, type_="primary")
+        op.create_primary_key(f"{table}_pkey", table, ["coreid", *keys])
+
+    op.create_index("ix_coletas_quarentena_coreid", "coletas_quarentena", ["coreid"])
+
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "uq_coletas_tenant_chave_natural", "coletas",
+            ["coreid", "posto_identificador", "data_coleta", "veiculo_placa"],
+            unique=True, postgresql_concurrently=True, if_not_exists=True,
+        )
+        op.create_index(
+            "ix_coletas_tenant_combustivel_data", "coletas",
+            ["coreid", "tipo_combustivel_codigo", "data_coleta"],
+            postgresql_include=["preco_venda"], postgresql_concurrently=True, if_not_exists=True,
+        )
+        op.create_index(
+            "ix_coletas_tenant_id", "coletas", ["coreid", "id"],
+            postgresql_concurrently=True, if_not_exists=True,
+        )
+        op.create_index(
+            "ix_coletas_tenant_motorista", "coletas", ["coreid", "motorista_id"],
+            postgresql_concurrently=True, if_not_exists=True,
+        )
+        op.create_index(
+            "ix_coletas_tenant_veiculo", "coletas", ["coreid", "veiculo_id"],
+            postgresql_concurrently=True, if_not_exists=True,
+        )
+        # Os índices novos cobrem os antigos (mesmas colunas, com o tenant na frente)
+        op.drop_index("uq_coletas_chave_natural", table_name="coletas", postgresql_concurrently=True, if_exists=True)
+        op.drop_index("ix_coletas_combustivel_data", table_name="coletas", postgresql_concurrently=True, if_exists=True)
+
+
+def downgrade() -> None:
+    # Volta a um tenant só: falha se dois clientes tiverem a mesma chave natural ou a mesma célula
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "uq_coletas_chave_natural", "coletas",
+            ["posto_identificador", "data_coleta", "veiculo_placa"],
+            unique=True, postgresql_concurrently=True, if_not_exists=True,
+        )
+        op.create_index(
+            "ix_coletas_combustivel_data", "coletas",
+            ["tipo_combustivel_codigo", "data_coleta"],
+            postgresql_include=["preco_venda"], postgresql_concurrently=True, if_not_exists=True,
+        )
+        for index in ("uq_coletas_tenant_chave_natural", "ix_coletas_tenant_combustivel_data",
+                      "ix_coletas_tenant_id", "ix_coletas_tenant_motorista", "ix_coletas_tenant_veiculo"):
+            op.drop_index(index, table_name="coletas", postgresql_concurrently=True, if_exists=True)
+
+    op.drop_index("ix_coletas_quarentena_coreid", table_name="coletas_quarentena")
+    for table, keys in ROLLUP_KEYS.items():
+        op.drop_constraint(f"{table}_pkey", table, type_="primary")
+        op.create_primary_key(f"{table}_pkey", table, keys)
+
+    for table in TENANT_TABLES:
+        op.drop_column(table, "coreid")
@@ -0,0 +1,56 @@
+"""preço e volume em ponto fixo (inteiros)
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-19
+
+coletas.preco_venda e coletas.volume_vendido (numeric(10, 2)) viram preco_centavos e
+volume_centilitros (integer); as medidas do cubo viram bigint na mesma unidade, e a receita
+(numeric(18, 4)) vira receita_centesimos_centavo. Os valores já têm no máximo 2 casas (4 na
+receita): a conversão é exata. A API continua em reais e litros (models/coleta.py).
+
+Os dois tipos de cada tabela mudam em um único ALTER TABLE: uma reescrita só, com os índices que
+usam as colunas (o INCLUDE do histórico) reconstruídos junto. A tabela fica bloqueada durante a
+reescrita; em bases grandes, rodar na janela de manutenção.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+revision: str = "0006"
+down_revision: Union[str, None] = "0005"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Tabela -> [(coluna antiga, coluna nova, tipo antigo, tipo novo, casas decimais)]
+COLUMNS = {
+    "coletas": [
+        ("preco_venda", "preco_centavos", "numeric(10, 2)", "integer", 2),
+        ("volume_vendido", "volume_centilitros", "numeric(10, 2)", "integer", 2),
+    ],
+    "kpi_cubo": [
+        ("volume_total", "volume_centilitros", "numeric(15, 2)", "bigint", 2),
+        ("soma_preco", "soma_preco_centavos", "numeric(15, 2)", "bigint", 2),
+        ("receita_total", "receita_centesimos_centavo", "numeric(18, 4)", "bigint", 4),
+    ],
+}
+
+
+def upgrade() -> None:
+    for table, columns in COLUMNS.items():
+        op.execute(f"ALTER TABLE {table} " + ", ".join(
+            f"ALTER COLUMN {old} TYPE {new_type} USING round({old} * 1e{decimals})::{new_type}"
+            for old, _, _, new_type, decimals in columns
+        ))
+        for old, new, _, _, _ in columns:
+            op.alter_column(table, old, new_column_name=new)
+
+
+def downgrade() -> None:
+    for table, columns in COLUMNS.items():
+        for old, new, _, _, _ in columns:
+            op.alter_column(table, new, new_column_name=old)
+        op.execute(f"ALTER TABLE {table} " + ", ".join(
+            f"ALTER COLUMN {old} TYPE {old_type} USING {old} / 1e{decimals}"
+            for old, _, old_type, _, decimals in columns
+        ))
@@ -0,0 +1,105 @@
+"""tenant (coreid) nas dimensões postos, motoristas e veículos
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-19
+
+Até aqui as dimensões eram globais: o upsert pela chave natural (identificador, cpf, placa) fazia
+o último cliente a enviar um posto ou motorista renomeá-lo para todos. Cada dimensão passa a ter
+o coreid na chave natural, e cada tenant ganha a própria linha:
+
+1. as linhas existentes ficam com settings.TENANT_LEGACY_COREID (ADD COLUMN com DEFAULT constante,
+   sem reescrever a tabela);
+2. cada (tenant, chave natural) presente em coletas recebe a sua linha, com os atributos da coleta
+   mais recente daquele tenant (o que também desfaz as renomeações entre clientes). Postos só
+   referenciados pelo cubo (coletas já arquivadas) copiam a linha atual;
+3. coletas e kpi_cubo passam a apontar para a linha do próprio tenant;
+4. as linhas que nenhum tenant referencia mais são removidas.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from core.config import settings
+
+revision: str = "0007"
+down_revision: Union[str, None] = "0006"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Tabela -> (chave natural, coluna em coletas, fk em coletas, atributos: coluna na dimensão -> em coletas)
+DIMENSIONS = {
+    "postos": ("identificador", "posto_identificador", "posto_id",
+               {"nome": "posto_nome", "cidade": "cidade", "estado": "estado"}),
+    "motoristas": ("cpf", "motorista_cpf", "motorista_id", {"nome": "motorista_nome"}),
+    "veiculos": ("placa", "veiculo_placa", "veiculo_id", {"tipo_veiculo_codigo": "tipo_veiculo_codigo"}),
+}
+
+
+def upgrade() -> None:
+    for table, (natural, coleta_natural, fk, attributes) in DIMENSIONS.items():
+        op.add_column(table, sa.Column(
+            "coreid", sa.String(), nullable=False, server_default=settings.TENANT_LEGACY_COREID,
+        ))
+        op.alter_column(table, "coreid", server_default=None)
+        op.drop_constraint(f"{table}_{natural}_key", table, type_="unique")
+        op.create_index(f"uq_{table}_tenant_{natural}", table, ["coreid", natural], unique=True)
+
+        columns = ", ".join(attributes)
+        op.execute(f"""
+            INSERT INTO {table} (coreid, {natural}, {columns})
+            SELECT DISTINCT ON (coreid, {coleta_natural}) coreid, {coleta_natural}, {", ".join(attributes.values())}
+            FROM coletas WHERE {fk} IS NOT NULL
+            ORDER BY coreid, {coleta_natural}, data_coleta DESC
+            ON CONFLICT (coreid, {natural}) DO UPDATE SET
+                {", ".join(f"{column} = excluded.{column}" for column in attributes)}
+        """)
+        op.execute(f"""
+            UPDATE coletas c SET {fk} = d.id
+            FROM {table} d
+            WHERE d.coreid = c.coreid AND d.{natural} = c.{coleta_natural} AND c.{fk} <> d.id
+        """)
+
+    # Cubo: as células de coletas arquivadas não têm mais a linha em coletas para a cópia acima
+    op.execute("""
+        INSERT INTO postos (coreid, identificador, nome, cidade, estado)
+        SELECT DISTINCT k.coreid, p.identificador, p.nome, p.cidade, p.estado
+        FROM kpi_cubo k JOIN postos p ON p.id = k.posto_id
+        WHERE p.coreid <> k.coreid
+        ON CONFLICT (coreid, identificador) DO NOTHING
+    """)
+    op.execute("""
+        UPDATE kpi_cubo k SET posto_id = novo.id
+        FROM postos antigo, postos novo
+        WHERE antigo.id = k.posto_id AND antigo.coreid <> k.coreid
+          AND novo.coreid = k.coreid AND novo.identificador = antigo.identificador
+    """)
+
+    for table, (_, _, fk, _) in DIMENSIONS.items():
+        referenced = f"EXISTS (SELECT 1 FROM coletas c WHERE c.{fk} = d.id)"
+        if table == "postos":
+            referenced += " OR EXISTS (SELECT 1 FROM kpi_cubo k WHERE k.posto_id = d.id)"
+        op.execute(f"DELETE FROM {table} d WHERE NOT ({referenced})")
+
+
+def downgrade() -> None:
+    # Volta a uma linha por chave natural: fica a de menor id, e coletas e cubo apontam para ela
+    for table, (natural, _, fk, _) in DIMENSIONS.items():
+        survivor = f"(SELECT min(id) AS id, {natural} FROM {table} GROUP BY {natural})"
+        op.execute(f"""
+            UPDATE coletas c SET {fk} = s.id
+            FROM {table} d, {survivor} s
+            WHERE d.id = c.{fk} AND s.{natural} = d.{natural} AND c.{fk} <> s.id
+        """)
+        if table == "postos":
+            # Células de tenants diferentes não colidem: o coreid segue na chave do cubo
+            op.execute(f"""
+                UPDATE kpi_cubo k SET posto_id = s.id
+                FROM postos d, {survivor} s
+                WHERE d.id = k.posto_id AND s.identificador = d.identificador AND k.posto_id <> s.id
+            """)
+        op.execute(f"DELETE FROM {table} d WHERE d.id NOT IN (SELECT min(id) FROM {table} GROUP BY {natural})")
+        op.drop_index(f"uq_{table}_tenant_{natural}", table_name=table)
+        op.create_unique_constraint(f"{table}_{natural}_key", table, [natural])
+        op.drop_column(table, "coreid")
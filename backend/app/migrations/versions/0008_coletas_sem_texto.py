@@ -0,0 +1,159 @@
+"""coletas só com chaves de dimensão e códigos (sem as colunas de texto)
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-19
+
+Desde a migração 0001 cada coleta guarda posto_id, motorista_id, veiculo_id e os códigos smallint,
+mas ainda repetia em texto posto, cidade, estado, motorista, placa e os tipos. Essas colunas saem:
+a API lê os textos das dimensões (core/dimensions.py, COLETA_TEXT_COLUMNS).
+
+1. coletas sem chaves (gravadas antes das dimensões) recebem as suas, como fazia o
+   scripts/backfill_dimensoes.py, agora parte da migração;
+2. o cubo e o histograma são refeitos a partir do corte do arquivamento: as células vinham da
+   cidade e do estado gravados em cada coleta, e daqui em diante as dobras usam os do posto;
+3. chaves e códigos viram NOT NULL, e a chave natural passa a ser (coreid, posto_id, data_coleta,
+   veiculo_id), equivalente à anterior: o posto e o veículo são únicos por tenant e identificador;
+4. as colunas de texto são removidas (os índices sobre elas saem junto).
+
+Roda em uma transação, com a tabela bloqueada durante o preenchimento e a reescrita dos agregados;
+em bases grandes, rodar na janela de manutenção.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from models.coleta import FUEL_TYPE_CODES, VEHICLE_TYPE_CODES
+
+revision: str = "0008"
+down_revision: Union[str, None] = "0007"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+KEY_COLUMNS = ("posto_id", "motorista_id", "veiculo_id", "tipo_combustivel_codigo", "tipo_veiculo_codigo")
+
+# Coluna de texto -> expressão que a recompõe a partir das dimensões (no downgrade)
+TEXT_COLUMNS = {
+    "posto_identificador": "p.identificador",
+    "posto_nome": "p.nome",
+    "cidade": "p.cidade",
+    "estado": "p.estado",
+    "tipo_combustivel": None,
+    "motorista_nome": "m.nome",
+    "motorista_cpf": "m.cpf",
+    "veiculo_placa": "v.placa",
+    "tipo_veiculo": None,
+}
+
+# Dias a partir do último corte do arquivamento: os anteriores só existem nos agregados
+DESDE_O_CORTE = "(SELECT coalesce(max(corte), '-infinity') FROM coletas_arquivo)"
+
+
+def _case(column: str, codes, reverse: bool = False) -> str:
+    pairs = ((code, f"'{name}'") if reverse else (f"'{name}'", code) for name, code in codes.items())
+    return f"CASE {column} " + " ".join(f"WHEN {when} THEN {then}" for when, then in pairs) + " END"
+
+
+def _backfill_keys():
+    op.execute("""
+        INSERT INTO postos (coreid, identificador, nome, cidade, estado)
+        SELECT DISTINCT ON (coreid, posto_identificador) coreid, posto_identificador, posto_nome, cidade, estado
+        FROM coletas WHERE posto_id IS NULL
+        ORDER BY coreid, posto_identificador, data_coleta DESC
+        ON CONFLICT (coreid, identificador) DO NOTHING
+    """)
+    op.execute("""
+        INSERT INTO motoristas (coreid, cpf, nome)
+        SELECT DISTINCT ON (coreid, motorista_cpf) coreid, motorista_cpf, motorista_nome
+        FROM coletas WHERE motorista_id IS NULL
+        ORDER BY coreid, motorista_cpf, data_coleta DESC
+        ON CONFLICT (coreid, cpf) DO NOTHING
+    """)
+    op.execute(f"""
+        INSERT INTO veiculos (coreid, placa, tipo_veiculo_codigo)
+        SELECT DISTINCT ON (coreid, veiculo_placa) coreid, veiculo_placa, {_case("tipo_veiculo", VEHICLE_TYPE_CODES)}
+        FROM coletas WHERE veiculo_id IS NULL
+        ORDER BY coreid, veiculo_placa, data_coleta DESC
+        ON CONFLICT (coreid, placa) DO NOTHING
+    """)
+    op.execute(f"""
+        UPDATE coletas c SET
+            posto_id = p.id,
+            motorista_id = m.id,
+            veiculo_id = v.id,
+            tipo_combustivel_codigo = {_case("c.tipo_combustivel", FUEL_TYPE_CODES)},
+            tipo_veiculo_codigo = {_case("c.tipo_veiculo", VEHICLE_TYPE_CODES)}
+        FROM postos p, motoristas m, veiculos v
+        WHERE (c.posto_id IS NULL OR c.motorista_id IS NULL OR c.veiculo_id IS NULL
+               OR c.tipo_combustivel_codigo IS NULL OR c.tipo_veiculo_codigo IS NULL)
+          AND p.coreid = c.coreid AND p.identificador = c.posto_identificador
+          AND m.coreid = c.coreid AND m.cpf = c.motorista_cpf
+          AND v.coreid = c.coreid AND v.placa = c.veiculo_placa
+    """)
+
+
+def _refold_rollups():
+    # Mesmas células de core/rollups.py (fold_rollups), com cidade e estado vindos do posto
+    op.execute(f"DELETE FROM kpi_cubo WHERE dia >= {DESDE_O_CORTE}")
+    op.execute(f"DELETE FROM preco_histograma WHERE dia >= {DESDE_O_CORTE}")
+    op.execute(f"""
+        INSERT INTO kpi_cubo (coreid, estado, cidade, posto_id, tipo_combustivel_codigo, tipo_veiculo_codigo, dia,
+                              quantidade, volume_centilitros, soma_preco_centavos, receita_centesimos_centavo)
+        SELECT c.coreid, upper(p.estado), p.cidade, c.posto_id, c.tipo_combustivel_codigo, c.tipo_veiculo_codigo,
+               c.data_coleta::date, count(*), sum(c.volume_centilitros), sum(c.preco_centavos),
+               sum(c.preco_centavos::bigint * c.volume_centilitros)
+        FROM coletas c JOIN postos p ON p.id = c.posto_id
+        WHERE c.data_coleta >= {DESDE_O_CORTE}
+        GROUP BY 1, 2, 3, 4, 5, 6, 7
+    """)
+    op.execute(f"""
+        INSERT INTO preco_histograma (coreid, tipo_combustivel_codigo, estado, dia, preco_centavos, quantidade)
+        SELECT c.coreid, c.tipo_combustivel_codigo, upper(p.estado), c.data_coleta::date, c.preco_centavos, count(*)
+        FROM coletas c JOIN postos p ON p.id = c.posto_id
+        WHERE c.data_coleta >= {DESDE_O_CORTE}
+        GROUP BY 1, 2, 3, 4, 5
+    """)
+
+
+def upgrade() -> None:
+    _backfill_keys()
+    _refold_rollups()
+
+    for column in KEY_COLUMNS:
+        op.alter_column("coletas", column, nullable=False)
+
+    op.drop_index("uq_coletas_tenant_chave_natural", table_name="coletas")
+    op.create_index(
+        "uq_coletas_tenant_chave_natural", "coletas",
+        ["coreid", "posto_id", "data_coleta", "veiculo_id"], unique=True,
+    )
+    for column in TEXT_COLUMNS:
+        op.drop_column("coletas", column)
+
+
+def downgrade() -> None:
+    for column in TEXT_COLUMNS:
+        op.add_column("coletas", sa.Column(column, sa.String(), nullable=True))
+    expressions = {
+        **TEXT_COLUMNS,
+        "tipo_combustivel": _case("c.tipo_combustivel_codigo", FUEL_TYPE_CODES, reverse=True),
+        "tipo_veiculo": _case("c.tipo_veiculo_codigo", VEHICLE_TYPE_CODES, reverse=True),
+    }
+    op.execute(f"""
+        UPDATE coletas c SET {", ".join(f"{column} = {expression}" for column, expression in expressions.items())}
+        FROM postos p, motoristas m, veiculos v
+        WHERE p.id = c.posto_id AND m.id = c.motorista_id AND v.id = c.veiculo_id
+    """)
+    for column in TEXT_COLUMNS:
+        op.alter_column("coletas", column, nullable=False)
+
+    op.drop_index("uq_coletas_tenant_chave_natural", table_name="coletas")
+    op.create_index(
+        "uq_coletas_tenant_chave_natural", "coletas",
+        ["coreid", "posto_identificador", "data_coleta", "veiculo_placa"], unique=True,
+    )
+    op.create_index("ix_coletas_posto_identificador", "coletas", ["posto_identificador"])
+    op.create_index("ix_coletas_veiculo_placa", "coletas", ["veiculo_placa"])
+    for column in KEY_COLUMNS:
+        op.alter_column("coletas", column, nullable=True)
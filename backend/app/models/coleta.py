@@ -1,12 +1,67 @@
 from datetime import datetime
-from typing import Literal, Optional, List
-from pydantic import BaseModel, Field, condecimal
+from decimal import Decimal, ROUND_HALF_UP
+from typing import Any, Dict, Literal, Optional, List, Union
+from pydantic import BaseModel, Field, condecimal, model_validator
+from pydantic.json_schema import SkipJsonSchema
 
 
 # Define os valores permitidos para validação
 FuelType = Literal["Gasolina", "Etanol", "Diesel S10"]
 VehicleType = Literal["Carro", "Moto", "Caminhão Leve", "Carreta", "Ônibus"]
 
+# Códigos smallint gravados em coletas/veiculos. Novos tipos devem receber novos códigos (nunca reaproveitar)
+FUEL_TYPE_CODES = {"Gasolina": 1, "Etanol": 2, "Diesel S10": 3}
+VEHICLE_TYPE_CODES = {"Carro": 1, "Moto": 2, "Caminhão Leve": 3, "Carreta": 4, "Ônibus": 5}
+FUEL_TYPE_BY_CODE = {code: name for name, code in FUEL_TYPE_CODES.items()}
+VEHICLE_TYPE_BY_CODE = {code: name for name, code in VEHICLE_TYPE_CODES.items()}
+
+# Volume máximo plausível em um abastecimento (litros); acima disso a leitura é tratada como anomalia
+VEHICLE_TANK_CAPACITY = {"Carro": 100, "Moto": 30, "Caminhão Leve": 300, "Carreta": 1500, "Ônibus": 600}
+
+# Preço e volume são gravados em ponto fixo: inteiros em centavos e centilitros (casas decimais de
+# cada um abaixo). A API continua em reais e litros; a conversão acontece só aqui, na entrada
+# (to_storage) e na saída (from_storage). Somas e a receita (centavos x centilitros, em centésimos
+# de centavo) ficam em aritmética inteira no banco, exatas
+PRICE_DECIMALS = 2
+VOLUME_DECIMALS = 2
+REVENUE_DECIMALS = PRICE_DECIMALS + VOLUME_DECIMALS
+FIXED_POINT_COLUMNS = {
+    "preco_venda": ("preco_centavos", PRICE_DECIMALS),
+    "volume_vendido": ("volume_centilitros", VOLUME_DECIMALS),
+}
+# Maior valor que cabe na coluna integer de coletas (em reais ou litros)
+FIXED_POINT_MAX = Decimal(2**31 - 1).scaleb(-2)
+
+
+def to_fixed(value: Any, decimals: int) -> int:
+    return int(Decimal(value).scaleb(decimals).to_integral_value(rounding=ROUND_HALF_UP))
+
+
+def from_fixed(value: Any, decimals: int) -> Decimal:
+    # Decimal com o expoente fixo: 590 centavos -> Decimal('5.90'), como vinha do Numeric(10, 2)
+    return Decimal(int(value)).scaleb(-decimals)
+
+
+def to_storage(values: Dict[str, Any]) -> Dict[str, Any]:
+    # Campos da API (reais, litros) -> colunas de coletas (centavos, centilitros); None passa direto
+    row = dict(values)
+    for field, (column, decimals) in FIXED_POINT_COLUMNS.items():
+        if field in row:
+            value = row.pop(field)
+            row[column] = None if value is None else to_fixed(value, decimals)
+    return row
+
+
+def from_storage(data: Any) -> Any:
+    # Linha do banco ou do arquivo (centavos, centilitros) -> campos da API (reais, litros)
+    if not isinstance(data, dict) or not any(column in data for column, _ in FIXED_POINT_COLUMNS.values()):
+        return data
+    data = dict(data)
+    for field, (column, decimals) in FIXED_POINT_COLUMNS.items():
+        if column in data:
+            data[field] = from_fixed(data.pop(column), decimals)
+    return data
+
 
 # Base Model de Coleta dos dados do IOT
 class ColetaBase(BaseModel):
@@ -16,8 +71,8 @@ class ColetaBase(BaseModel):
     estado: str
     data_coleta: datetime = Field(..., description="Data e hora da coleta.")
     tipo_combustivel: FuelType
-    preco_venda: condecimal(max_digits=10, decimal_places=2) = Field(..., gt=0, description="Preço por litro em Reais.")
-    volume_vendido: condecimal(max_digits=10, decimal_places=2) = Field(..., gt=0, description="Volume vendido em litros.")
+    preco_venda: condecimal(max_digits=10, decimal_places=2) = Field(..., gt=0, le=FIXED_POINT_MAX, description="Preço por litro em Reais.")
+    volume_vendido: condecimal(max_digits=10, decimal_places=2) = Field(..., gt=0, le=FIXED_POINT_MAX, description="Volume vendido em litros.")
     motorista_nome: str
     motorista_cpf: str = Field(..., min_length=11, description="CPF do motorista (apenas números ou formatado).")
     veiculo_placa: str
@@ -26,13 +81,21 @@ class ColetaBase(BaseModel):
 
 # DTO de CREATE (Entrada)
 class ColetaCreate(ColetaBase):
-    pass
+    # Tenant dono da coleta: sempre o coreid do usuário autenticado, preenchido pela rota (o valor
+    # enviado pelo cliente é sobrescrito). Viaja no payload da fila de ingestão e da quarentena
+    coreid: SkipJsonSchema[Optional[str]] = None
 
 
 # DTO de RESPOSTA COMPLETA (Saída)
 class Coleta(ColetaBase):
     id: int 
     data_coleta: str = Field(..., description="Data e hora da coleta formatada (AAAA-MM-DD HH:MI).")
+
+    # As rotas selecionam preco_centavos/volume_centilitros direto de coletas
+    @model_validator(mode="before")
+    @classmethod
+    def converter_ponto_fixo(cls, data: Any) -> Any:
+        return from_storage(data)
     
     class Config:
         from_attributes = True 
@@ -40,13 +103,27 @@ class Coleta(ColetaBase):
 # DTO de PUT/PATCH
 class ColetaUpdate(BaseModel):
     posto_nome: Optional[str] = None
-    preco_venda: Optional[condecimal(max_digits=10, decimal_places=2)] = None
-    volume_vendido: Optional[condecimal(max_digits=10, decimal_places=2)] = None
+    preco_venda: Optional[condecimal(max_digits=10, decimal_places=2)] = Field(None, le=FIXED_POINT_MAX)
+    volume_vendido: Optional[condecimal(max_digits=10, decimal_places=2)] = Field(None, le=FIXED_POINT_MAX)
     motorista_nome: Optional[str] = None
     motorista_cpf: Optional[str] = None
     veiculo_placa: Optional[str] = None
     tipo_veiculo: Optional[VehicleType] = None
 
+# DTO de PATCH em lote (por filtro): só campos que não mudam chaves de dimensão nem a chave natural.
+# Sem posto_nome: o nome é atributo do posto (PostoModel), não de um subconjunto de coletas
+class ColetaUpdateLote(BaseModel):
+    preco_venda: Optional[condecimal(max_digits=10, decimal_places=2)] = Field(None, gt=0, le=FIXED_POINT_MAX, description="Preço por litro em Reais.")
+    volume_vendido: Optional[condecimal(max_digits=10, decimal_places=2)] = Field(None, gt=0, le=FIXED_POINT_MAX, description="Volume vendido em litros.")
+
+    class Config:
+        extra = "forbid"  # campo fora da lista é erro (422), não ignorado em silêncio
+
+# DTO de RESPOSTA do PATCH/DELETE em lote
+class AlteracaoLoteResultado(BaseModel):
+    afetadas: int = Field(..., description="Coletas que casam com o filtro (alteradas ou excluídas, se não for dry_run).")
+    dry_run: bool
+
 # DTO de RESPOSTA para Motoristas (Histórico e Ranking)
 class ColetaMotoristaResponse(BaseModel):
     
@@ -64,6 +141,23 @@ class ColetaMotoristaResponse(BaseModel):
     posto_nome: str
     cidade: str
     estado: str
+
+    @model_validator(mode="before")
+    @classmethod
+    def converter_ponto_fixo(cls, data: Any) -> Any:
+        return from_storage(data)
     
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+# DTOs de RESPOSTA da busca de motoristas e placas (autocomplete)
+class MotoristaSugestao(BaseModel):
+    motorista_nome: str
+    motorista_cpf: str
+
+class PlacaSugestao(BaseModel):
+    veiculo_placa: str
+    tipo_veiculo: Union[VehicleType, int, None]  # código sem rótulo sai como está (ver routes/dashboard.py)
+
+class BuscaMotoristasResponse(BaseModel):
+    motoristas: List[MotoristaSugestao] = Field(..., description="Motoristas distintos cujo nome contém o termo.")
+    placas: List[PlacaSugestao] = Field(..., description="Placas distintas que contêm o termo.")
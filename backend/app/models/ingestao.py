@@ -0,0 +1,37 @@
+from pydantic import BaseModel, Field
+from typing import List, Literal, Optional
+
+
+class IngestaoAceita(BaseModel):
+    status: str = Field("enfileirada", description="A coleta foi aceita e será gravada de forma assíncrona.")
+    fila: Literal["redis", "local"] = Field(..., description="Fila que recebeu a coleta (Redis Stream ou fila local com WAL).")
+    message_id: Optional[str] = Field(None, description="ID da mensagem no Redis Stream, quando aplicável.")
+
+
+class IngestaoMetricas(BaseModel):
+    worker_running: bool = Field(..., description="Indica se o worker de ingestão está rodando neste processo.")
+    backlog: int = Field(..., description="Coletas aguardando gravação (stream + fila local).")
+    max_pending: int = Field(..., description="Limite de backlog a partir do qual a API responde 503.")
+    stream_length: Optional[int] = Field(None, description="Mensagens no Redis Stream ainda não gravadas.")
+    oldest_pending_seconds: Optional[float] = Field(None, description="Idade (em segundos) da coleta mais antiga no stream.")
+    local_queue_length: int = Field(..., description="Coletas na fila local (fallback com WAL) deste processo.")
+    processed_total: int = Field(..., description="Coletas gravadas por este worker.")
+    invalid_total: int = Field(..., description="Mensagens descartadas por falha de validação.")
+    duplicates_total: int = Field(..., description="Coletas descartadas por já existirem (mesma chave natural).")
+    quarantined_total: int = Field(..., description="Coletas retidas na quarentena por anomalia.")
+    dead_letter_total: int = Field(..., description="Coletas movidas para a fila de mortas após falhas repetidas.")
+    batches_total: int = Field(..., description="Lotes gravados por este worker.")
+    last_batch_size: int = Field(..., description="Tamanho do último lote gravado.")
+    last_batch_duplicates: int = Field(..., description="Duplicatas descartadas no último lote.")
+    last_batch_seconds: Optional[float] = Field(None, description="Duração do último lote (validação + INSERT + commit).")
+    last_flush_at: Optional[float] = Field(None, description="Timestamp Unix do último lote gravado.")
+    last_error: Optional[str] = Field(None, description="Último erro do worker, se houver.")
+
+
+class LoteResultado(BaseModel):
+    recebidas: int = Field(..., description="Coletas recebidas no lote.")
+    inseridas: int = Field(..., description="Coletas gravadas.")
+    duplicadas: int = Field(..., description="Coletas ignoradas por já existirem (posto + data + placa).")
+    quarentena: int = Field(0, description="Coletas retidas na quarentena por anomalia.")
+    ids: List[Optional[int]] = Field(..., description="ID gravado de cada coleta, na ordem de envio (null para duplicatas e retidas).")
+    quarentena_ids: List[Optional[int]] = Field(..., description="ID na quarentena de cada coleta retida, na ordem de envio.")
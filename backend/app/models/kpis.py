@@ -1,23 +1,42 @@
 from pydantic import BaseModel,Field,condecimal
-from typing import Optional, List, Union
+from typing import Any, Dict, Optional, List, Union
 from datetime import datetime,date
 from typing import List
 from models.coleta import FuelType, VehicleType
 
+# Código sem rótulo (coletas anteriores à migração, combustível ou veículo novo) sai como o próprio código
 class MediaPrecoCombustivel(BaseModel):
-    tipo_combustivel: FuelType 
+    tipo_combustivel: Union[FuelType, int, None]
     media_preco: float 
 
 class VolumeConsumidoVeiculo(BaseModel):
-    tipo_veiculo: VehicleType
+    tipo_veiculo: Union[VehicleType, int, None]
     volume_total: float
 
 
 class PrecoHistoricoResponse(BaseModel):
 
-    data_coleta: date 
+    data_coleta: Union[datetime, date] = Field(..., description="Início do período (data e hora na granularidade 'hora').")
     tipo_combustivel: FuelType
-    preco_medio_arredondado: float
+    preco_medio_arredondado: Optional[float] = Field(None, description="Nulo nos períodos sem coletas (preencher_lacunas).")
+
+class PercentisPreco(BaseModel):
+    tipo_combustivel: Union[FuelType, int]
+    estado: Optional[str] = Field(None, description="Sigla do estado (quando agrupado ou filtrado por estado).")
+    total_coletas: int = Field(..., description="Número de coletas consideradas no período.")
+    p10: float = Field(..., description="Percentil 10 do preço por litro.")
+    p50: float = Field(..., description="Mediana do preço por litro.")
+    p90: float = Field(..., description="Percentil 90 do preço por litro.")
+
+class KpiCubo(BaseModel):
+    estado: str = Field(..., description="Sigla do estado.")
+    cidade: Optional[str] = Field(None, description="Cidade (níveis cidade e posto).")
+    posto_identificador: Optional[str] = Field(None, description="CNPJ/ID do posto (nível posto).")
+    posto_nome: Optional[str] = Field(None, description="Nome do posto (nível posto).")
+    total_abastecimentos: int = Field(..., description="Número de coletas (abastecimentos) no recorte.")
+    volume_total: condecimal(max_digits=15, decimal_places=2) = Field(..., description="Volume total vendido em litros.")
+    media_preco: condecimal(max_digits=10, decimal_places=2) = Field(..., description="Preço médio por litro.")
+    receita_total: condecimal(max_digits=15, decimal_places=2) = Field(..., description="Soma de (preco_venda * volume_vendido) em Reais.")
 
 class PostoRankingEstado(BaseModel):
     estado: str = Field(..., description="Estado da federação.")
@@ -41,9 +60,22 @@ class VolumeTotalConsumido(BaseModel):
 
 # Maior Consumidor (Tipo de Veículo
 class MaiorConsumidor(BaseModel):
-    tipo_veiculo: str = Field(..., description="Tipo de veículo que mais consumiu.")
+    tipo_veiculo: Union[str, int, None] = Field(..., description="Tipo de veículo que mais consumiu.")
     volume_total: condecimal(max_digits=15, decimal_places=2) = Field(..., description="Volume total consumido por este tipo de veículo.")
 
 # Receita Total Estimada
 class ReceitaTotalEstimada(BaseModel):
-    receita_total: condecimal(max_digits=15, decimal_places=2) = Field(..., description="Soma de (preco_venda * volume_vendido) em Reais.")
\ No newline at end of file
+    receita_total: condecimal(max_digits=15, decimal_places=2) = Field(..., description="Soma de (preco_venda * volume_vendido) em Reais.")
+# Consulta em lote (POST /dashboard/query): vários KPIs, cada um com seus filtros, em uma requisição
+class KpiConsulta(BaseModel):
+    kpi: str = Field(..., description="Nome do KPI: o caminho do endpoint no dashboard (ex.: 'historico-preco-combustivel').")
+    params: Dict[str, Any] = Field(default_factory=dict, description="Os mesmos parâmetros de query do endpoint.")
+
+class KpiResultado(BaseModel):
+    kpi: str = Field(..., description="Nome do KPI consultado.")
+    params: Dict[str, Any] = Field(..., description="Parâmetros como enviados.")
+    status: int = Field(..., description="Status HTTP que o endpoint individual teria respondido.")
+    cache: bool = Field(..., description="True se o resultado veio do cache.")
+    desatualizado: bool = Field(False, description="True se o sistema estava sobrecarregado e o resultado é a última cópia em cache.")
+    dados: Optional[Any] = Field(None, description="Resposta do endpoint (nula em caso de erro).")
+    erro: Optional[Any] = Field(None, description="Detalhe do erro, quando status != 200.")
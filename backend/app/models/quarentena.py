@@ -0,0 +1,17 @@
+from datetime import datetime
+from typing import Literal, Optional
+from pydantic import BaseModel, Field
+from models.coleta import ColetaCreate
+
+StatusQuarentena = Literal["quarentena", "sinalizada", "readmitida", "descartada"]
+
+
+class ColetaQuarentena(BaseModel):
+    id: int
+    status: StatusQuarentena = Field(..., description="quarentena (retida), sinalizada (gravada com alerta), readmitida ou descartada.")
+    motivo: str = Field(..., description="Regra de anomalia que a leitura violou.")
+    score: Optional[float] = Field(None, description="z-score do preço ou razão volume/capacidade do veículo.")
+    coleta_id: Optional[int] = Field(None, description="ID em coletas, quando a leitura foi gravada.")
+    criado_em: datetime
+    resolvido_em: Optional[datetime] = None
+    coleta: ColetaCreate = Field(..., description="Leitura como recebida na ingestão.")
@@ -1,19 +1,30 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Security
+from fastapi import APIRouter, Body, Depends, HTTPException, Query, Response, status, Security
 from fastapi.security import HTTPBearer 
 from sqlalchemy.orm import Session
-from sqlalchemy import func 
+from sqlalchemy import Integer, and_, any_, func, literal, select, update, delete
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.exc import IntegrityError
+from datetime import date, datetime
 from typing import List, Optional
-from core.database import get_db, ColetaModel 
-from core.authguard import CurrentUser 
-from models.coleta import ColetaCreate, ColetaUpdate, Coleta, FuelType, VehicleType
-from core.cache_utils import invalidate_dashboard_cache, set_last_update_timestamp
-
-DASHBOARD_CACHE_KEYS = [
-    "kpi_historico_preco", 
-    "kpi_media_preco", 
-    "kpi_volume_veiculo", 
-    "kpi_ranking_estado"
-]
+from core.database import get_db, ColetaModel, PostoModel, VeiculoModel
+from core.replicas import cache_fill_session, get_read_db
+from core.authguard import CurrentUser, Tenant 
+from models.coleta import (
+    FUEL_TYPE_CODES, VEHICLE_TYPE_CODES,
+    AlteracaoLoteResultado, ColetaCreate, ColetaUpdate, ColetaUpdateLote, Coleta, FuelType, VehicleType, to_storage
+)
+from core.cache_utils import cached_response, mark_data_changed
+from core.coletas_cache import (
+    FILTER_FIELDS, coleta_filter_values, invalidate_coletas_cache, normalize_filters,
+    read_cached_detail, read_cached_page, store_detail, store_page,
+)
+from core.ingestion import ingest_coletas, find_coleta_id
+from core.dimensions import COLETA_TEXT_COLUMNS, coleta_text_columns, join_dimensions, refresh_dimension_keys
+from core.rollups import fold_rollups
+from core.archive import query_archive
+from core.ingestion_queue import INGESTION_WORKER, IngestionQueueFull, IngestionQueueUnavailable
+from core.config import settings
+from models.ingestao import IngestaoAceita, IngestaoMetricas, LoteResultado
 
 
 def row_to_dict(row):
@@ -31,47 +42,119 @@ PG_DISPLAY_FORMAT_STRING = 'YYYY/MM/DD - HH24:MI'
 @router.post("/", 
              response_model=Coleta, 
              status_code=status.HTTP_201_CREATED,
-             summary="Cria um novo registro de coleta de combustível.")
+             summary="Cria um novo registro de coleta de combustível. Reenvios da mesma coleta (posto + data + placa) retornam o registro existente com status 200; leituras anômalas vão para a quarentena (422).")
 def create_coleta(
-    current_user: CurrentUser, 
+    tenant: Tenant, 
     coleta: ColetaCreate, 
+    response: Response,
     db: Session = Depends(get_db) 
 ):
-    db_coleta = ColetaModel(**coleta.model_dump())
-    db.add(db_coleta)
+    coleta.coreid = tenant
+    ids, quarentena_ids = ingest_coletas(db, [coleta])
+    coleta_id = ids[0]
     db.commit()
+
+    if quarentena_ids[0] is not None:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail={"message": "Leitura retida na quarentena por anomalia.", "quarentena_id": quarentena_ids[0]},
+        )
     
-    invalidate_dashboard_cache(DASHBOARD_CACHE_KEYS)
-    set_last_update_timestamp()
+    if coleta_id is None:
+        # Retry de um dispositivo: nada foi gravado, então o cache continua válido
+        coleta_id = find_coleta_id(db, coleta)
+        response.status_code = status.HTTP_200_OK
+    else:
+        mark_data_changed(tenant)
+        invalidate_coletas_cache(appended=[coleta_filter_values(coleta)])
     # -----------------------------
 
     query_select = [
         ColetaModel.id,
-        ColetaModel.posto_identificador,
-        ColetaModel.posto_nome,
-        ColetaModel.cidade,
-        ColetaModel.estado,
-        ColetaModel.tipo_combustivel,
-        ColetaModel.volume_vendido,
-        ColetaModel.preco_venda,
-        ColetaModel.motorista_cpf,
-        ColetaModel.motorista_nome,
-        ColetaModel.tipo_veiculo,
-        ColetaModel.veiculo_placa,
+        *coleta_text_columns(),
+        ColetaModel.volume_centilitros,
+        ColetaModel.preco_centavos,
         func.to_char(ColetaModel.data_coleta, PG_DISPLAY_FORMAT_STRING).label('data_coleta'), 
     ]
     
-    formatted_row = db.query(*query_select).filter(ColetaModel.id == db_coleta.id).first()
+    formatted_row = join_dimensions(db.query(*query_select)).filter(ColetaModel.id == coleta_id).first()
     
     return Coleta.model_validate(row_to_dict(formatted_row))
 
 
+@router.post("/lote", 
+             response_model=LoteResultado, 
+             summary="Grava um lote de coletas em um único INSERT, ignorando duplicatas e retendo anomalias na quarentena.")
+def create_coletas_lote(
+    tenant: Tenant, 
+    coletas: List[ColetaCreate] = Body(..., max_length=settings.INGESTION_BATCH_SIZE), 
+    db: Session = Depends(get_db) 
+):
+    for coleta in coletas:
+        coleta.coreid = tenant
+    ids, quarentena_ids = ingest_coletas(db, coletas)
+    db.commit()
+
+    inseridas = len(ids) - ids.count(None)
+    quarentena = len(quarentena_ids) - quarentena_ids.count(None)
+    if inseridas:
+        mark_data_changed(tenant)
+        invalidate_coletas_cache(appended=[
+            coleta_filter_values(coleta) for coleta, coleta_id in zip(coletas, ids) if coleta_id is not None
+        ])
+
+    return LoteResultado(
+        recebidas=len(coletas),
+        inseridas=inseridas,
+        duplicadas=ids.count(None) - quarentena,
+        quarentena=quarentena,
+        ids=ids,
+        quarentena_ids=quarentena_ids,
+    )
+
+
+@router.post("/ingestao", 
+             response_model=IngestaoAceita, 
+             status_code=status.HTTP_202_ACCEPTED,
+             summary="Enfileira uma coleta para gravação assíncrona em lote (write-behind).")
+def enqueue_coleta(
+    tenant: Tenant, 
+    coleta: ColetaCreate
+):
+    # O tenant vai no payload: o worker grava e invalida o cache do cliente certo
+    coleta.coreid = tenant
+    try:
+        fila, message_id = INGESTION_WORKER.enqueue(coleta)
+    except IngestionQueueFull:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Fila de ingestão cheia. Tente novamente em instantes.",
+            headers={"Retry-After": "5"},
+        )
+    except IngestionQueueUnavailable:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Fila de ingestão indisponível. Use o endpoint síncrono.",
+        )
+
+    return IngestaoAceita(fila=fila, message_id=message_id)
+
+
+@router.get("/ingestao/metricas", 
+            response_model=IngestaoMetricas, 
+            summary="Métricas de lag e throughput da fila de ingestão assíncrona.")
+def get_ingestao_metricas(
+    current_user: CurrentUser
+):
+    return IngestaoMetricas.model_validate(INGESTION_WORKER.metrics())
+
+
 @router.get("/", 
             response_model=List[Coleta], 
             summary="Lista coletas com paginação e filtros opcionais.")
 def read_coletas(
-    current_user: CurrentUser, 
-    db: Session = Depends(get_db),
+    tenant: Tenant, 
+    db: Session = Depends(get_read_db),
     
     skip: int = 0,      
     limit: int = 100,     
@@ -80,140 +163,305 @@ def read_coletas(
     estado: Optional[str] = None,
     tipo_veiculo: Optional[VehicleType] = None,
 ):
+    filtros = normalize_filters(tenant, estado, cidade, tipo_combustivel, tipo_veiculo)
+    cached_page = read_cached_page(filtros, skip, limit)
+    if cached_page:
+        return cached_response(cached_page)
     
     query_select = [
         ColetaModel.id,
-        ColetaModel.posto_identificador,
-        ColetaModel.posto_nome,
-        ColetaModel.cidade,
-        ColetaModel.estado,
-        ColetaModel.tipo_combustivel,
-        ColetaModel.volume_vendido,
-        ColetaModel.preco_venda,
-        ColetaModel.motorista_cpf,
-        ColetaModel.motorista_nome,
-        ColetaModel.tipo_veiculo,
-        ColetaModel.veiculo_placa,
+        *coleta_text_columns(),
+        ColetaModel.volume_centilitros,
+        ColetaModel.preco_centavos,
         func.to_char(ColetaModel.data_coleta, PG_DISPLAY_FORMAT_STRING).label('data_coleta'), 
     ]
     
-    query = db.query(*query_select)
+    query = join_dimensions(db.query(*query_select))
     
-    filters = []
+    filters = [ColetaModel.coreid == tenant]
     
     if tipo_combustivel:
-        filters.append(ColetaModel.tipo_combustivel == tipo_combustivel)
+        filters.append(ColetaModel.tipo_combustivel_codigo == FUEL_TYPE_CODES[tipo_combustivel])
     if cidade:
-        filters.append(ColetaModel.cidade == func.upper(cidade))
+        filters.append(PostoModel.cidade == filtros["cidade"])
     if estado:
-        filters.append(ColetaModel.estado == func.upper(estado))
+        filters.append(PostoModel.estado == filtros["estado"])
     if tipo_veiculo:
-        filters.append(ColetaModel.tipo_veiculo == tipo_veiculo)
+        filters.append(ColetaModel.tipo_veiculo_codigo == VEHICLE_TYPE_CODES[tipo_veiculo])
         
-    if filters:
-        query = query.filter(*filters) 
+    query = query.filter(*filters) 
         
-    coletas_rows = (
-        query
-        .offset(skip)
-        .limit(limit)
-        .all()
-    )
+    # Ordem por id: páginas estáveis, e inserções só afetam o fim da listagem (ver core/coletas_cache.py).
+    # A página vai para o cache: réplica só se já aplicou a última escrita do tenant (ver core/replicas.py)
+    with cache_fill_session(db, tenant) as fill_db:
+        coletas_rows = (
+            query
+            .with_session(fill_db)
+            .order_by(ColetaModel.id)
+            .offset(skip)
+            .limit(limit)
+            .all()
+        )
     
     data_dicts = [row_to_dict(row) for row in coletas_rows]
     
-    return [Coleta.model_validate(item) for item in data_dicts]
+    result = [Coleta.model_validate(item) for item in data_dicts]
+    store_page(filtros, skip, limit, result)
+    return result
+
+
+# Coletas arquivadas (core/archive.py): lidas sob demanda dos arquivos do período, sem cache
+@router.get("/arquivo", 
+            response_model=List[Coleta], 
+            summary="Lista coletas já arquivadas (anteriores ao horizonte de retenção) de um período.")
+def read_coletas_arquivadas(
+    tenant: Tenant,
+    db: Session = Depends(get_read_db),
+    data_inicio: date = Query(..., description="Primeiro dia do período (inclusive)."),
+    data_fim: date = Query(..., description="Último dia do período (inclusive)."),
+    posto_identificador: Optional[str] = Query(None, description="Filtrar por posto (exato)."),
+    veiculo_placa: Optional[str] = Query(None, description="Filtrar por placa (exato)."),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+):
+    if data_fim < data_inicio:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="data_fim anterior a data_inicio.")
+
+    rows = query_archive(db, tenant, data_inicio, data_fim, posto_identificador, veiculo_placa, skip, limit)
+    return [Coleta.model_validate(row) for row in rows]
 
 
 # GET/ID
 @router.get("/{coleta_id}", response_model=Coleta, summary="Obtém um registro por ID.")
 def read_coleta(
-    current_user: CurrentUser,
+    tenant: Tenant,
     coleta_id: int, 
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
+    cached_coleta = read_cached_detail(tenant, coleta_id)
+    if cached_coleta:
+        return cached_response(cached_coleta)
     
     query_select = [
         ColetaModel.id,
-        ColetaModel.posto_identificador,
-        ColetaModel.posto_nome,
-        ColetaModel.cidade,
-        ColetaModel.estado,
-        ColetaModel.tipo_combustivel,
-        ColetaModel.volume_vendido,
-        ColetaModel.preco_venda,
-        ColetaModel.motorista_cpf,
-        ColetaModel.motorista_nome,
-        ColetaModel.tipo_veiculo,
-        ColetaModel.veiculo_placa,
+        *coleta_text_columns(),
+        ColetaModel.volume_centilitros,
+        ColetaModel.preco_centavos,
         func.to_char(ColetaModel.data_coleta, PG_DISPLAY_FORMAT_STRING).label('data_coleta'),
     ]
     
-    coleta_row = db.query(*query_select).filter(ColetaModel.id == coleta_id).first()
+    # Coleta de outro tenant responde 404, como uma inexistente. Vai para o cache: réplica só se em dia
+    with cache_fill_session(db, tenant) as fill_db:
+        coleta_row = (
+            join_dimensions(fill_db.query(*query_select))
+            .filter(ColetaModel.id == coleta_id, ColetaModel.coreid == tenant)
+            .first()
+        )
     
     if coleta_row is None:
         raise HTTPException(status_code=404, detail="Coleta não encontrada")
     
     data_dict = row_to_dict(coleta_row)
     
-    return Coleta.model_validate(data_dict)
+    result = Coleta.model_validate(data_dict)
+    store_detail(tenant, coleta_id, result)
+    return result
+
+
+def coleta_text_values(db: Session, coleta_id: int) -> dict:
+    # Tenant e campos de texto da coleta, lidos pelas dimensões
+    row = join_dimensions(db.query(ColetaModel.coreid, *coleta_text_columns())).filter(ColetaModel.id == coleta_id).one()
+    return row_to_dict(row)
 
 
 @router.put("/{coleta_id}", response_model=Coleta, summary="Atualiza um registro existente.")
 def update_coleta(
-    current_user: CurrentUser,
+    tenant: Tenant,
     coleta_id: int, 
     coleta_data: ColetaUpdate, 
     db: Session = Depends(get_db)
 ):
-    coleta = db.query(ColetaModel).filter(ColetaModel.id == coleta_id).first()
+    coleta = db.query(ColetaModel).filter(ColetaModel.id == coleta_id, ColetaModel.coreid == tenant).first()
     if coleta is None:
         raise HTTPException(status_code=404, detail="Coleta não encontrada")
     
-    for key, value in coleta_data.model_dump(exclude_unset=True).items():
-        setattr(coleta, key, value)
+    # Os campos de texto vêm das dimensões: a alteração é aplicada sobre eles e resolvida em novas chaves
+    valores = coleta_text_values(db, coleta_id)
+    antes = coleta_filter_values(valores)
+
+    # Retira a versão antiga dos agregados e dobra a nova, na mesma transação
+    fold_rollups(db, ColetaModel.id == coleta_id, sign=-1)
+    for key, value in to_storage(coleta_data.model_dump(exclude_unset=True)).items():
+        if key in COLETA_TEXT_COLUMNS:
+            if value is not None:
+                valores[key] = value
+        else:
+            setattr(coleta, key, value)
+    refresh_dimension_keys(db, coleta, valores)
+    try:
+        db.flush()
+    except IntegrityError:
+        # Posto, data ou placa novos caíram na chave natural de outra coleta do tenant
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Já existe uma coleta com o mesmo posto, data e placa.",
+        )
+    fold_rollups(db, ColetaModel.id == coleta_id)
     
     db.commit()
-    db.refresh(coleta)
     
-    invalidate_dashboard_cache(DASHBOARD_CACHE_KEYS)
-    set_last_update_timestamp()
+    mark_data_changed(tenant)
+    invalidate_coletas_cache(changed=[antes, coleta_filter_values(valores)], coleta_ids=[coleta_id], tenant=tenant)
     
     query_select = [
         ColetaModel.id,
-        ColetaModel.posto_identificador,
-        ColetaModel.posto_nome,
-        ColetaModel.cidade,
-        ColetaModel.estado,
-        ColetaModel.tipo_combustivel,
-        ColetaModel.volume_vendido,
-        ColetaModel.preco_venda,
-        ColetaModel.motorista_cpf,
-        ColetaModel.motorista_nome,
-        ColetaModel.tipo_veiculo,
-        ColetaModel.veiculo_placa,
+        *coleta_text_columns(),
+        ColetaModel.volume_centilitros,
+        ColetaModel.preco_centavos,
         func.to_char(ColetaModel.data_coleta, PG_DISPLAY_FORMAT_STRING).label('data_coleta'), 
     ]
     
-    formatted_row = db.query(*query_select).filter(ColetaModel.id == coleta_id).first()
+    formatted_row = join_dimensions(db.query(*query_select)).filter(ColetaModel.id == coleta_id).first()
 
     return Coleta.model_validate(row_to_dict(formatted_row))
 
 
 @router.delete("/{coleta_id}", status_code=status.HTTP_204_NO_CONTENT, summary="Deleta um registro.")
 def delete_coleta(
-    current_user: CurrentUser,
+    tenant: Tenant,
     coleta_id: int, 
     db: Session = Depends(get_db)
 ):
-    coleta = db.query(ColetaModel).filter(ColetaModel.id == coleta_id).first()
+    coleta = db.query(ColetaModel).filter(ColetaModel.id == coleta_id, ColetaModel.coreid == tenant).first()
     if coleta is None:
         raise HTTPException(status_code=404, detail="Coleta não encontrada")
     
+    antes = coleta_filter_values(coleta_text_values(db, coleta_id))
+    fold_rollups(db, ColetaModel.id == coleta_id, sign=-1)
     db.delete(coleta)
     db.commit()
     
-    invalidate_dashboard_cache(DASHBOARD_CACHE_KEYS)
-    set_last_update_timestamp()
+    mark_data_changed(tenant)
+    invalidate_coletas_cache(changed=[antes], coleta_ids=[coleta_id], tenant=tenant)
     
-    return
\ No newline at end of file
+    return
+
+
+# PATCH/DELETE em lote: um UPDATE/DELETE ... WHERE sobre todas as coletas do filtro
+def filtro_lote(
+    tenant: str,
+    posto_identificador: Optional[str],
+    veiculo_placa: Optional[str],
+    data_inicio: Optional[datetime],
+    data_fim: Optional[datetime],
+):
+    filtros = []
+    # Posto e placa viram a chave da dimensão (subconsulta escalar): a condição fica só sobre coletas
+    if posto_identificador:
+        filtros.append(ColetaModel.posto_id == select(PostoModel.id).where(
+            PostoModel.coreid == tenant, PostoModel.identificador == posto_identificador,
+        ).scalar_subquery())
+    if veiculo_placa:
+        filtros.append(ColetaModel.veiculo_id == select(VeiculoModel.id).where(
+            VeiculoModel.coreid == tenant, VeiculoModel.placa == veiculo_placa,
+        ).scalar_subquery())
+    if data_inicio:
+        filtros.append(ColetaModel.data_coleta >= data_inicio)
+    if data_fim:
+        filtros.append(ColetaModel.data_coleta <= data_fim)
+
+    # Sem filtro nenhum a operação pegaria a tabela inteira: exige ao menos um critério
+    if not filtros:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Pelo menos um filtro (posto_identificador, veiculo_placa, data_inicio ou data_fim) deve ser fornecido.",
+        )
+    # O tenant restringe sempre, mas não conta como critério: sozinho seria a tabela inteira do cliente
+    return and_(ColetaModel.coreid == tenant, *filtros)
+
+
+def lock_coletas_lote(db: Session, condicao):
+    # Trava as linhas do filtro e devolve ids + valores usados pelo cache da listagem. Os agregados
+    # e a alteração seguem pelos ids travados: uma coleta inserida no meio da operação não é
+    # retirada dos agregados sem ter sido somada, nem somada duas vezes
+    rows = (
+        join_dimensions(db.query(ColetaModel.id, ColetaModel.coreid, *coleta_text_columns(*FILTER_FIELDS)))
+        .filter(condicao)
+        .with_for_update(of=ColetaModel)
+        .all()
+    )
+    ids = [row.id for row in rows]
+    assinaturas = {tuple(coleta_filter_values(row).items()) for row in rows}
+    return ids, [dict(values) for values in assinaturas]
+
+
+def ids_clause(ids: List[int]):
+    # Um único parâmetro (array) em vez de um placeholder por id
+    return ColetaModel.id == any_(literal(ids, ARRAY(Integer)))
+
+
+@router.patch("/", response_model=AlteracaoLoteResultado, summary="Altera em lote as coletas que casam com o filtro (posto, placa, período). Com dry_run=true só conta.")
+def update_coletas_lote(
+    tenant: Tenant,
+    valores: ColetaUpdateLote,
+    db: Session = Depends(get_db),
+    posto_identificador: Optional[str] = Query(None, description="Filtrar por posto (exato)."),
+    veiculo_placa: Optional[str] = Query(None, description="Filtrar por placa (exato)."),
+    data_inicio: Optional[datetime] = Query(None, description="Coletas a partir desta data e hora (inclusive)."),
+    data_fim: Optional[datetime] = Query(None, description="Coletas até esta data e hora (inclusive)."),
+    dry_run: bool = Query(False, description="Só conta as coletas afetadas, sem alterar."),
+):
+    condicao = filtro_lote(tenant, posto_identificador, veiculo_placa, data_inicio, data_fim)
+    dados = to_storage(valores.model_dump(exclude_unset=True, exclude_none=True))
+    if not dados:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Nenhum campo para alterar.")
+
+    if dry_run:
+        afetadas = db.query(func.count(ColetaModel.id)).filter(condicao).scalar()
+        return AlteracaoLoteResultado(afetadas=afetadas, dry_run=True)
+
+    ids, assinaturas = lock_coletas_lote(db, condicao)
+    if ids:
+        # Os campos alteráveis não entram nas chaves dos agregados nem nos filtros da listagem
+        fold_rollups(db, ids_clause(ids), sign=-1)
+        db.execute(
+            update(ColetaModel).where(ids_clause(ids)).values(**dados).execution_options(synchronize_session=False)
+        )
+        fold_rollups(db, ids_clause(ids))
+    db.commit()
+
+    if ids:
+        mark_data_changed(tenant)
+        invalidate_coletas_cache(changed=assinaturas, coleta_ids=ids, tenant=tenant)
+    return AlteracaoLoteResultado(afetadas=len(ids), dry_run=False)
+
+
+@router.delete("/", response_model=AlteracaoLoteResultado, summary="Exclui em lote as coletas que casam com o filtro (posto, placa, período). Com dry_run=true só conta.")
+def delete_coletas_lote(
+    tenant: Tenant,
+    db: Session = Depends(get_db),
+    posto_identificador: Optional[str] = Query(None, description="Filtrar por posto (exato)."),
+    veiculo_placa: Optional[str] = Query(None, description="Filtrar por placa (exato)."),
+    data_inicio: Optional[datetime] = Query(None, description="Coletas a partir desta data e hora (inclusive)."),
+    data_fim: Optional[datetime] = Query(None, description="Coletas até esta data e hora (inclusive)."),
+    dry_run: bool = Query(False, description="Só conta as coletas afetadas, sem excluir."),
+):
+    condicao = filtro_lote(tenant, posto_identificador, veiculo_placa, data_inicio, data_fim)
+
+    if dry_run:
+        afetadas = db.query(func.count(ColetaModel.id)).filter(condicao).scalar()
+        return AlteracaoLoteResultado(afetadas=afetadas, dry_run=True)
+
+    ids, assinaturas = lock_coletas_lote(db, condicao)
+    if ids:
+        fold_rollups(db, ids_clause(ids), sign=-1)
+        db.execute(
+            delete(ColetaModel).where(ids_clause(ids)).execution_options(synchronize_session=False)
+        )
+    db.commit()
+
+    if ids:
+        mark_data_changed(tenant)
+        invalidate_coletas_cache(changed=assinaturas, coleta_ids=ids, tenant=tenant)
+    return AlteracaoLoteResultado(afetadas=len(ids), dry_run=False)
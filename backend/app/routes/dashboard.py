@@ -1,31 +1,70 @@
-from fastapi import APIRouter, Depends, Query, Security, status
+from fastapi import APIRouter, Body, Depends, HTTPException, Query, Response, Security, status
 from fastapi.security import HTTPBearer
 from sqlalchemy.orm import Session
-from sqlalchemy import func, desc 
-from typing import List, Optional
+from sqlalchemy import DateTime, cast, func, desc 
+from datetime import date, datetime, timedelta
+from typing import List, Literal, Optional
 
-from core.database import get_db, ColetaModel
-from core.authguard import CurrentUser 
-from models.coleta import FuelType 
+from core.replicas import cache_fill_factory, get_read_db
+from core.database import ColetaModel, KpiCuboModel, PostoModel, PrecoHistogramaModel
+from core.authguard import Tenant
+from models.coleta import (
+    FuelType, VehicleType, FUEL_TYPE_CODES, FUEL_TYPE_BY_CODE, VEHICLE_TYPE_CODES, VEHICLE_TYPE_BY_CODE,
+    PRICE_DECIMALS, VOLUME_DECIMALS, from_fixed
+)
 from models.kpis import (
     MediaPrecoCombustivel, 
+    PercentisPreco,
+    KpiCubo,
     VolumeConsumidoVeiculo, 
     PrecoHistoricoResponse,
     PostoRankingEstado,
     VolumeTotalConsumido,
     MaiorConsumidor,
-    ReceitaTotalEstimada
+    ReceitaTotalEstimada,
+    KpiConsulta,
+    KpiResultado
 )
 from core.cache_utils import cached_data
-
-DATE_ONLY_FORMAT_STRING = 'YYYY-MM-DD' 
+from core.cache_warmer import warm_cache
+from core.config import settings
+from core.http_cache import conditional_get
+from core.kpi_query import KpiRegistry, run_kpi_queries
+from core.rollups import histogram_percentiles
 
 def row_to_dict(row):
     return dict(row._mapping)
 
+# As agregações agrupam pelos códigos smallint / chaves das dimensões e só
+# traduzem para o rótulo na resposta. Código nulo ou sem rótulo sai como está
+def with_labels(row, **code_columns):
+    data = row_to_dict(row)
+    for label_column, (code_column, labels) in code_columns.items():
+        code = data.pop(code_column)
+        data[label_column] = labels.get(code, code)
+    return data
+
+# Idem para os valores: as somas saem em ponto fixo (centavos, centilitros) e viram reais e litros na resposta
+def with_decimals(data, **fixed_columns):
+    for value_column, (fixed_column, decimals) in fixed_columns.items():
+        data[value_column] = from_fixed(data.pop(fixed_column), decimals)
+    return data
+
+# Média de preço em centavos, arredondada: o mesmo que round(média em reais, 2)
+def media_preco_centavos(soma_precos, quantidade):
+    return func.round(func.sum(soma_precos) / func.sum(quantidade))
+
+# Receita em centavos, arredondada: a do cubo vem em centésimos de centavo (centavos x centilitros)
+def receita_centavos(receita):
+    return func.round(func.sum(receita) / 10 ** VOLUME_DECIMALS)
+
+# Estados com postos cadastrados: as variantes por estado aquecidas pelo core/cache_warmer.py
+def estados_conhecidos(db: Session) -> List[str]:
+    return [estado for (estado,) in db.query(PostoModel.estado).distinct().order_by(PostoModel.estado)]
+
 router = APIRouter(
     tags=["Dashboard"],
-    dependencies=[Security(HTTPBearer())]
+    dependencies=[Security(HTTPBearer()), Depends(conditional_get)]
 )
 
 @router.get(
@@ -33,101 +72,348 @@ router = APIRouter(
     response_model=List[MediaPrecoCombustivel], 
     summary="Calcula a média de preço por litro para cada tipo de combustível."
 )
+@warm_cache()
 @cached_data(cache_key_prefix="kpi_media_preco", ttl=3600) 
 def get_media_preco_combustivel(
-    current_user: CurrentUser, 
-    db: Session = Depends(get_db)
+    tenant: Tenant,
+    db: Session = Depends(get_read_db)
 ):
+    # Do cubo, não de coletas: inclui as coletas já arquivadas (core/archive.py)
     medias_preco = (
         db.query(
-            ColetaModel.tipo_combustivel, 
-            func.round(func.avg(ColetaModel.preco_venda), 2).label('media_preco')
+            KpiCuboModel.tipo_combustivel_codigo, 
+            media_preco_centavos(KpiCuboModel.soma_preco_centavos, KpiCuboModel.quantidade).label('media_preco_centavos')
         )
-        .group_by(ColetaModel.tipo_combustivel)
+        .filter(KpiCuboModel.coreid == tenant)
+        .group_by(KpiCuboModel.tipo_combustivel_codigo)
         .all()
     )
-    data_dicts = [row_to_dict(item) for item in medias_preco]
+    data_dicts = [
+        with_decimals(
+            with_labels(item, tipo_combustivel=("tipo_combustivel_codigo", FUEL_TYPE_BY_CODE)),
+            media_preco=("media_preco_centavos", PRICE_DECIMALS),
+        )
+        for item in medias_preco
+    ]
     return [MediaPrecoCombustivel.model_validate(item) for item in data_dicts]
 
 
+# Percentis de preço (p10/p50/p90) a partir dos histogramas diários por combustível e estado
+@router.get(
+    "/percentis-preco", 
+    response_model=List[PercentisPreco], 
+    summary="Calcula os percentis 10, 50 e 90 do preço por litro para cada tipo de combustível no período."
+)
+@warm_cache(variants=[
+    {"tipo_combustivel": tipo, "por_estado": por_estado}
+    for tipo in (None, *FUEL_TYPE_CODES) for por_estado in (False, True)
+])
+@cached_data(cache_key_prefix="kpi_percentis_preco", ttl=3600) 
+def get_percentis_preco(
+    tenant: Tenant,
+    db: Session = Depends(get_read_db),
+    tipo_combustivel: Optional[FuelType] = Query(None, description="Filtra por tipo de combustível."),
+    estado: Optional[str] = Query(None, min_length=2, max_length=2, description="Filtrar por sigla do estado."),
+    data_inicio: Optional[date] = Query(None, description="Primeiro dia do período (inclusive)."),
+    data_fim: Optional[date] = Query(None, description="Último dia do período (inclusive)."),
+    por_estado: bool = Query(False, description="Quebra os percentis também por estado.")
+):
+    # Mescla os histogramas do período: soma das quantidades por faixa de preço (centavos)
+    group_columns = [PrecoHistogramaModel.tipo_combustivel_codigo]
+    if por_estado:
+        group_columns.append(PrecoHistogramaModel.estado)
+
+    query = db.query(
+        *group_columns,
+        PrecoHistogramaModel.preco_centavos,
+        func.sum(PrecoHistogramaModel.quantidade).label('quantidade')
+    ).filter(PrecoHistogramaModel.coreid == tenant)
+    if tipo_combustivel:
+        query = query.filter(PrecoHistogramaModel.tipo_combustivel_codigo == FUEL_TYPE_CODES[tipo_combustivel])
+    if estado:
+        query = query.filter(PrecoHistogramaModel.estado == estado.upper())
+    if data_inicio:
+        query = query.filter(PrecoHistogramaModel.dia >= data_inicio)
+    if data_fim:
+        query = query.filter(PrecoHistogramaModel.dia <= data_fim)
+
+    rows = (
+        query
+        .group_by(*group_columns, PrecoHistogramaModel.preco_centavos)
+        .order_by(*group_columns, PrecoHistogramaModel.preco_centavos)
+        .all()
+    )
+
+    histogramas = {}
+    for row in rows:
+        grupo = (row.tipo_combustivel_codigo, row.estado if por_estado else None)
+        histogramas.setdefault(grupo, []).append((row.preco_centavos, int(row.quantidade)))
+
+    resultado = []
+    for (codigo, estado_grupo), buckets in histogramas.items():
+        p10, p50, p90 = histogram_percentiles(buckets, (0.1, 0.5, 0.9))
+        resultado.append(PercentisPreco(
+            tipo_combustivel=FUEL_TYPE_BY_CODE.get(codigo, codigo),
+            estado=estado_grupo or (estado.upper() if estado else None),
+            total_coletas=sum(quantidade for _, quantidade in buckets),
+            p10=p10, p50=p50, p90=p90,
+        ))
+    return resultado
+
+
 # Volume Consumido por Tipo de Veículo
 @router.get(
     "/volume-por-veiculo", 
     response_model=List[VolumeConsumidoVeiculo], 
     summary="Calcula o volume total consumido agrupado por tipo de veículo."
 )
+@warm_cache()
 @cached_data(cache_key_prefix="kpi_volume_veiculo", ttl=3600) 
 def get_volume_por_veiculo(
-    current_user: CurrentUser,
-    db: Session = Depends(get_db)
+    tenant: Tenant,
+    db: Session = Depends(get_read_db)
 ):
     volume_por_veiculo = (
         db.query(
-            ColetaModel.tipo_veiculo, 
-            func.sum(ColetaModel.volume_vendido).label('volume_total')
+            KpiCuboModel.tipo_veiculo_codigo, 
+            func.sum(KpiCuboModel.volume_centilitros).label('volume_centilitros')
         )
-        .group_by(ColetaModel.tipo_veiculo)
+        .filter(KpiCuboModel.coreid == tenant)
+        .group_by(KpiCuboModel.tipo_veiculo_codigo)
         .all()
     )
-    data_dicts = [row_to_dict(item) for item in volume_por_veiculo]
+    data_dicts = [
+        with_decimals(
+            with_labels(item, tipo_veiculo=("tipo_veiculo_codigo", VEHICLE_TYPE_BY_CODE)),
+            volume_total=("volume_centilitros", VOLUME_DECIMALS),
+        )
+        for item in volume_por_veiculo
+    ]
     return [VolumeConsumidoVeiculo.model_validate(item) for item in data_dicts]
 
 
 # Histórico de Preço Médio por Tipo de Combustível
+Granularidade = Literal["hora", "dia", "semana", "mes"]
+
+# Campo do date_trunc e passo mínimo de cada granularidade (o mês mais curto, para estimar pontos)
+GRANULARIDADES = {
+    "hora": ("hour", timedelta(hours=1)),
+    "dia": ("day", timedelta(days=1)),
+    "semana": ("week", timedelta(weeks=1)),
+    "mes": ("month", timedelta(days=28)),
+}
+
+def truncar_periodo(momento: datetime, granularidade: Granularidade) -> datetime:
+    # Mesmo resultado do date_trunc do Postgres (semana começa na segunda-feira)
+    if granularidade == "hora":
+        return momento.replace(minute=0, second=0, microsecond=0)
+    dia = momento.replace(hour=0, minute=0, second=0, microsecond=0)
+    if granularidade == "semana":
+        return dia - timedelta(days=dia.weekday())
+    if granularidade == "mes":
+        return dia.replace(day=1)
+    return dia
+
+def proximo_periodo(inicio: datetime, granularidade: Granularidade) -> datetime:
+    if granularidade == "mes":
+        return inicio.replace(year=inicio.year + inicio.month // 12, month=inicio.month % 12 + 1)
+    return inicio + GRANULARIDADES[granularidade][1]
+
+def validar_pontos(inicio: datetime, fim: datetime, granularidade: Granularidade):
+    if (fim - inicio) / GRANULARIDADES[granularidade][1] > settings.HISTORICO_MAX_PONTOS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Período longo demais para a granularidade '{granularidade}' (máximo de {settings.HISTORICO_MAX_PONTOS} pontos).",
+        )
+
 @router.get(
     "/historico-preco-combustivel", 
     response_model=List[PrecoHistoricoResponse], 
-    summary="Retorna o preço médio de cada tipo de combustível agrupado por dia, com filtro opcional por combustível."
+    summary="Retorna o preço médio de cada tipo de combustível por hora, dia, semana ou mês, com filtros opcionais de combustível e período."
 )
+@warm_cache(variants=[{"tipo_combustivel": tipo} for tipo in (None, *FUEL_TYPE_CODES)])
 @cached_data(cache_key_prefix="kpi_historico_preco", ttl=600)
 def get_historico_preco_combustivel(
-    current_user: CurrentUser,
-    db: Session = Depends(get_db),
-    tipo_combustivel: Optional[FuelType] = Query(None, description="Filtra o histórico.")
+    tenant: Tenant,
+    db: Session = Depends(get_read_db),
+    tipo_combustivel: Optional[FuelType] = Query(None, description="Filtra o histórico."),
+    granularidade: Granularidade = Query("dia", description="Tamanho do período de cada ponto."),
+    data_inicio: Optional[date] = Query(None, description="Primeiro dia do período (inclusive)."),
+    data_fim: Optional[date] = Query(None, description="Último dia do período (inclusive)."),
+    preencher_lacunas: bool = Query(False, description="Inclui os períodos sem coletas, com preço nulo.")
 ):
-    data_campo_formatado = func.to_char(ColetaModel.data_coleta, DATE_ONLY_FORMAT_STRING).label('data_coleta')
-    
+    inicio = datetime.combine(data_inicio, datetime.min.time()) if data_inicio else None
+    fim = datetime.combine(data_fim + timedelta(days=1), datetime.min.time()) if data_fim else None  # exclusivo
+    if granularidade == "hora" and (inicio is None or fim is None):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="A granularidade 'hora' exige data_inicio e data_fim.",
+        )
+    if inicio and fim:
+        validar_pontos(inicio, fim, granularidade)
+
+    # Sem filtro de combustível, o IN com todos os códigos mantém o índice (combustível, data_coleta) utilizável
+    codigos = [FUEL_TYPE_CODES[tipo_combustivel]] if tipo_combustivel else list(FUEL_TYPE_CODES.values())
+    campo = GRANULARIDADES[granularidade][0]
+
+    if granularidade == "hora":
+        # Zoom horário: varredura de intervalo só no índice (tenant, combustível, data_coleta) incluindo preco_centavos
+        periodo = func.date_trunc(campo, ColetaModel.data_coleta).label('periodo')
+        query = db.query(
+            periodo,
+            ColetaModel.tipo_combustivel_codigo,
+            func.round(func.avg(ColetaModel.preco_centavos)).label('preco_medio_centavos')
+        ).filter(
+            ColetaModel.coreid == tenant,
+            ColetaModel.tipo_combustivel_codigo.in_(codigos),
+            ColetaModel.data_coleta >= inicio,
+            ColetaModel.data_coleta < fim,
+        )
+        tipo_coluna = ColetaModel.tipo_combustivel_codigo
+    else:
+        # Dia, semana e mês saem do cubo (uma célula por dia): anos de dados sem ler coletas.
+        # O cast evita o date_trunc com fuso (timestamptz) que o Postgres escolheria para date.
+        periodo = func.date_trunc(campo, cast(KpiCuboModel.dia, DateTime)).label('periodo')
+        query = db.query(
+            periodo,
+            KpiCuboModel.tipo_combustivel_codigo,
+            media_preco_centavos(KpiCuboModel.soma_preco_centavos, KpiCuboModel.quantidade).label('preco_medio_centavos')
+        ).filter(KpiCuboModel.coreid == tenant, KpiCuboModel.tipo_combustivel_codigo.in_(codigos))
+        if data_inicio:
+            query = query.filter(KpiCuboModel.dia >= data_inicio)
+        if data_fim:
+            query = query.filter(KpiCuboModel.dia <= data_fim)
+        tipo_coluna = KpiCuboModel.tipo_combustivel_codigo
+
+    historico_precos = query.group_by(periodo, tipo_coluna).order_by(periodo, tipo_coluna).all()
+
+    precos = {
+        (row.periodo, row.tipo_combustivel_codigo): from_fixed(row.preco_medio_centavos, PRICE_DECIMALS)
+        for row in historico_precos
+    }
+    pontos = list(precos)
+    if preencher_lacunas and (historico_precos or (inicio and fim)):
+        primeiro = truncar_periodo(inicio, granularidade) if inicio else historico_precos[0].periodo
+        ultimo = truncar_periodo(fim - timedelta(microseconds=1), granularidade) if fim else historico_precos[-1].periodo
+        validar_pontos(primeiro, ultimo, granularidade)
+        pontos = []
+        while primeiro <= ultimo:
+            pontos.extend((primeiro, codigo) for codigo in codigos)
+            primeiro = proximo_periodo(primeiro, granularidade)
+
+    return [
+        PrecoHistoricoResponse(
+            data_coleta=periodo_ponto if granularidade == "hora" else periodo_ponto.date(),
+            tipo_combustivel=FUEL_TYPE_BY_CODE[codigo],
+            preco_medio_arredondado=precos.get((periodo_ponto, codigo)),
+        )
+        for periodo_ponto, codigo in pontos
+    ]
+
+# Drill-down regional (estado > cidade > posto) sobre o cubo de KPIs, sem ler coletas
+@router.get(
+    "/cube", 
+    response_model=List[KpiCubo], 
+    summary="Consolida preço médio, volume, receita e abastecimentos no nível geográfico pedido, com filtros."
+)
+@warm_cache(variants=lambda db: [{"nivel": nivel} for nivel in ("estado", "cidade", "posto")] + [
+    {"nivel": "cidade", "estado": estado} for estado in estados_conhecidos(db)
+])
+@cached_data(cache_key_prefix="kpi_cubo", ttl=3600) 
+def get_kpi_cubo(
+    tenant: Tenant,
+    db: Session = Depends(get_read_db),
+    nivel: Literal["estado", "cidade", "posto"] = Query("estado", description="Nível de agregação."),
+    estado: Optional[str] = Query(None, min_length=2, max_length=2, description="Filtrar por sigla do estado."),
+    cidade: Optional[str] = Query(None, description="Filtrar por cidade."),
+    tipo_combustivel: Optional[FuelType] = Query(None, description="Filtrar por tipo de combustível."),
+    tipo_veiculo: Optional[VehicleType] = Query(None, description="Filtrar por tipo de veículo."),
+    data_inicio: Optional[date] = Query(None, description="Primeiro dia do período (inclusive)."),
+    data_fim: Optional[date] = Query(None, description="Último dia do período (inclusive).")
+):
+    group_columns = [KpiCuboModel.estado]
+    if nivel in ("cidade", "posto"):
+        group_columns.append(KpiCuboModel.cidade)
+    if nivel == "posto":
+        group_columns.append(KpiCuboModel.posto_id)
+
+    total = func.sum(KpiCuboModel.quantidade)
     query = db.query(
-        data_campo_formatado,
-        ColetaModel.tipo_combustivel,
-        func.round(func.avg(ColetaModel.preco_venda), 2).label('preco_medio_arredondado')
-    )
+        *group_columns,
+        total.label('total_abastecimentos'),
+        func.sum(KpiCuboModel.volume_centilitros).label('volume_centilitros'),
+        media_preco_centavos(KpiCuboModel.soma_preco_centavos, KpiCuboModel.quantidade).label('media_preco_centavos'),
+        receita_centavos(KpiCuboModel.receita_centesimos_centavo).label('receita_centavos')
+    ).filter(KpiCuboModel.coreid == tenant)
+    if estado:
+        query = query.filter(KpiCuboModel.estado == estado.upper())
+    if cidade:
+        # Igualdade sem distinguir caixa: com ILIKE, um % ou _ digitado casaria outras cidades
+        query = query.filter(func.upper(KpiCuboModel.cidade) == cidade.upper())
     if tipo_combustivel:
-        query = query.filter(ColetaModel.tipo_combustivel == tipo_combustivel)
-    
-    historico_precos = (
-        query
-        .group_by(data_campo_formatado, ColetaModel.tipo_combustivel)
-        .order_by(data_campo_formatado)
-        .all()
-    )
-    data_dicts = [row_to_dict(item) for item in historico_precos]
-    return [PrecoHistoricoResponse.model_validate(item) for item in data_dicts]
+        query = query.filter(KpiCuboModel.tipo_combustivel_codigo == FUEL_TYPE_CODES[tipo_combustivel])
+    if tipo_veiculo:
+        query = query.filter(KpiCuboModel.tipo_veiculo_codigo == VEHICLE_TYPE_CODES[tipo_veiculo])
+    if data_inicio:
+        query = query.filter(KpiCuboModel.dia >= data_inicio)
+    if data_fim:
+        query = query.filter(KpiCuboModel.dia <= data_fim)
+
+    celulas = query.group_by(*group_columns).subquery()
+
+    # Só o nível posto precisa da dimensão, e apenas para as linhas já consolidadas
+    select_columns = [celulas]
+    if nivel == "posto":
+        select_columns += [PostoModel.identificador.label('posto_identificador'), PostoModel.nome.label('posto_nome')]
+    query = db.query(*select_columns)
+    if nivel == "posto":
+        query = query.join(PostoModel, PostoModel.id == celulas.c.posto_id)
+
+    rows = query.order_by(*[celulas.c[column.name] for column in group_columns]).all()
+    return [
+        KpiCubo.model_validate(with_decimals(
+            row_to_dict(row),
+            volume_total=("volume_centilitros", VOLUME_DECIMALS),
+            media_preco=("media_preco_centavos", PRICE_DECIMALS),
+            receita_total=("receita_centavos", PRICE_DECIMALS),
+        ))
+        for row in rows
+    ]
 
 @router.get(
     "/ranking-coletas-por-estado", 
     response_model=List[PostoRankingEstado], 
     summary="Retorna os postos que mais tiveram coletas, agrupados por estado."
 )
+@warm_cache(variants=lambda db: [{}] + [{"estado": estado} for estado in estados_conhecidos(db)])
 @cached_data(cache_key_prefix="kpi_ranking_estado", ttl=3600) 
 def get_ranking_coletas_por_estado(
-    current_user: CurrentUser,
-    db: Session = Depends(get_db),
+    tenant: Tenant,
+    db: Session = Depends(get_read_db),
     estado: Optional[str] = Query(None, min_length=2, max_length=2, description="Filtrar por sigla do estado.")
 ):
-    query = db.query(
-        ColetaModel.estado,
-        ColetaModel.posto_nome,
-        func.count(ColetaModel.id).label('total_coletas')
+    # Agrupa pela chave inteira do posto (no cubo) e busca nome/estado na dimensão
+    contagem = (
+        db.query(
+            KpiCuboModel.posto_id,
+            func.sum(KpiCuboModel.quantidade).label('total_coletas')
+        )
+        .filter(KpiCuboModel.coreid == tenant)
+        .group_by(KpiCuboModel.posto_id)
+        .subquery()
     )
+    query = db.query(
+        PostoModel.estado,
+        PostoModel.nome.label('posto_nome'),
+        contagem.c.total_coletas
+    ).join(contagem, contagem.c.posto_id == PostoModel.id)
 
     if estado:
-        query = query.filter(ColetaModel.estado.ilike(estado))
+        query = query.filter(func.upper(PostoModel.estado) == estado.upper())
     
     ranking_coletas = (
         query
-        .group_by(ColetaModel.estado, ColetaModel.posto_nome)
-        .order_by(ColetaModel.estado, desc(func.count(ColetaModel.id)))
+        .order_by(PostoModel.estado, desc(contagem.c.total_coletas))
         .all()
     )
     
@@ -140,20 +426,21 @@ def get_ranking_coletas_por_estado(
     response_model=VolumeTotalConsumido, 
     summary="Calcula o volume total de combustível e o número total de abastecimentos."
 )
+@warm_cache()
 @cached_data(cache_key_prefix="kpi_volume_total", ttl=3600) 
 def get_volume_total_e_abastecimentos(
-    current_user: CurrentUser,
-    db: Session = Depends(get_db)
+    tenant: Tenant,
+    db: Session = Depends(get_read_db)
 ):
     kpi_result = db.query(
-        func.sum(ColetaModel.volume_vendido).label('volume_total'),
-        func.count(ColetaModel.id).label('total_abastecimentos')
-    ).first()
+        func.sum(KpiCuboModel.volume_centilitros).label('volume_centilitros'),
+        func.sum(KpiCuboModel.quantidade).label('total_abastecimentos')
+    ).filter(KpiCuboModel.coreid == tenant).first()
     
-    if kpi_result is None or kpi_result.volume_total is None:
+    if kpi_result is None or kpi_result.volume_centilitros is None:
         return VolumeTotalConsumido(volume_total=0.00, total_abastecimentos=0)
 
-    data_dict = row_to_dict(kpi_result)
+    data_dict = with_decimals(row_to_dict(kpi_result), volume_total=("volume_centilitros", VOLUME_DECIMALS))
     
     return VolumeTotalConsumido.model_validate(data_dict)
 
@@ -163,25 +450,30 @@ def get_volume_total_e_abastecimentos(
     response_model=MaiorConsumidor, 
     summary="Identifica o tipo de veículo com o maior volume total consumido."
 )
+@warm_cache()
 @cached_data(cache_key_prefix="kpi_maior_consumidor", ttl=3600) 
 def get_maior_consumidor(
-    current_user: CurrentUser,
-    db: Session = Depends(get_db)
+    tenant: Tenant,
+    db: Session = Depends(get_read_db)
 ):
     maior_consumidor_row = (
         db.query(
-            ColetaModel.tipo_veiculo,
-            func.sum(ColetaModel.volume_vendido).label('volume_total')
+            KpiCuboModel.tipo_veiculo_codigo,
+            func.sum(KpiCuboModel.volume_centilitros).label('volume_centilitros')
         )
-        .group_by(ColetaModel.tipo_veiculo)
-        .order_by(desc('volume_total')) 
+        .filter(KpiCuboModel.coreid == tenant)
+        .group_by(KpiCuboModel.tipo_veiculo_codigo)
+        .order_by(desc('volume_centilitros')) 
         .first()
     )
 
     if maior_consumidor_row is None:
         return MaiorConsumidor(tipo_veiculo="Nenhum", volume_total=0.00)
 
-    data_dict = row_to_dict(maior_consumidor_row)
+    data_dict = with_decimals(
+        with_labels(maior_consumidor_row, tipo_veiculo=("tipo_veiculo_codigo", VEHICLE_TYPE_BY_CODE)),
+        volume_total=("volume_centilitros", VOLUME_DECIMALS),
+    )
     return MaiorConsumidor.model_validate(data_dict)
 
 
@@ -190,19 +482,36 @@ def get_maior_consumidor(
     response_model=ReceitaTotalEstimada, 
     summary="Calcula a Receita Total Estimada (Soma do Preço de Venda * Volume Vendido)."
 )
+@warm_cache()
 @cached_data(cache_key_prefix="kpi_receita_total", ttl=3600) 
 def get_receita_total_estimada(
-    current_user: CurrentUser,
-    db: Session = Depends(get_db)
+    tenant: Tenant,
+    db: Session = Depends(get_read_db)
 ):
-    receita_calculada = (ColetaModel.preco_venda * ColetaModel.volume_vendido)
-    
     kpi_result = db.query(
-        func.round(func.sum(receita_calculada), 2).label('receita_total')
-    ).first()
+        receita_centavos(KpiCuboModel.receita_centesimos_centavo).label('receita_centavos')
+    ).filter(KpiCuboModel.coreid == tenant).first()
 
-    if kpi_result is None or kpi_result.receita_total is None:
+    if kpi_result is None or kpi_result.receita_centavos is None:
         return ReceitaTotalEstimada(receita_total=0.00)
 
-    data_dict = row_to_dict(kpi_result)
-    return ReceitaTotalEstimada.model_validate(data_dict)
\ No newline at end of file
+    data_dict = with_decimals(row_to_dict(kpi_result), receita_total=("receita_centavos", PRICE_DECIMALS))
+    return ReceitaTotalEstimada.model_validate(data_dict)
+
+
+# Consulta em lote: os KPIs acima (pelo caminho) com filtros próprios, em uma requisição.
+# Um MGET traz todos os que estão em cache; os demais são calculados em paralelo e cacheados.
+KPI_REGISTRY = KpiRegistry([router])
+
+@router.post(
+    "/query", 
+    response_model=List[KpiResultado], 
+    summary="Consulta vários KPIs do dashboard, cada um com seus parâmetros, em uma única requisição."
+)
+def consultar_kpis(
+    tenant: Tenant,
+    consultas: List[KpiConsulta] = Body(..., max_length=settings.DASHBOARD_QUERY_MAX_SPECS)
+):
+    # Tudo o que é calculado aqui vai para o cache: réplica só se em dia com o tenant (ver core/replicas.py)
+    body = run_kpi_queries(consultas, KPI_REGISTRY, cache_fill_factory(tenant), tenant)
+    return Response(content=body, media_type="application/json")
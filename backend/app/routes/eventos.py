@@ -0,0 +1,57 @@
+import asyncio
+import json
+from typing import Any, AsyncIterator, Dict
+from fastapi import APIRouter, HTTPException, status
+from fastapi.responses import StreamingResponse
+from core.authguard import QueryTokenUser
+from core.cache_utils import get_last_update_timestamp
+from core.config import settings
+from core.events import DATA_EVENTS, EVENT_DATA_CHANGED
+
+router = APIRouter(
+    prefix="/eventos",
+    tags=["Eventos"]
+)
+
+
+def format_sse(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def event_stream(tenant: str) -> AsyncIterator[str]:
+    # Só os eventos do tenant do usuário: escritas de outros clientes não recarregam este dashboard
+    client = DATA_EVENTS.subscribe(tenant)
+    _, queue = client
+    try:
+        yield "retry: 3000\n\n"
+        # Estado atual na conexão: o cliente compara com o que já carregou e decide se recarrega
+        yield format_sse("conectado", {"last_update_timestamp": get_last_update_timestamp(tenant)})
+        while True:
+            try:
+                event = await asyncio.wait_for(queue.get(), timeout=settings.EVENTS_KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                # Comentário SSE: mantém proxies e balanceadores com a conexão aberta
+                yield ": keepalive\n\n"
+                continue
+            yield format_sse(EVENT_DATA_CHANGED, event)
+    finally:
+        DATA_EVENTS.unsubscribe(client)
+
+
+@router.get("", 
+            summary="Stream SSE de mudanças nos dados: o dashboard recarrega os KPIs só quando recebe 'dados_atualizados'.")
+def stream_eventos(
+    current_user: QueryTokenUser
+):
+    if DATA_EVENTS.client_count() >= settings.EVENTS_MAX_CLIENTS:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Limite de conexões de eventos atingido neste servidor.",
+            headers={"Retry-After": "10"},
+        )
+
+    return StreamingResponse(
+        event_stream(current_user.coreid),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,25 +1,49 @@
-from fastapi import APIRouter
-from typing import Dict
-from core.database import engine 
+from fastapi import APIRouter, Response, status
+from typing import Any, Dict
+from core.health_probe import HEALTH_PROBER
 
 router = APIRouter(
     tags=["Health Check"]
 )
 
-@router.get("/health", response_model=Dict[str, str], tags=["Health Check"])
+# Todos os endpoints respondem do snapshot em memória mantido pelo HealthProber,
+# sem abrir conexões com o DB ou o Redis a cada chamada.
+
+@router.get("/health", response_model=Dict[str, Any], tags=["Health Check"])
 def health_check():
-    db_status = "error"
-    try:
-        
-        with engine.connect():
-            
-            db_status = "ok"
-    except Exception as e:
-        
-        print(f"Erro na conexão com o DB: {e}") 
-        db_status = "error"
+    snapshot = HEALTH_PROBER.snapshot
 
     return {
         "api_status": "ok",
-        "database_status": db_status
-    }
\ No newline at end of file
+        "database_status": snapshot["database_status"],
+        "redis_status": snapshot["redis_status"],
+        "database_pools": snapshot["database_pools"],
+        "replicas": snapshot["replicas"],
+        "checked_at": snapshot["checked_at"],
+    }
+
+
+@router.get("/health/live", response_model=Dict[str, Any], tags=["Health Check"])
+def liveness_check(response: Response):
+    if not HEALTH_PROBER.is_alive():
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+        return {"status": "error", "detail": "Health prober parado."}
+
+    return {"status": "ok"}
+
+
+@router.get("/health/ready", response_model=Dict[str, Any], tags=["Health Check"])
+def readiness_check(response: Response):
+    snapshot = HEALTH_PROBER.snapshot
+    ready = snapshot["ready"] and not HEALTH_PROBER.is_stale()
+
+    if not ready:
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+
+    return {
+        "status": "ok" if ready else "error",
+        "database_status": snapshot["database_status"],
+        "redis_status": snapshot["redis_status"],
+        "pool_exhausted": snapshot.get("pool_exhausted", False),
+        "checked_at": snapshot["checked_at"],
+    }
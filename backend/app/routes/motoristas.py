@@ -2,15 +2,23 @@ from fastapi import APIRouter, Depends, Query, HTTPException, Security, status
 from fastapi.security import HTTPBearer 
 from sqlalchemy.orm import Session
 from typing import List, Optional
-from sqlalchemy import or_, desc, func 
-from core.database import get_db, ColetaModel
-from core.authguard import CurrentUser 
-from models.coleta import Coleta, ColetaMotoristaResponse 
-from core.cache_utils import cached_data 
+from sqlalchemy import and_, or_, desc, exists, func 
+from core.replicas import get_read_db
+from core.config import settings
+from core.database import ColetaModel, MotoristaModel, VeiculoModel
+from core.dimensions import coleta_text_columns, join_dimensions
+from core.authguard import Tenant
+from models.coleta import (
+    VEHICLE_TYPE_BY_CODE, BuscaMotoristasResponse, Coleta, ColetaMotoristaResponse, MotoristaSugestao, PlacaSugestao
+)
+from core.admission import rate_limit
+from core.cache_utils import cached_data
+from core.cache_warmer import warm_cache
+from core.http_cache import conditional_get 
 
 router = APIRouter(
     tags=["Motoristas"],
-    dependencies=[Security(HTTPBearer())] 
+    dependencies=[Security(HTTPBearer()), Depends(conditional_get)] 
 )
 
 PG_COMPATIBLE_FORMAT_STRING = 'YYYY-MM-DD HH24:MI' 
@@ -21,17 +29,13 @@ def row_to_dict(row):
 def get_motorista_query_select():
 
     return [
-        ColetaModel.motorista_nome,
-        ColetaModel.veiculo_placa,
-        ColetaModel.tipo_veiculo,
+        *coleta_text_columns(
+            "motorista_nome", "veiculo_placa", "tipo_veiculo", "tipo_combustivel",
+            "motorista_cpf", "posto_nome", "cidade", "estado",
+        ),
         func.to_char(ColetaModel.data_coleta, PG_COMPATIBLE_FORMAT_STRING).label('data_coleta'),
-        ColetaModel.tipo_combustivel,
-        ColetaModel.preco_venda,
-        ColetaModel.volume_vendido,
-        ColetaModel.motorista_cpf,
-        ColetaModel.posto_nome,
-        ColetaModel.cidade,
-        ColetaModel.estado,
+        ColetaModel.preco_centavos,
+        ColetaModel.volume_centilitros,
     ]
 
 
@@ -42,20 +46,20 @@ def get_motorista_query_select():
 )
 @cached_data(cache_key_prefix="motorista_historico", ttl=300)
 def get_historico_motorista(
-    current_user: CurrentUser,
-    db: Session = Depends(get_db),
+    tenant: Tenant,
+    db: Session = Depends(get_read_db),
     cpf: Optional[str] = Query(None, description="Filtrar por CPF (exato)."),
     nome: Optional[str] = Query(None, description="Filtrar por nome (busca parcial, case-insensitive)."),
 ):
 
     query_select = get_motorista_query_select()
-    query = db.query(*query_select)
+    query = join_dimensions(db.query(*query_select))
     filtros = []
     
     if cpf:
-        filtros.append(ColetaModel.motorista_cpf == cpf)
+        filtros.append(MotoristaModel.cpf == cpf)
     if nome:
-        filtros.append(ColetaModel.motorista_nome.ilike(f"%{nome}%"))
+        filtros.append(MotoristaModel.nome.ilike(f"%{nome}%"))
         
     if not filtros:
         raise HTTPException(
@@ -63,7 +67,12 @@ def get_historico_motorista(
             detail="Pelo menos um critério de busca (cpf ou nome) deve ser fornecido."
         )
 
-    coletas_rows = query.filter(or_(*filtros)).order_by(desc(ColetaModel.data_coleta)).all()
+    coletas_rows = (
+        query
+        .filter(ColetaModel.coreid == tenant, or_(*filtros))
+        .order_by(desc(ColetaModel.data_coleta))
+        .all()
+    )
 
 
     if not coletas_rows:
@@ -74,29 +83,101 @@ def get_historico_motorista(
     return [ColetaMotoristaResponse.model_validate(item) for item in data_dicts]
 
 
+def escape_like(termo: str) -> str:
+    # O termo digitado entra no ILIKE literalmente: % e _ não viram curingas (\ é o escape padrão do Postgres)
+    return termo.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+@router.get(
+    "/search",
+    response_model=BuscaMotoristasResponse,
+    summary="Autocomplete: motoristas e placas distintos que contêm o termo buscado.",
+    dependencies=[Depends(rate_limit("busca"))],
+)
+def buscar_motoristas(
+    tenant: Tenant,
+    db: Session = Depends(get_read_db),
+    q: str = Query(..., min_length=2, max_length=100, description="Trecho do nome do motorista ou da placa."),
+    limite: int = Query(10, ge=1, le=settings.MOTORISTAS_BUSCA_MAX_RESULTADOS, description="Máximo de sugestões de cada tipo."),
+):
+    # Sem @cached_data: no autocomplete cada tecla seria uma chave nova no Redis. A busca vai às
+    # dimensões (uma linha por motorista e por placa) pelos índices de trigramas, não a coletas;
+    # quem começa com o termo vem antes de quem só o contém. Só as linhas do tenant, e só motoristas
+    # e placas com alguma coleta ainda gravada (EXISTS pelo índice tenant + chave).
+    # O mínimo de 2 caracteres vale para o termo sem os espaços: "  " viraria '%%' e listaria todos
+    if len(q.strip()) < 2:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="O termo de busca precisa de ao menos 2 caracteres além dos espaços.",
+        )
+    termo = escape_like(q.strip())
+    contem, comeca = f"%{termo}%", f"{termo}%"
+
+    motoristas = (
+        db.query(MotoristaModel.nome, MotoristaModel.cpf)
+        .filter(
+            MotoristaModel.coreid == tenant,
+            MotoristaModel.nome.ilike(contem),
+            exists().where(and_(ColetaModel.coreid == tenant, ColetaModel.motorista_id == MotoristaModel.id)),
+        )
+        .order_by(
+            desc(MotoristaModel.nome.ilike(comeca)),
+            func.length(MotoristaModel.nome),
+            MotoristaModel.nome,
+        )
+        .limit(limite)
+        .all()
+    )
+    placas = (
+        db.query(VeiculoModel.placa, VeiculoModel.tipo_veiculo_codigo)
+        .filter(
+            VeiculoModel.coreid == tenant,
+            VeiculoModel.placa.ilike(contem),
+            exists().where(and_(ColetaModel.coreid == tenant, ColetaModel.veiculo_id == VeiculoModel.id)),
+        )
+        .order_by(desc(VeiculoModel.placa.ilike(comeca)), VeiculoModel.placa)
+        .limit(limite)
+        .all()
+    )
+
+    return BuscaMotoristasResponse(
+        motoristas=[MotoristaSugestao(motorista_nome=row.nome, motorista_cpf=row.cpf) for row in motoristas],
+        placas=[
+            PlacaSugestao(veiculo_placa=row.placa, tipo_veiculo=VEHICLE_TYPE_BY_CODE.get(row.tipo_veiculo_codigo, row.tipo_veiculo_codigo))
+            for row in placas
+        ],
+    )
+
+
 @router.get(
     "/ranking", 
     response_model=List[ColetaMotoristaResponse],
     summary="Lista o ranking dos motoristas pelo volume total de abastecimento."
 )
+@warm_cache()
 @cached_data(cache_key_prefix="motorista_ranking_agregado", ttl=3600) 
 def get_ranking_abastecimento_agregado(
-    current_user: CurrentUser,
-    db: Session = Depends(get_db)
+    tenant: Tenant,
+    db: Session = Depends(get_read_db)
 ):
-    query = db.query(
-        ColetaModel.motorista_nome, 
-        ColetaModel.motorista_cpf, 
-        func.sum(ColetaModel.volume_vendido).label('volume_total_abastecido')
-    )
-    
-    query = query.group_by(
-        ColetaModel.motorista_cpf, 
-        ColetaModel.motorista_nome
+    # Soma por chave inteira do motorista; nome e CPF vêm da dimensão
+    volumes = (
+        db.query(
+            ColetaModel.motorista_id,
+            func.sum(ColetaModel.volume_centilitros).label('volume_total_abastecido')
+        )
+        .filter(ColetaModel.coreid == tenant)
+        .group_by(ColetaModel.motorista_id)
+        .subquery()
     )
+    query = db.query(
+        MotoristaModel.nome.label('motorista_nome'), 
+        MotoristaModel.cpf.label('motorista_cpf'), 
+        volumes.c.volume_total_abastecido
+    ).join(volumes, volumes.c.motorista_id == MotoristaModel.id)
     
     query = query.order_by(
-        desc('volume_total_abastecido')
+        desc(volumes.c.volume_total_abastecido)
     )
     
     coletas_ranking = query.all()
@@ -109,7 +190,7 @@ def get_ranking_abastecimento_agregado(
         ranking_data.append({
             "motorista_nome": row.motorista_nome,
             "motorista_cpf": row.motorista_cpf,
-            "volume_vendido": row.volume_total_abastecido, 
+            "volume_centilitros": row.volume_total_abastecido, 
             "veiculo_placa": "RANKING",
             "tipo_veiculo": "Carro",
             "data_coleta": "2000-01-01 00:00", 
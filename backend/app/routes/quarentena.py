@@ -0,0 +1,113 @@
+from datetime import datetime, timezone
+from fastapi import APIRouter, Depends, HTTPException, Query, Security, status
+from fastapi.security import HTTPBearer
+from sqlalchemy.orm import Session
+from typing import List, Optional
+from core.database import get_db, QuarentenaModel
+from core.authguard import Tenant
+from core.cache_utils import mark_data_changed
+from core.coletas_cache import coleta_filter_values, invalidate_coletas_cache
+from core.ingestion import insert_coletas, find_coleta_id
+from models.coleta import ColetaCreate
+from models.quarentena import ColetaQuarentena, StatusQuarentena
+
+router = APIRouter(
+    prefix="/quarentena",
+    tags=["Quarentena de Coletas"],
+    dependencies=[Security(HTTPBearer())]
+)
+
+
+def to_response(entry: QuarentenaModel) -> ColetaQuarentena:
+    return ColetaQuarentena(
+        id=entry.id,
+        status=entry.status,
+        motivo=entry.motivo,
+        score=entry.score,
+        coleta_id=entry.coleta_id,
+        criado_em=entry.criado_em,
+        resolvido_em=entry.resolvido_em,
+        coleta=ColetaCreate.model_validate_json(entry.payload),
+    )
+
+
+def get_pending_entry(db: Session, tenant: str, quarentena_id: int) -> QuarentenaModel:
+    entry = (
+        db.query(QuarentenaModel)
+        .filter(QuarentenaModel.id == quarentena_id, QuarentenaModel.coreid == tenant)
+        .with_for_update()
+        .first()
+    )
+    if entry is None:
+        raise HTTPException(status_code=404, detail="Leitura não encontrada na quarentena")
+    if entry.status != "quarentena":
+        raise HTTPException(status_code=409, detail=f"Leitura já resolvida (status: {entry.status})")
+    return entry
+
+
+@router.get("/", 
+            response_model=List[ColetaQuarentena], 
+            summary="Lista as leituras retidas ou sinalizadas pela detecção de anomalias.")
+def read_quarentena(
+    tenant: Tenant,
+    db: Session = Depends(get_db),
+    status_filtro: Optional[StatusQuarentena] = Query("quarentena", alias="status", description="Filtra pelo status."),
+    posto_identificador: Optional[str] = Query(None, description="Filtra pelo posto."),
+    skip: int = 0,
+    limit: int = 100
+):
+    query = db.query(QuarentenaModel).filter(QuarentenaModel.coreid == tenant)
+    if status_filtro:
+        query = query.filter(QuarentenaModel.status == status_filtro)
+    if posto_identificador:
+        query = query.filter(QuarentenaModel.posto_identificador == posto_identificador)
+
+    entries = query.order_by(QuarentenaModel.id.desc()).offset(skip).limit(limit).all()
+    return [to_response(entry) for entry in entries]
+
+
+@router.post("/{quarentena_id}/readmitir", 
+             response_model=ColetaQuarentena, 
+             summary="Readmite uma leitura retida: grava em coletas (ela já entrou nas estatísticas ao ser retida).")
+def readmitir_coleta(
+    tenant: Tenant,
+    quarentena_id: int,
+    db: Session = Depends(get_db)
+):
+    entry = get_pending_entry(db, tenant, quarentena_id)
+    coleta = ColetaCreate.model_validate_json(entry.payload)
+    coleta.coreid = entry.coreid  # payloads anteriores à migração 0005 não trazem o tenant
+
+    # Grava sem passar de novo pela detecção de anomalias
+    coleta_id = insert_coletas(db, [coleta])[0]
+    inserted = coleta_id is not None
+    if not inserted:
+        coleta_id = find_coleta_id(db, coleta)
+
+    entry.status = "readmitida"
+    entry.coleta_id = coleta_id
+    entry.resolvido_em = datetime.now(timezone.utc)
+    db.commit()
+    db.refresh(entry)
+
+    if inserted:
+        mark_data_changed(tenant)
+        invalidate_coletas_cache(appended=[coleta_filter_values(coleta)])
+
+    return to_response(entry)
+
+
+@router.delete("/{quarentena_id}", 
+               response_model=ColetaQuarentena, 
+               summary="Descarta uma leitura retida (o registro é mantido para auditoria).")
+def descartar_coleta(
+    tenant: Tenant,
+    quarentena_id: int,
+    db: Session = Depends(get_db)
+):
+    entry = get_pending_entry(db, tenant, quarentena_id)
+    entry.status = "descartada"
+    entry.resolvido_em = datetime.now(timezone.utc)
+    db.commit()
+    db.refresh(entry)
+    return to_response(entry)
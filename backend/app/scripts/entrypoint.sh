@@ -31,11 +31,14 @@ wait_for_service "$DB_HOST" "$DB_PORT" "PostgreSQL"
 
 wait_for_service "$REDIS_HOST" "$REDIS_PORT" "Redis"
 
-echo "Garantindo que as tabelas existam no DB..."
-python -c "from core.database import init_db; init_db()"
+echo "Aplicando as migrações do banco (uma vez, antes dos workers)..."
+alembic upgrade head
+
+echo "Populando os agregados incrementais..."
+python -m scripts.rebuild_rollups
 
 echo "Iniciando o script de seed via SQLAlchemy..."
 python -m scripts.seed
 
-echo "Iniciando servidor Uvicorn..."
+echo "Iniciando o servidor..."
 exec "$@"
\ No newline at end of file
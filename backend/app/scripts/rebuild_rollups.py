@@ -0,0 +1,14 @@
+import sys
+from core.database import get_engine
+from core.rollups import rebuild_rollups
+
+
+def main_rebuild(force: bool = False):
+    print("\n--- Reconstruindo agregados incrementais a partir de coletas ---")
+    if rebuild_rollups(get_engine(), only_if_empty=not force):
+        print("SUCESSO: agregados reconstruídos.")
+    else:
+        print("AVISO: agregados já populados. Use --force para reconstruir.")
+
+if __name__ == "__main__":
+    main_rebuild(force="--force" in sys.argv)
@@ -3,9 +3,11 @@ from faker import Faker
 import random
 from datetime import datetime, timedelta
 from typing import Literal
-from core.database import SessionLocal,ColetaModel
+from core.database import SessionLocal
 from core.security import get_password_hash
 from core.authguard import UserModel 
+from core.ingestion import insert_coletas
+from models.coleta import ColetaCreate
 
 
 FuelType = Literal["Gasolina", "Etanol", "Diesel S10"]
@@ -58,6 +60,7 @@ def seed_test_data(session: Session, num_coletas: int = 50):
     cidades = ["São Paulo", "Rio de Janeiro", "Belo Horizonte", "Curitiba", "Porto Alegre"]
     estados = ["SP", "RJ", "MG", "PR", "RS"]
 
+    coletas = []
     for i in range(num_coletas):
         
         tipo_combustivel = random.choice(fuel_types)
@@ -73,7 +76,7 @@ def seed_test_data(session: Session, num_coletas: int = 50):
         
         data_coleta = datetime.now() - timedelta(days=random.randint(1, 30), hours=random.randint(1, 24))
 
-        coleta = ColetaModel(
+        coleta = ColetaCreate(
             data_coleta=data_coleta,
             motorista_nome=fake.name(),
             motorista_cpf=fake.cpf(),
@@ -86,10 +89,12 @@ def seed_test_data(session: Session, num_coletas: int = 50):
             preco_venda=preco_venda,
             volume_vendido=volume_vendido,
             veiculo_placa=fake.license_plate(), 
+            coreid=ADMIN_USER_DATA["coreid"],
         )
-        session.add(coleta)
+        coletas.append(coleta)
         
     try:
+        insert_coletas(session, coletas)
         session.commit()
         print("SUCESSO: Coletas de teste inseridas.")
     except Exception as e:
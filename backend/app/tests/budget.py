@@ -0,0 +1,176 @@
+import os
+import statistics
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Callable, Iterator, List, Optional
+import redis.connection
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Latência medida como múltiplo de uma requisição de referência na mesma sessão (autenticada, uma
+# consulta ao banco): o teto acompanha a máquina. PERF_LATENCY_TOLERANCE afrouxa todos os tetos
+# (ex.: 2 em CI lento); 0 desliga a checagem de latência e mantém a contagem de SQL e Redis
+LATENCY_TOLERANCE = float(os.environ.get("PERF_LATENCY_TOLERANCE", "1"))
+LATENCY_SAMPLES = int(os.environ.get("PERF_LATENCY_SAMPLES", "5"))
+REPORT_MAX_LINES = 20
+
+
+@dataclass(frozen=True)
+class Budget:
+    sql: int  # máximo de comandos SQL executados
+    redis: int  # máximo de idas e voltas ao Redis (um pipeline conta uma vez)
+    latency: float  # mediana máxima, em múltiplos da requisição de referência
+
+
+@dataclass
+class Measurement:
+    sql: List[str] = field(default_factory=list)
+    redis_round_trips: int = 0
+    redis_commands: List[str] = field(default_factory=list)
+    latencies: List[float] = field(default_factory=list)
+
+    @property
+    def latency(self) -> float:
+        return statistics.median(self.latencies) if self.latencies else 0.0
+
+
+def _describe(args) -> str:
+    # Comando e chave; nos scripts (EVAL) a chave no lugar do corpo do Lua
+    name = str(args[0])
+    key = args[3] if name.upper() in ("EVAL", "EVALSHA") and len(args) > 3 else (args[1] if len(args) > 1 else "")
+    return f"{name} {key}".strip()
+
+
+class _Recorder:
+    # Registra SQL (todas as engines) e comandos Redis de qualquer thread: a TestClient roda a rota
+    # em outra thread e o lote de KPIs calcula em um pool. Só um bloco measure() ativo por vez.
+    # O handshake de uma conexão nova (HELLO, SELECT) não conta: depende do pool, não da rota
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.current: Optional[Measurement] = None
+
+    @contextmanager
+    def handshake(self) -> Iterator[None]:
+        self._local.handshake = True
+        try:
+            yield
+        finally:
+            self._local.handshake = False
+
+    def _recording(self) -> bool:
+        return self.current is not None and not getattr(self._local, "handshake", False)
+
+    def on_sql(self, conn, cursor, statement, parameters, context, executemany):
+        with self._lock:
+            if self.current is not None:
+                self.current.sql.append(" ".join(statement.split()))
+
+    def on_redis_command(self, args):
+        with self._lock:
+            if self._recording():
+                self.current.redis_commands.append(_describe(args))
+
+    def on_redis_round_trip(self):
+        with self._lock:
+            if self._recording():
+                self.current.redis_round_trips += 1
+
+
+RECORDER = _Recorder()
+
+
+@contextmanager
+def measure() -> Iterator[Measurement]:
+    measurement = Measurement()
+    connection_class = redis.connection.AbstractConnection
+    send_command = connection_class.send_command
+    pack_commands = connection_class.pack_commands
+    send_packed_command = connection_class.send_packed_command
+    # redis-py 5.x faz o handshake em on_connect; as versões novas, em on_connect_check_health
+    handshake_name = "on_connect_check_health" if hasattr(connection_class, "on_connect_check_health") else "on_connect"
+    connect_handshake = getattr(connection_class, handshake_name)
+
+    def recording_send_command(self, *args, **kwargs):
+        RECORDER.on_redis_command(args)
+        return send_command(self, *args, **kwargs)
+
+    def recording_pack_commands(self, commands):
+        for args in commands:
+            RECORDER.on_redis_command(args)
+        return pack_commands(self, commands)
+
+    def counting_send_packed_command(self, command, check_health=True):
+        RECORDER.on_redis_round_trip()
+        return send_packed_command(self, command, check_health)
+
+    def uncounted_handshake(self, *args, **kwargs):
+        with RECORDER.handshake():
+            return connect_handshake(self, *args, **kwargs)
+
+    event.listen(Engine, "before_cursor_execute", RECORDER.on_sql)
+    connection_class.send_command = recording_send_command
+    connection_class.pack_commands = recording_pack_commands
+    connection_class.send_packed_command = counting_send_packed_command
+    setattr(connection_class, handshake_name, uncounted_handshake)
+    RECORDER.current = measurement
+    try:
+        yield measurement
+    finally:
+        RECORDER.current = None
+        connection_class.send_command = send_command
+        connection_class.pack_commands = pack_commands
+        connection_class.send_packed_command = send_packed_command
+        setattr(connection_class, handshake_name, connect_handshake)
+        event.remove(Engine, "before_cursor_execute", RECORDER.on_sql)
+
+
+def timed(call: Callable[[], None], samples: int = LATENCY_SAMPLES, before: Optional[Callable[[], None]] = None) -> List[float]:
+    # `before` roda fora do cronômetro a cada amostra (ex.: esvaziar o cache para medir o caminho frio)
+    latencies = []
+    for _ in range(samples):
+        if before is not None:
+            before()
+        started = time.perf_counter()
+        call()
+        latencies.append(time.perf_counter() - started)
+    return latencies
+
+
+def _listing(title: str, lines: List[str]) -> List[str]:
+    shown = [f"    {i}. {line[:200]}" for i, line in enumerate(lines[:REPORT_MAX_LINES], 1)]
+    if len(lines) > REPORT_MAX_LINES:
+        shown.append(f"    ... mais {len(lines) - REPORT_MAX_LINES}")
+    return [f"  {title}:"] + (shown or ["    (nenhum)"])
+
+
+def violations(measurement: Measurement, budget: Budget, reference: float) -> List[str]:
+    found = []
+    if len(measurement.sql) > budget.sql:
+        found.append(f"comandos SQL: {len(measurement.sql)} (máximo {budget.sql})")
+    if measurement.redis_round_trips > budget.redis:
+        found.append(f"idas ao Redis: {measurement.redis_round_trips} (máximo {budget.redis})")
+    if LATENCY_TOLERANCE > 0 and measurement.latencies:
+        ratio = measurement.latency / reference
+        limit = budget.latency * LATENCY_TOLERANCE
+        if ratio > limit:
+            found.append(
+                f"latência: {measurement.latency * 1000:.1f} ms = {ratio:.1f}x a referência de "
+                f"{reference * 1000:.2f} ms (máximo {limit:g}x)"
+            )
+    return found
+
+
+def report(name: str, measurement: Measurement, budget: Budget, reference: float) -> str:
+    # Relatório legível da violação: o que estourou e o que foi executado, para achar o N+1 ou a
+    # consulta nova sem rodar nada de novo
+    lines = [f"Orçamento de desempenho excedido em {name}:"]
+    lines += [f"  - {item}" for item in violations(measurement, budget, reference)]
+    lines += _listing("SQL executado", measurement.sql)
+    lines += _listing(f"Comandos Redis ({measurement.redis_round_trips} idas)", measurement.redis_commands)
+    if measurement.latencies:
+        amostras = ", ".join(f"{latency * 1000:.1f}" for latency in measurement.latencies)
+        lines.append(f"  Amostras de latência (ms): {amostras}")
+    return "\n".join(lines)
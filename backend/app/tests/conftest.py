@@ -0,0 +1,171 @@
+import os
+import random
+import sys
+from datetime import datetime, timedelta
+from typing import Dict, List
+import pytest
+
+# Os módulos da API são importados como no container (core.*, routes.*, main), a partir de backend/app
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, APP_DIR)
+
+# Banco e Redis próprios dos testes: os dados são apagados e recriados a cada sessão. Sem threads em
+# background (ingestão, aquecedor, arquivamento) e com baldes grandes: as medições repetem os cálculos
+os.environ["DB_NAME"] = os.environ.get("TEST_DB_NAME", "fuelsense_test")
+os.environ["REDIS_DB"] = os.environ.get("TEST_REDIS_DB", "15")
+os.environ["INGESTION_WORKER_ENABLED"] = "false"
+os.environ["CACHE_WARMER_ENABLED"] = "false"
+os.environ["ARCHIVE_ENABLED"] = "false"
+os.environ.setdefault("RATE_LIMIT_KPI_BURST", "1000000")
+os.environ.setdefault("RATE_LIMIT_BUSCA_BURST", "1000000")
+# Postgres sem contrib (pg_trgm) também roda a suíte: a busca só fica sem os índices de trigramas
+os.environ.setdefault("DB_TRGM_REQUIRED", "false")
+# Filtro de duplicatas do tamanho da massa de teste (alguns milhares de chaves): 64 KB em vez de 2 MB
+os.environ.setdefault("DEDUP_FILTER_BITS", str(2 ** 19))
+
+TENANT = "CORE-TESTE-001"
+OUTRO_TENANT = "CORE-TESTE-002"
+USUARIO = {"nome": "Admin Teste", "email": "admin@teste.com", "senha": "123456", "cpf": "123.456.789-00"}
+OUTRO_USUARIO = {"nome": "Outro Cliente", "email": "outro@teste.com", "senha": "123456", "cpf": "987.654.321-00"}
+
+# Massa de dados fixa (semente): ~90 dias, 40 postos em 5 estados, 120 motoristas. O segundo tenant
+# existe para que as consultas precisem filtrar pelo coreid, como em produção
+FIXTURE_COLETAS = 3000
+FIXTURE_OUTRO_TENANT_COLETAS = 500
+FIXTURE_SEED = 20240501
+
+CIDADES = [("SAO PAULO", "SP"), ("RIO DE JANEIRO", "RJ"), ("BELO HORIZONTE", "MG"), ("CURITIBA", "PR"), ("PORTO ALEGRE", "RS")]
+PRECO_BASE = {"Gasolina": 5.90, "Etanol": 3.99, "Diesel S10": 6.10}
+
+
+def _postgres_error() -> str:
+    # None se o Postgres de teste responde (criando o banco se preciso), senão o motivo
+    try:
+        from sqlalchemy import create_engine, text
+        from core.config import settings
+    except Exception as e:
+        return f"configuração do banco ausente ({e.__class__.__name__})"
+
+    url = (
+        f"postgresql+psycopg2://{settings.DB_USER}:{settings.DB_PASSWORD}@"
+        f"{settings.DB_HOST}:{settings.DB_PORT}/postgres"
+    )
+    try:
+        engine = create_engine(url, isolation_level="AUTOCOMMIT", connect_args={"connect_timeout": 3})
+        with engine.connect() as conn:
+            exists = conn.execute(
+                text("SELECT 1 FROM pg_database WHERE datname = :nome"), {"nome": settings.DB_NAME}
+            ).scalar()
+            if not exists:
+                conn.execute(text(f'CREATE DATABASE "{settings.DB_NAME}"'))
+        engine.dispose()
+    except Exception as e:
+        return f"Postgres indisponível em {settings.DB_HOST}:{settings.DB_PORT} ({e.__class__.__name__})"
+    return None
+
+
+def build_fixture_coletas(tenant: str, total: int, seed: int) -> List["ColetaCreate"]:
+    from models.coleta import ColetaCreate, VEHICLE_TANK_CAPACITY
+
+    rng = random.Random(seed)
+    agora = datetime.now().replace(minute=0, second=0, microsecond=0)
+    postos = [
+        (f"{seed % 97:02d}.{i:03d}.000/0001-{i % 90 + 10}", f"Posto {i:02d}", *CIDADES[i % len(CIDADES)])
+        for i in range(40)
+    ]
+    motoristas = [(f"Motorista {i:03d} da Silva", f"{seed % 1000:03d}{i:08d}") for i in range(120)]
+    veiculos = [(f"T{seed % 10}{chr(65 + i // 100)}{i % 100:02d}A{i % 10}", tipo)
+                for i, tipo in enumerate(list(VEHICLE_TANK_CAPACITY) * 40)]
+
+    coletas = []
+    for _ in range(total):
+        posto, nome, cidade, estado = rng.choice(postos)
+        motorista, cpf = rng.choice(motoristas)
+        placa, tipo_veiculo = rng.choice(veiculos)
+        combustivel = rng.choice(list(PRECO_BASE))
+        coletas.append(ColetaCreate(
+            posto_identificador=posto,
+            posto_nome=nome,
+            cidade=cidade,
+            estado=estado,
+            data_coleta=agora - timedelta(days=rng.randint(0, 89), hours=rng.randint(0, 23), minutes=rng.randint(0, 59)),
+            tipo_combustivel=combustivel,
+            preco_venda=round(PRECO_BASE[combustivel] + rng.uniform(-0.4, 0.4), 2),
+            volume_vendido=round(rng.uniform(5, VEHICLE_TANK_CAPACITY[tipo_veiculo] * 0.9), 2),
+            motorista_nome=motorista,
+            motorista_cpf=cpf,
+            veiculo_placa=placa,
+            tipo_veiculo=tipo_veiculo,
+            coreid=tenant,
+        ))
+    return coletas
+
+
+def _load_dataset():
+    from sqlalchemy import text
+    from core.database import Base, SessionLocal, UserModel, init_db
+    from core.ingestion import insert_coletas
+    from core.redis_config import run_redis_command
+    from core.security import get_password_hash
+
+    init_db()
+    run_redis_command(lambda r: r.flushdb())
+    with SessionLocal() as db:
+        tables = ", ".join(table.name for table in Base.metadata.sorted_tables)
+        db.execute(text(f"TRUNCATE {tables} RESTART IDENTITY CASCADE"))
+        for usuario, tenant in ((USUARIO, TENANT), (OUTRO_USUARIO, OUTRO_TENANT)):
+            db.add(UserModel(
+                nome=usuario["nome"], email=usuario["email"], cpf=usuario["cpf"],
+                senha_hash=get_password_hash(usuario["senha"]), coreid=tenant,
+            ))
+        coletas = build_fixture_coletas(TENANT, FIXTURE_COLETAS, FIXTURE_SEED)
+        coletas += build_fixture_coletas(OUTRO_TENANT, FIXTURE_OUTRO_TENANT_COLETAS, FIXTURE_SEED + 1)
+        for inicio in range(0, len(coletas), 500):
+            insert_coletas(db, coletas[inicio:inicio + 500])
+        db.commit()
+        db.execute(text("ANALYZE"))
+    run_redis_command(lambda r: r.flushdb())
+
+
+@pytest.fixture(scope="session")
+def app():
+    motivo = _postgres_error()
+    if motivo:
+        pytest.skip(motivo)
+    _load_dataset()
+    import main
+    return main.app
+
+
+@pytest.fixture(scope="session")
+def client(app):
+    from fastapi.testclient import TestClient
+    return TestClient(app)
+
+
+def _login(client, usuario: Dict[str, str]) -> Dict[str, str]:
+    response = client.post("/api/v1/auth/token", data={"username": usuario["email"], "password": usuario["senha"]})
+    assert response.status_code == 200, response.text
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+@pytest.fixture(scope="session")
+def auth_header(client) -> Dict[str, str]:
+    return _login(client, USUARIO)
+
+
+@pytest.fixture(scope="session")
+def outro_auth_header(client) -> Dict[str, str]:
+    return _login(client, OUTRO_USUARIO)
+
+
+@pytest.fixture(scope="session")
+def redis_client(app):
+    # Cliente direto (fora do circuito da API) para limpar o cache entre medições
+    from core.redis_config import get_redis_client
+    client = get_redis_client()
+    try:
+        client.ping()
+    except Exception as e:
+        pytest.skip(f"Redis indisponível ({e.__class__.__name__})")
+    return client
@@ -0,0 +1,113 @@
+import time
+import uuid
+import pytest
+from core.admission import AdmissionDenied, check_rate
+from core.config import settings
+
+API = "/api/v1"
+
+
+@pytest.fixture
+def usuario(redis_client) -> str:
+    # Balde novo a cada teste: a chave é do usuário
+    return f"teste-{uuid.uuid4().hex}"
+
+
+@pytest.fixture
+def balde_pequeno(monkeypatch):
+    monkeypatch.setattr(settings, "RATE_LIMIT_KPI_PER_SECOND", 1.0)
+    monkeypatch.setattr(settings, "RATE_LIMIT_KPI_BURST", 3)
+
+
+def test_custo_acima_da_capacidade_e_admitido_com_balde_cheio(balde_pequeno, usuario):
+    # Lote com mais cálculos que o balde: cobra o balde inteiro em vez de recusar para sempre
+    check_rate(usuario, "kpi", custo=settings.DASHBOARD_QUERY_MAX_SPECS)
+    with pytest.raises(AdmissionDenied) as denied:
+        check_rate(usuario, "kpi", custo=settings.DASHBOARD_QUERY_MAX_SPECS)
+    assert denied.value.status_code == 429
+    assert denied.value.retry_after == 3  # a reposição do balde inteiro, não a do custo pedido
+
+
+def test_balde_por_usuario(balde_pequeno, usuario):
+    for _ in range(3):
+        check_rate(usuario, "kpi")
+    with pytest.raises(AdmissionDenied) as denied:
+        check_rate(usuario, "kpi")
+    assert (denied.value.status_code, denied.value.retry_after) == (429, 1)
+
+    # Outro usuário tem o próprio balde; sem usuário (aquecedor) não há limite
+    check_rate(f"{usuario}-outro", "kpi")
+    check_rate(None, "kpi")
+
+
+def test_vagas_de_calculo(monkeypatch, redis_client):
+    # Sem Redis o limitador libera tudo (fail open): redis_client pula o teste
+    from core.admission import acquire_slot, computation_slot
+
+    monkeypatch.setattr(settings, "KPI_MISS_CONCURRENCY", 1)
+    prefixo = f"teste-{uuid.uuid4().hex}"
+    with computation_slot(prefixo):
+        with pytest.raises(AdmissionDenied) as denied:
+            acquire_slot(prefixo)
+        assert denied.value.status_code == 503
+        acquire_slot(f"{prefixo}-outro")  # outro KPI não disputa a vaga
+    with computation_slot(prefixo):
+        pass
+
+    # Vaga de um cálculo interrompido (worker que morreu) expira com o lease
+    monkeypatch.setattr(settings, "KPI_MISS_LEASE_SECONDS", 0.2)
+    acquire_slot(prefixo)
+    time.sleep(0.3)
+    acquire_slot(prefixo)
+
+
+@pytest.fixture
+def baldes_do_usuario(redis_client):
+    # O usuário do auth_header é o mesmo nos outros testes: o balde dele não pode sair vazio daqui
+    def limpar():
+        for key in redis_client.scan_iter("limite:*"):
+            redis_client.delete(key)
+    limpar()
+    yield
+    limpar()
+
+
+def test_kpi_recusado_responde_a_copia_antiga(client, auth_header, redis_client, monkeypatch, baldes_do_usuario):
+    from conftest import TENANT
+    from core.cache_utils import STALE_PREFIX, mark_data_changed
+
+    receita = f"{API}/dashboard/receita-total-estimada"
+    monkeypatch.setattr(settings, "RATE_LIMIT_KPI_PER_SECOND", 0.01)
+    monkeypatch.setattr(settings, "RATE_LIMIT_KPI_BURST", 1)
+    redis_client.flushdb()
+    calculada = client.get(receita, headers=auth_header)
+    assert calculada.status_code == 200
+
+    # Cache invalidado e balde vazio: a cópia antiga, marcada e sem validadores
+    mark_data_changed(TENANT)
+    antiga = client.get(receita, headers=auth_header)
+    assert antiga.status_code == 200
+    assert antiga.json() == calculada.json()
+    assert antiga.headers["Cache-Control"] == "no-store"
+    assert "Warning" in antiga.headers and "ETag" not in antiga.headers
+
+    redis_client.delete(*redis_client.keys(f"{STALE_PREFIX}*"))
+    recusada = client.get(receita, headers=auth_header)
+    assert recusada.status_code == 429
+    assert int(recusada.headers["Retry-After"]) > 1
+
+
+def test_kpi_saturado(client, auth_header, redis_client, monkeypatch, baldes_do_usuario):
+    monkeypatch.setattr(settings, "KPI_MISS_CONCURRENCY", 0)
+    redis_client.flushdb()
+    response = client.get(f"{API}/dashboard/volume-por-veiculo", headers=auth_header)
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "2"
+
+
+def test_autocomplete_limitado(client, auth_header, monkeypatch, baldes_do_usuario):
+    monkeypatch.setattr(settings, "RATE_LIMIT_BUSCA_PER_SECOND", 0.01)
+    monkeypatch.setattr(settings, "RATE_LIMIT_BUSCA_BURST", 1)
+    busca = {"q": "Motorista"}
+    assert client.get(f"{API}/motoristas/search", headers=auth_header, params=busca).status_code == 200
+    assert client.get(f"{API}/motoristas/search", headers=auth_header, params=busca).status_code == 429
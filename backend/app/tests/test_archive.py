@@ -0,0 +1,68 @@
+from datetime import date
+
+import pytest
+
+API = "/api/v1"
+COLETAS = f"{API}/coletas/coletas"
+
+
+def coletas_antigas(ano: int, placa: str, total: int):
+    return [{
+        "posto_identificador": "44.555.666/0001-77", "posto_nome": "Posto Antigo", "cidade": "CAMPINAS",
+        "estado": "SP", "data_coleta": f"{ano}-03-{dia + 1:02d}T12:00:00", "tipo_combustivel": "Gasolina",
+        "preco_venda": "5.89", "volume_vendido": "25.00", "motorista_nome": "Motorista Antigo",
+        "motorista_cpf": "44455566677", "veiculo_placa": placa, "tipo_veiculo": "Carro",
+    } for dia in range(total)]
+
+
+def archiver(directory: str, corte: date):
+    # Retenção calculada para que o corte caia no dia pedido: só as coletas de teste ficam antes dele
+    from core.archive import ColetasArchiver
+    return ColetasArchiver(directory, retention_days=(date.today() - corte).days, interval=1, batch_rows=2)
+
+
+@pytest.fixture
+def arquivo_dir(monkeypatch, tmp_path, redis_client):
+    from core.config import settings
+    monkeypatch.setattr(settings, "ARCHIVE_DIR", str(tmp_path))
+    redis_client.flushdb()
+    return tmp_path
+
+
+def test_arquivamento(client, auth_header, arquivo_dir):
+    placa = "ARQ1A01"
+    lote = client.post(f"{COLETAS}/lote", headers=auth_header, json=coletas_antigas(2015, placa, 3))
+    ids = lote.json()["ids"]
+    volume = client.get(f"{API}/dashboard/volume-total-abastecimentos", headers=auth_header).json()
+
+    assert archiver(str(arquivo_dir), date(2016, 1, 1)).archive_once() == 3
+    assert sorted(path.name for path in arquivo_dir.iterdir()) == [
+        f"coletas-{ids[0]}-{ids[1]}.npz", f"coletas-{ids[2]}-{ids[2]}.npz",
+    ]
+
+    # Fora de coletas, lidas do arquivo; os agregados continuam com elas
+    assert client.get(f"{COLETAS}/{ids[0]}", headers=auth_header).status_code == 404
+    arquivadas = client.get(f"{COLETAS}/arquivo", headers=auth_header, params={
+        "data_inicio": "2015-01-01", "data_fim": "2015-12-31", "veiculo_placa": placa,
+    }).json()
+    assert [coleta["id"] for coleta in arquivadas] == ids
+    assert client.get(f"{API}/dashboard/volume-total-abastecimentos", headers=auth_header).json() == volume
+
+
+def test_falha_na_gravacao_nao_deixa_arquivo(client, auth_header, arquivo_dir, monkeypatch):
+    from core import archive
+    from core.database import ColetaModel, SessionLocal, VeiculoModel
+
+    placa = "ARQ1A02"
+    client.post(f"{COLETAS}/lote", headers=auth_header, json=coletas_antigas(2013, placa, 2))
+
+    def disco_cheio(f, **arrays):
+        f.write(b"parcial")
+        raise OSError("No space left on device")
+    monkeypatch.setattr(archive.np, "savez_compressed", disco_cheio)
+
+    with pytest.raises(OSError):
+        archiver(str(arquivo_dir), date(2014, 1, 1)).archive_once()
+    assert list(arquivo_dir.iterdir()) == []
+    with SessionLocal() as db:
+        assert db.query(ColetaModel).join(VeiculoModel).filter(VeiculoModel.placa == placa).count() == 2
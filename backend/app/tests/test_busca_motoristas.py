@@ -0,0 +1,64 @@
+import pytest
+
+API = "/api/v1"
+BUSCA = f"{API}/motoristas/search"
+COLETAS = f"{API}/coletas/coletas"
+
+# (motorista, cpf, placa, tipo de veículo)
+MOTORISTAS = [
+    ("Bruno Quixabeira", "31313131301", "QXB9A01", "Moto"),
+    ("Quixabeira Souza", "31313131302", "XQXB9A2", "Carro"),
+    ("Quixabeira Souza Lima", "31313131303", "QXB9A03", "Carro"),
+    ("Motorista 100% Quixaba", "31313131304", "QXB9A04", "Carro"),
+]
+
+
+@pytest.fixture(scope="module")
+def motoristas(client, auth_header):
+    # Duas coletas por motorista e placa: as sugestões são distintas
+    lote = client.post(f"{COLETAS}/lote", headers=auth_header, json=[{
+        "posto_identificador": "13.131.313/0001-13", "posto_nome": "Posto Busca", "cidade": "BOA VISTA",
+        "estado": "RR", "data_coleta": f"2020-04-0{dia}T0{i}:00:00", "tipo_combustivel": "Gasolina",
+        "preco_venda": "5.99", "volume_vendido": "20.00", "motorista_nome": nome, "motorista_cpf": cpf,
+        "veiculo_placa": placa, "tipo_veiculo": tipo,
+    } for i, (nome, cpf, placa, tipo) in enumerate(MOTORISTAS) for dia in (1, 2)])
+    assert lote.json()["inseridas"] == 2 * len(MOTORISTAS)
+
+
+def buscar(client, headers, q, **params):
+    response = client.get(BUSCA, headers=headers, params={"q": q, **params})
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def test_prefixo_antes_de_quem_contem(client, auth_header, motoristas):
+    busca = buscar(client, auth_header, "quixabeira")
+    assert [m["motorista_nome"] for m in busca["motoristas"]] == [
+        "Quixabeira Souza", "Quixabeira Souza Lima", "Bruno Quixabeira",
+    ]
+    assert busca["motoristas"][0]["motorista_cpf"] == "31313131302"
+
+    placas = buscar(client, auth_header, "qxb9")["placas"]
+    assert [(p["veiculo_placa"], p["tipo_veiculo"]) for p in placas] == [
+        ("QXB9A01", "Moto"), ("QXB9A03", "Carro"), ("QXB9A04", "Carro"), ("XQXB9A2", "Carro"),
+    ]
+
+
+def test_limite_e_curingas(client, auth_header, motoristas):
+    assert len(buscar(client, auth_header, "quixabeira", limite=1)["motoristas"]) == 1
+    # % e _ digitados são literais, não curingas do LIKE
+    assert [m["motorista_nome"] for m in buscar(client, auth_header, "100% q")["motoristas"]] == ["Motorista 100% Quixaba"]
+    assert buscar(client, auth_header, "__") == {"motoristas": [], "placas": []}
+
+
+def test_so_motoristas_com_coletas(client, auth_header, motoristas):
+    exclusao = client.delete(f"{COLETAS}/", headers=auth_header, params={"veiculo_placa": "QXB9A01"})
+    assert exclusao.json()["afetadas"] == 2
+    busca = buscar(client, auth_header, "quixabeira")
+    assert "Bruno Quixabeira" not in [m["motorista_nome"] for m in busca["motoristas"]]
+    assert "QXB9A01" not in [p["veiculo_placa"] for p in buscar(client, auth_header, "qxb9")["placas"]]
+
+
+@pytest.mark.parametrize("params", [{"q": "q"}, {"q": "  "}, {"q": "quixabeira", "limite": 0}, {"q": "quixabeira", "limite": 10_000}, {}])
+def test_parametros_invalidos(client, auth_header, params):
+    assert client.get(BUSCA, headers=auth_header, params=params).status_code == 422
@@ -0,0 +1,64 @@
+import pytest
+
+from conftest import OUTRO_TENANT, TENANT
+
+API = "/api/v1"
+
+
+@pytest.fixture
+def aquecedor(app, redis_client):
+    from core.cache_warmer import CacheWarmer
+    redis_client.flushdb()
+    return CacheWarmer(poll_interval=1, min_interval=0, refresh_interval=120, concurrency=2)
+
+
+def em_cache(redis_client, plano, tenant):
+    from core.cache_utils import TENANT_KWARG
+    chaves = [cache_key for _, kwargs, cache_key in plano if kwargs[TENANT_KWARG] == tenant]
+    return redis_client.exists(*chaves), len(chaves)
+
+
+def test_aquece_as_variantes_de_cada_tenant(client, auth_header, aquecedor, redis_client, capsys):
+    plano = aquecedor._plan()
+    assert {kwargs["tipo_combustivel"] for func, kwargs, _ in plano if func.__name__ == "get_percentis_preco"} == {
+        None, "Gasolina", "Etanol", "Diesel S10",
+    }
+
+    assert aquecedor.warm_once() > 0
+    for tenant in (TENANT, OUTRO_TENANT):
+        aquecidas, total = em_cache(redis_client, plano, tenant)
+        assert aquecidas > total // 2
+
+    # A requisição com os parâmetros de uma variante (o resto nos padrões) encontra a chave aquecida
+    capsys.readouterr()
+    client.get(f"{API}/dashboard/percentis-preco", headers=auth_header,
+               params={"tipo_combustivel": "Etanol", "por_estado": "true"})
+    assert "CACHE HIT" in capsys.readouterr().out
+
+
+def test_so_reaquece_quando_os_dados_mudam(aquecedor, redis_client):
+    from core.cache_utils import mark_data_changed
+
+    assert aquecedor.warm_once() > 0
+    assert aquecedor.warm_once() is None  # mesma versão dos dados, entradas novas
+
+    mark_data_changed(TENANT)
+    plano = aquecedor._plan()
+    assert em_cache(redis_client, plano, TENANT)[0] == 0
+    outro_antes = em_cache(redis_client, plano, OUTRO_TENANT)[0]
+
+    assert aquecedor.warm_once() > 0
+    assert em_cache(redis_client, plano, TENANT)[0] > 0
+    assert em_cache(redis_client, plano, OUTRO_TENANT)[0] == outro_antes
+
+
+def test_um_worker_por_vez(aquecedor, redis_client):
+    from core.cache_warmer import WARM_LOCK_KEY
+
+    redis_client.set(WARM_LOCK_KEY, "outro-worker", ex=60)
+    assert aquecedor.warm_once() is None
+    assert redis_client.get(WARM_LOCK_KEY) == "outro-worker"
+
+    redis_client.delete(WARM_LOCK_KEY)
+    assert aquecedor.warm_once() > 0
+    assert not redis_client.exists(WARM_LOCK_KEY)
@@ -0,0 +1,81 @@
+from conftest import OUTRO_TENANT, TENANT
+
+API = "/api/v1"
+COLETAS = f"{API}/coletas/coletas"
+CIDADE = "CIDADE DO CACHE"
+OUTRA_CIDADE = "CIDADE DO DETALHE"
+
+
+# Um posto por cidade: a cidade é atributo do posto (core/dimensions.py)
+POSTOS = {CIDADE: "99.000.111/0001-22", OUTRA_CIDADE: "99.000.111/0002-22"}
+
+
+def coleta(minuto: int, tipo_combustivel: str = "Gasolina", cidade: str = CIDADE, preco: str = "5.89"):
+    return {
+        "posto_identificador": POSTOS[cidade], "posto_nome": "Posto Cache", "cidade": cidade,
+        "estado": "RO", "data_coleta": f"2021-12-01T10:{minuto:02d}:00", "tipo_combustivel": tipo_combustivel,
+        "preco_venda": preco, "volume_vendido": "30.00", "motorista_nome": "Motorista Cache",
+        "motorista_cpf": "99900011122", "veiculo_placa": "CCH1E00", "tipo_veiculo": "Carro",
+    }
+
+
+def pagina(tenant: str, skip: int, **filtros) -> str:
+    from core.coletas_cache import filter_signature, normalize_filters, page_key
+    return page_key(filter_signature(normalize_filters(tenant, **filtros)), skip, 2)
+
+
+def listar(client, headers, skip: int, **filtros):
+    response = client.get(f"{COLETAS}/", headers=headers, params={"skip": skip, "limit": 2, **filtros})
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_assinaturas_da_coleta():
+    from core.coletas_cache import _matching_signatures, filter_signature, normalize_filters
+
+    valores = {"coreid": TENANT, "estado": "RO", "cidade": CIDADE, "tipo_combustivel": "Gasolina", "tipo_veiculo": "Carro"}
+    assinaturas = _matching_signatures(valores)
+    assert len(set(assinaturas)) == 16
+    assert filter_signature(normalize_filters(TENANT)) in assinaturas
+    assert filter_signature(normalize_filters(TENANT, estado="ro", cidade=CIDADE.lower())) in assinaturas
+    assert filter_signature(normalize_filters(TENANT, tipo_combustivel="Etanol")) not in assinaturas
+    assert filter_signature(normalize_filters(OUTRO_TENANT)) not in assinaturas
+
+
+def test_insercao_invalida_so_a_cauda(client, auth_header, outro_auth_header, redis_client):
+    redis_client.flushdb()
+    ids = client.post(f"{COLETAS}/lote", headers=auth_header, json=[coleta(m) for m in range(3)]).json()["ids"]
+
+    # Página cheia e cauda da cidade, nas duas grafias do filtro
+    assert [c["id"] for c in listar(client, auth_header, 0, cidade=CIDADE)] == ids[:2]
+    assert [c["id"] for c in listar(client, auth_header, 2, cidade=CIDADE.lower())] == ids[2:]
+    cheia, cauda = pagina(TENANT, 0, cidade=CIDADE), pagina(TENANT, 2, cidade=CIDADE)
+    assert redis_client.exists(cheia, cauda) == 2
+
+    # Outro tenant, ou combustível fora do filtro de outra página: nada sai do cache
+    client.post(f"{COLETAS}/", headers=outro_auth_header, json=coleta(3))
+    listar(client, auth_header, 0, tipo_combustivel="Diesel S10", cidade=CIDADE)
+    client.post(f"{COLETAS}/", headers=auth_header, json=coleta(4, "Etanol", preco="3.99"))
+    assert redis_client.exists(cheia) == 1
+    assert redis_client.exists(pagina(TENANT, 0, tipo_combustivel="Diesel S10", cidade=CIDADE)) == 1
+    assert redis_client.exists(cauda) == 0
+
+    assert len(listar(client, auth_header, 2, cidade=CIDADE)) == 2
+
+
+def test_alteracao_invalida_todas_as_paginas_e_o_detalhe(client, auth_header, outro_auth_header, redis_client):
+    from core.coletas_cache import detail_key
+
+    redis_client.flushdb()
+    ids = client.post(f"{COLETAS}/lote", headers=auth_header, json=[coleta(m, cidade=OUTRA_CIDADE) for m in range(10, 13)]).json()["ids"]
+    listar(client, auth_header, 0, estado="RO", cidade=OUTRA_CIDADE)
+    assert client.get(f"{COLETAS}/{ids[0]}", headers=auth_header).json()["preco_venda"] == "5.89"
+    assert redis_client.exists(pagina(TENANT, 0, estado="RO", cidade=OUTRA_CIDADE), detail_key(TENANT, ids[0])) == 2
+
+    # O cache do detalhe é por tenant: o outro não enxerga a coleta
+    assert client.get(f"{COLETAS}/{ids[0]}", headers=outro_auth_header).status_code == 404
+
+    assert client.put(f"{COLETAS}/{ids[0]}", headers=auth_header, json={"preco_venda": "5.99"}).status_code == 200
+    assert redis_client.exists(pagina(TENANT, 0, estado="RO", cidade=OUTRA_CIDADE), detail_key(TENANT, ids[0])) == 0
+    assert client.get(f"{COLETAS}/{ids[0]}", headers=auth_header).json()["preco_venda"] == "5.99"
+    assert [c["preco_venda"] for c in listar(client, auth_header, 0, estado="RO", cidade=OUTRA_CIDADE)] == ["5.99", "5.89"]
@@ -0,0 +1,55 @@
+import json
+
+import pytest
+
+API = "/api/v1"
+MEDIAS = f"{API}/dashboard/media-preco-combustivel"
+
+
+@pytest.mark.parametrize("formato", ["gzip", "zstd"])
+def test_ida_e_volta(monkeypatch, formato):
+    from core import compression
+    from core.config import settings
+
+    if formato == "zstd" and compression.zstandard is None:
+        pytest.skip("pacote zstandard não instalado")
+    monkeypatch.setattr(settings, "CACHE_COMPRESSION", formato)
+    monkeypatch.setattr(settings, "CACHE_COMPRESSION_MIN_BYTES", 64)
+
+    grande = json.dumps([{"tipo_combustivel": "Gasolina", "media_preco": 5.99}] * 50).encode()
+    comprimido = compression.encode_payload(grande)
+    assert compression.payload_encoding(comprimido) == formato
+    assert len(comprimido) < len(grande)
+    assert compression.decode_payload(comprimido) == grande
+
+    # Abaixo do mínimo fica em JSON puro
+    pequeno = b'{"total": 1}'
+    assert compression.encode_payload(pequeno) == pequeno
+    assert compression.decode_payload(pequeno) == pequeno
+
+
+@pytest.mark.parametrize("accept_encoding, aceita", [
+    ("gzip", True), ("br, gzip;q=0.5", True), ("GZIP", True),
+    ("gzip;q=0", False), ("gzip; q=0.000", False), ("identity", False), ("", False),
+])
+def test_aceita_codificacao(accept_encoding, aceita):
+    from core.compression import accepts_encoding
+    assert accepts_encoding(accept_encoding, "gzip") is aceita
+
+
+def test_cache_comprimido_servido_como_gravado(client, auth_header, redis_client, monkeypatch):
+    from core.config import settings
+
+    monkeypatch.setattr(settings, "CACHE_COMPRESSION_MIN_BYTES", 1)
+    redis_client.flushdb()
+    calculada = client.get(MEDIAS, headers=auth_header).json()
+
+    # Do cache: os bytes gzip vão direto ao cliente que aceita gzip, e descomprimidos aos demais
+    comprimida = client.get(MEDIAS, headers={**auth_header, "Accept-Encoding": "gzip"})
+    assert comprimida.headers["Content-Encoding"] == "gzip"
+    assert "Accept-Encoding" in comprimida.headers["Vary"]
+    assert comprimida.json() == calculada
+
+    pura = client.get(MEDIAS, headers={**auth_header, "Accept-Encoding": "identity"})
+    assert "Content-Encoding" not in pura.headers
+    assert pura.json() == calculada
@@ -0,0 +1,53 @@
+from datetime import date
+
+import pytest
+from sqlalchemy import delete
+
+from conftest import TENANT
+
+API = "/api/v1"
+CODIGO_NOVO = 99  # código ainda sem rótulo em FUEL_TYPE_CODES / VEHICLE_TYPE_CODES
+
+
+@pytest.fixture
+def celula_sem_rotulo(redis_client):
+    # Células do cubo e do histograma com combustível e veículo de códigos desconhecidos pela API
+    from core.database import KpiCuboModel, PostoModel, PrecoHistogramaModel, SessionLocal
+
+    chave = {
+        "coreid": TENANT, "estado": "SP", "cidade": "SANTOS", "dia": date(2021, 9, 1),
+        "tipo_combustivel_codigo": CODIGO_NOVO, "tipo_veiculo_codigo": CODIGO_NOVO,
+    }
+    with SessionLocal() as db:
+        chave["posto_id"] = db.query(PostoModel.id).filter(PostoModel.coreid == TENANT).limit(1).scalar()
+        db.add(KpiCuboModel(**chave, quantidade=1, volume_centilitros=10 ** 9,
+                            soma_preco_centavos=599, receita_centesimos_centavo=599 * 10 ** 9))
+        db.add(PrecoHistogramaModel(coreid=TENANT, tipo_combustivel_codigo=CODIGO_NOVO, estado="SP",
+                                    dia=chave["dia"], preco_centavos=599, quantidade=1))
+        db.commit()
+    redis_client.flushdb()
+    yield
+    with SessionLocal() as db:
+        db.execute(delete(KpiCuboModel).where(*(getattr(KpiCuboModel, k) == v for k, v in chave.items())))
+        db.execute(delete(PrecoHistogramaModel).where(
+            PrecoHistogramaModel.coreid == TENANT, PrecoHistogramaModel.tipo_combustivel_codigo == CODIGO_NOVO,
+        ))
+        db.commit()
+    redis_client.flushdb()
+
+
+def test_codigos_sem_rotulo(client, auth_header, celula_sem_rotulo):
+    medias = client.get(f"{API}/dashboard/media-preco-combustivel", headers=auth_header)
+    assert medias.status_code == 200
+    assert {"tipo_combustivel": CODIGO_NOVO, "media_preco": 5.99} in medias.json()
+
+    volumes = client.get(f"{API}/dashboard/volume-por-veiculo", headers=auth_header)
+    assert volumes.status_code == 200
+    assert CODIGO_NOVO in [volume["tipo_veiculo"] for volume in volumes.json()]
+
+    maior = client.get(f"{API}/dashboard/maior-consumidor", headers=auth_header)
+    assert maior.json()["tipo_veiculo"] == CODIGO_NOVO
+
+    percentis = client.get(f"{API}/dashboard/percentis-preco", headers=auth_header)
+    assert percentis.status_code == 200
+    assert CODIGO_NOVO in [percentil["tipo_combustivel"] for percentil in percentis.json()]
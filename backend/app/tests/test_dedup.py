@@ -0,0 +1,99 @@
+import uuid
+
+import pytest
+from budget import measure
+
+API = "/api/v1"
+COLETAS = f"{API}/coletas/coletas"
+
+
+def coleta(placa: str, data: str = "2021-07-01T10:00:00"):
+    return {
+        "posto_identificador": "55.666.777/0001-88", "posto_nome": "Posto Reenvio", "cidade": "LONDRINA",
+        "estado": "PR", "data_coleta": data, "tipo_combustivel": "Gasolina", "preco_venda": "6.09",
+        "volume_vendido": "30.00", "motorista_nome": "Motorista Reenvio", "motorista_cpf": "55566677788",
+        "veiculo_placa": placa, "tipo_veiculo": "Carro",
+    }
+
+
+def test_filtro_de_bloom(redis_client):
+    from core.dedup import RedisBloomFilter
+
+    filtro = RedisBloomFilter(key=f"teste:bloom:{uuid.uuid4().hex}", size_bits=1 << 16, num_hashes=4, ttl=60)
+    assert filtro.might_contain(["a", "b"]) == [False, False]
+    filtro.add(["a"])
+    assert filtro.might_contain(["a", "b"]) == [True, False]
+    assert 0 < redis_client.ttl(filtro.key) <= 60
+
+    # Um comando por lote, não um GETBIT/SETBIT por posição (k por item)
+    itens = [f"item-{i}" for i in range(100)]
+    with measure() as consulta:
+        filtro.might_contain(itens)
+    with measure() as gravacao:
+        filtro.add(itens)
+    assert consulta.redis_commands == [f"BITFIELD {filtro.key}"]
+    assert gravacao.redis_commands == [f"BITFIELD {filtro.key}", f"EXPIRE {filtro.key}"]
+    assert gravacao.redis_round_trips == 1
+    assert filtro.might_contain(itens) == [True] * len(itens)
+
+
+def test_reenvio_retorna_a_coleta_existente(client, auth_header):
+    primeira = client.post(f"{COLETAS}/", headers=auth_header, json=coleta("DUP1A01"))
+    assert primeira.status_code == 201
+
+    # O mesmo instante com fuso: gravado em UTC, é a mesma chave natural
+    reenvio = client.post(f"{COLETAS}/", headers=auth_header, json=coleta("DUP1A01", "2021-07-01T07:00:00-03:00"))
+    assert reenvio.status_code == 200
+    assert reenvio.json()["id"] == primeira.json()["id"]
+
+
+def test_lote_ignora_duplicatas(client, auth_header):
+    existente = client.post(f"{COLETAS}/", headers=auth_header, json=coleta("DUP1A02")).json()["id"]
+
+    lote = client.post(f"{COLETAS}/lote", headers=auth_header, json=[
+        coleta("DUP1A02"), coleta("DUP1A03"), coleta("DUP1A03"),
+    ]).json()
+    assert (lote["inseridas"], lote["duplicadas"]) == (1, 2)
+    assert lote["ids"][0] is None and lote["ids"][2] is None
+    assert lote["ids"][1] not in (None, existente)
+
+
+def test_falso_positivo_do_filtro_ainda_grava(client, auth_header, monkeypatch):
+    # Filtro "viu tudo": cada chave é confirmada no banco, e as novas seguem para o INSERT
+    from core.dedup import DUPLICATE_FILTER
+    monkeypatch.setattr(DUPLICATE_FILTER, "might_contain", lambda items: [True] * len(items))
+
+    response = client.post(f"{COLETAS}/", headers=auth_header, json=coleta("DUP1A04"))
+    assert response.status_code == 201
+
+
+@pytest.mark.parametrize("filtro_vazio", [True, False])
+def test_duplicata_sem_o_filtro(client, auth_header, redis_client, monkeypatch, filtro_vazio):
+    # Filtro expirado (ou Redis fora): o índice único ainda barra a duplicata
+    from core.dedup import DUPLICATE_FILTER
+
+    placa = f"DUP1B0{int(filtro_vazio)}"
+    primeira = client.post(f"{COLETAS}/", headers=auth_header, json=coleta(placa)).json()["id"]
+    if filtro_vazio:
+        redis_client.delete(DUPLICATE_FILTER.key)
+    else:
+        monkeypatch.setattr(DUPLICATE_FILTER, "might_contain", lambda items: [False] * len(items))
+
+    reenvio = client.post(f"{COLETAS}/", headers=auth_header, json=coleta(placa))
+    assert reenvio.status_code == 200
+    assert reenvio.json()["id"] == primeira
+
+
+def test_alteracao_para_chave_existente(client, auth_header):
+    ocupada = client.post(f"{COLETAS}/", headers=auth_header, json=coleta("DUP1A06")).json()
+    outra = client.post(f"{COLETAS}/", headers=auth_header, json=coleta("DUP1A07")).json()
+
+    # PUT que leva a coleta para a chave natural de outra: 409, nada alterado
+    response = client.put(f"{COLETAS}/{outra['id']}", headers=auth_header, json={"veiculo_placa": "DUP1A06"})
+    assert response.status_code == 409
+    assert client.get(f"{COLETAS}/{outra['id']}", headers=auth_header).json()["veiculo_placa"] == "DUP1A07"
+    assert client.get(f"{COLETAS}/{ocupada['id']}", headers=auth_header).json()["veiculo_placa"] == "DUP1A06"
+
+    # A sessão desfeita não deixa rastro: a coleta segue alterável
+    alterada = client.put(f"{COLETAS}/{outra['id']}", headers=auth_header, json={"veiculo_placa": "DUP1A08"})
+    assert alterada.status_code == 200
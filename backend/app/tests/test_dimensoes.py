@@ -0,0 +1,100 @@
+from sqlalchemy import text
+
+from conftest import TENANT
+
+API = "/api/v1"
+COLETAS = f"{API}/coletas/coletas"
+POSTO = "14.141.414/0001-14"
+
+
+def coleta(minuto: int, **campos):
+    return {
+        "posto_identificador": POSTO, "posto_nome": "Posto Dimensao", "cidade": "CUIABA", "estado": "MT",
+        "data_coleta": f"2020-05-01T10:{minuto:02d}:00", "tipo_combustivel": "Etanol", "preco_venda": "3.99",
+        "volume_vendido": "40.00", "motorista_nome": "Motorista Dimensao", "motorista_cpf": "14141414141",
+        "veiculo_placa": "DIM1E00", "tipo_veiculo": "Carro", **campos,
+    }
+
+
+def chaves(db, coleta_id: int):
+    return db.execute(text("""
+        SELECT p.identificador, m.cpf, v.placa, c.tipo_combustivel_codigo, c.tipo_veiculo_codigo
+        FROM coletas c
+        JOIN postos p ON p.id = c.posto_id AND p.coreid = c.coreid
+        JOIN motoristas m ON m.id = c.motorista_id AND m.coreid = c.coreid
+        JOIN veiculos v ON v.id = c.veiculo_id AND v.coreid = c.coreid
+        WHERE c.id = :id
+    """), {"id": coleta_id}).one()
+
+
+def test_lru_das_dimensoes():
+    from core.dimensions import DimensionCache
+
+    cache = DimensionCache(max_size=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1  # "a" passa a ser a mais recente
+    cache.put("c", 3)
+    assert (cache.get("a"), cache.get("b"), cache.get("c")) == (1, None, 3)
+
+
+def test_uma_linha_por_dimensao_e_chaves_na_coleta(client, auth_header):
+    from core.database import SessionLocal
+
+    ids = client.post(f"{COLETAS}/lote", headers=auth_header, json=[coleta(m) for m in range(3)]).json()["ids"]
+    with SessionLocal() as db:
+        for tabela, coluna, valor in (("postos", "identificador", POSTO), ("motoristas", "cpf", "14141414141"),
+                                      ("veiculos", "placa", "DIM1E00")):
+            total = db.execute(text(f"SELECT count(*) FROM {tabela} WHERE coreid = :coreid AND {coluna} = :valor"),
+                               {"coreid": TENANT, "valor": valor}).scalar()
+            assert total == 1, tabela
+        assert {chaves(db, coleta_id) for coleta_id in ids} == {(POSTO, "14141414141", "DIM1E00", 2, 1)}
+
+    # PUT que troca motorista, placa e tipo de veículo: a coleta passa a apontar para as novas linhas
+    alterada = client.put(f"{COLETAS}/{ids[0]}", headers=auth_header, json={
+        "motorista_cpf": "14141414142", "veiculo_placa": "DIM1E01", "tipo_veiculo": "Moto",
+    })
+    assert alterada.status_code == 200
+    with SessionLocal() as db:
+        assert chaves(db, ids[0]) == (POSTO, "14141414142", "DIM1E01", 2, 2)
+
+
+def test_textos_vem_das_dimensoes(client, auth_header):
+    from core.database import SessionLocal
+
+    posto = "14.141.414/0002-14"
+    primeira = client.post(f"{COLETAS}/", headers=auth_header, json=coleta(30, posto_identificador=posto)).json()
+    # Mesmo posto com outro nome e outra cidade: o nome vale para todas as coletas dele, a cidade é a
+    # do primeiro registro (chave do cubo)
+    segunda = client.post(f"{COLETAS}/", headers=auth_header, json=coleta(
+        31, posto_identificador=posto, posto_nome="Posto Renomeado", cidade="VARZEA GRANDE",
+    )).json()
+    for coleta_id in (primeira["id"], segunda["id"]):
+        detalhe = client.get(f"{COLETAS}/{coleta_id}", headers=auth_header).json()
+        assert (detalhe["posto_nome"], detalhe["cidade"], detalhe["tipo_combustivel"]) == ("Posto Renomeado", "CUIABA", "Etanol")
+
+    with SessionLocal() as db:
+        colunas = set(db.execute(text(
+            "SELECT column_name FROM information_schema.columns WHERE table_name = 'coletas'"
+        )).scalars())
+    assert not colunas & {"posto_identificador", "posto_nome", "cidade", "estado", "motorista_cpf", "veiculo_placa"}
+
+
+def test_rollback_nao_deixa_ids_no_cache(client, auth_header):
+    from core.database import SessionLocal
+    from core.dimensions import MOTORISTA_CACHE, attach_dimension_keys
+
+    # Upsert do motorista numa transação desfeita: a linha some e o id não pode ficar no LRU
+    linha = {**coleta(20, motorista_cpf="14141414149"), "coreid": TENANT}
+    with SessionLocal() as db:
+        attach_dimension_keys(db, [linha])
+        db.rollback()
+    chave = tuple(sorted({"coreid": TENANT, "cpf": "14141414149", "nome": "Motorista Dimensao"}.items()))
+    assert MOTORISTA_CACHE.get(chave) is None
+
+    # A mesma pessoa reenviada grava normalmente (antes: ForeignKeyViolation até reiniciar o worker)
+    response = client.post(f"{COLETAS}/", headers=auth_header, json=coleta(20, motorista_cpf="14141414149"))
+    assert response.status_code == 201
+    with SessionLocal() as db:
+        assert chaves(db, response.json()["id"])[1] == "14141414149"
+    assert MOTORISTA_CACHE.get(chave) is not None
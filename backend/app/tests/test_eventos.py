@@ -0,0 +1,80 @@
+import asyncio
+import json
+import time
+import uuid
+
+import pytest
+
+from conftest import OUTRO_TENANT, TENANT
+
+API = "/api/v1"
+
+
+@pytest.fixture
+def broadcaster():
+    from core.events import DataEventBroadcaster
+    eventos = DataEventBroadcaster(channel=f"teste:eventos:{uuid.uuid4().hex}", debounce=0.2)
+    yield eventos
+    eventos.stop()
+
+
+def test_rajada_vira_um_evento_por_tenant(broadcaster):
+    async def cenario():
+        (_, fila), (_, outra_fila) = broadcaster.subscribe(TENANT), broadcaster.subscribe(OUTRO_TENANT)
+        for timestamp in (10, 30, 20):
+            broadcaster.notify({"eventos": 1, "last_update_timestamp": timestamp, "coreid": TENANT})
+
+        evento = await asyncio.wait_for(fila.get(), timeout=5)
+        await asyncio.sleep(0.3)
+        return evento, fila.empty(), outra_fila.empty()
+
+    evento, sem_mais_eventos, outro_sem_eventos = asyncio.run(cenario())
+    assert evento == {"eventos": 3, "last_update_timestamp": 30}
+    assert sem_mais_eventos and outro_sem_eventos
+
+
+def test_eventos_publicados_no_redis(broadcaster, redis_client):
+    async def cenario():
+        _, fila = broadcaster.subscribe(TENANT)
+        limite = time.monotonic() + 5
+        while dict(redis_client.pubsub_numsub(broadcaster.channel)).get(broadcaster.channel, 0) == 0:
+            assert time.monotonic() < limite, "assinatura do canal não feita"
+            await asyncio.sleep(0.05)
+        redis_client.publish(broadcaster.channel, json.dumps({"eventos": 1, "last_update_timestamp": 5, "coreid": TENANT}))
+        return await asyncio.wait_for(fila.get(), timeout=5)
+
+    assert asyncio.run(cenario()) == {"eventos": 1, "last_update_timestamp": 5}
+
+
+def test_stream_do_tenant(monkeypatch):
+    from core.events import DATA_EVENTS
+    from routes.eventos import event_stream
+
+    monkeypatch.setattr(DATA_EVENTS, "debounce", 0.05)
+
+    async def cenario():
+        stream = event_stream(TENANT)
+        mensagens = [await anext(stream), await anext(stream)]
+        DATA_EVENTS.notify({"eventos": 1, "last_update_timestamp": 7, "coreid": OUTRO_TENANT})
+        DATA_EVENTS.notify({"eventos": 1, "last_update_timestamp": 8, "coreid": TENANT})
+        mensagens.append(await asyncio.wait_for(anext(stream), timeout=5))
+        await stream.aclose()
+        return mensagens
+
+    retry, conectado, atualizado = asyncio.run(cenario())
+    assert retry == "retry: 3000\n\n"
+    assert conectado.startswith("event: conectado\n")
+    assert atualizado == 'event: dados_atualizados\ndata: {"eventos": 1, "last_update_timestamp": 8}\n\n'
+    assert DATA_EVENTS.client_count() == 0
+
+
+def test_limite_de_conexoes(client, auth_header, monkeypatch):
+    from core.config import settings
+
+    monkeypatch.setattr(settings, "EVENTS_MAX_CLIENTS", 0)
+    token = auth_header["Authorization"].split()[1]
+    response = client.get(f"{API}/eventos", params={"token": token})
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "10"
+
+    assert client.get(f"{API}/eventos", params={"token": "invalido"}).status_code == 401
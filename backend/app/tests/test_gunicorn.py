@@ -0,0 +1,78 @@
+import os
+import runpy
+
+import pytest
+
+GUNICORN_CONF = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "gunicorn.conf.py")
+
+
+@pytest.fixture
+def pools(monkeypatch):
+    # 20 conexões por worker (escrita + leitura) e 8 CPUs: 2 * 8 + 1 = 17 workers sem o orçamento
+    from core.config import settings
+
+    for nome in ("DB_POOL_SIZE", "DB_MAX_OVERFLOW", "DB_READ_POOL_SIZE", "DB_READ_MAX_OVERFLOW"):
+        monkeypatch.setattr(settings, nome, 5)
+    monkeypatch.setattr(settings, "DB_PGBOUNCER_MODE", False)
+    monkeypatch.setattr("multiprocessing.cpu_count", lambda: 8)
+    monkeypatch.delenv("WEB_CONCURRENCY", raising=False)
+    return settings
+
+
+@pytest.mark.parametrize("max_connections, pgbouncer, workers", [
+    (100, False, 4),   # (100 - 10) // 20
+    (500, False, 17),  # cabe: fica o padrão por CPU
+    (20, False, 1),    # nem um worker cabe: ainda assim sobe um
+    (100, True, 17),   # com o PgBouncer quem limita é ele
+])
+def test_workers_pelo_orcamento(pools, monkeypatch, max_connections, pgbouncer, workers):
+    monkeypatch.setattr(pools, "DB_MAX_CONNECTIONS", max_connections)
+    monkeypatch.setattr(pools, "DB_PGBOUNCER_MODE", pgbouncer)
+    conf = runpy.run_path(GUNICORN_CONF)
+    assert conf["workers"] == workers
+    assert conf["wsgi_app"] == "main:app"
+
+
+def test_web_concurrency_acima_do_orcamento(pools, monkeypatch, capsys):
+    monkeypatch.setenv("WEB_CONCURRENCY", "6")
+    assert runpy.run_path(GUNICORN_CONF)["workers"] == 6
+    assert "AVISO: WEB_CONCURRENCY=6" in capsys.readouterr().out
+
+    monkeypatch.setenv("WEB_CONCURRENCY", "2")
+    assert runpy.run_path(GUNICORN_CONF)["workers"] == 2
+    assert "AVISO" not in capsys.readouterr().out
+
+
+def test_clientes_descartados_apos_o_fork(app):
+    # O pai já tem engine e cliente Redis; o processo filho começa sem nenhum
+    from core import database, redis_config
+
+    database.get_engine()
+    redis_config.run_redis_command(lambda r: r.ping())
+    assert database._engines and redis_config._clients
+
+    leitura, escrita = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(leitura)
+        os.write(escrita, b"1" if not database._engines and not redis_config._clients else b"0")
+        os._exit(0)
+    os.close(escrita)
+    resultado = os.read(leitura, 1)
+    os.close(leitura)
+    os.waitpid(pid, 0)
+    assert resultado == b"1"
+    assert database._engines and redis_config._clients
+
+
+def test_migracoes_em_head_sao_idempotentes(app):
+    from alembic.config import Config
+    from alembic.script import ScriptDirectory
+    from sqlalchemy import text
+    from core.database import SessionLocal, init_db
+
+    init_db()
+    config = Config(os.path.join(os.path.dirname(GUNICORN_CONF), "alembic.ini"))
+    with SessionLocal() as db:
+        versao = db.execute(text("SELECT version_num FROM alembic_version")).scalar_one()
+    assert versao == ScriptDirectory.from_config(config).get_current_head()
@@ -0,0 +1,51 @@
+API = "/api/v1"
+
+
+def test_pools_configurados_e_observaveis(app):
+    from sqlalchemy import text
+    from core.config import settings
+    from core.database import SessionLocal, get_engine, get_pools_status
+
+    assert get_engine().pool.size() == settings.DB_POOL_SIZE
+    with SessionLocal() as db:
+        db.execute(text("SELECT 1"))  # a sessão segura a conexão até o fim do bloco
+        escrita = get_pools_status()["escrita"]
+        assert escrita["checked_out"] >= 1
+        assert escrita["max_capacity"] == settings.DB_POOL_SIZE + settings.DB_MAX_OVERFLOW
+        assert escrita["saturation"] == round(escrita["checked_out"] / escrita["max_capacity"], 2)
+    assert get_pools_status()["escrita"]["checked_out"] == escrita["checked_out"] - 1
+
+
+def test_readiness_do_snapshot(client, monkeypatch):
+    from sqlalchemy import text
+    from core.database import SessionLocal
+    from routes import health
+    from core.health_probe import HealthProber
+
+    # Prober próprio, sem thread: cada probe_once atualiza o snapshot que os endpoints respondem
+    prober = HealthProber(interval=60, saturation_limit=1.0)
+    monkeypatch.setattr(health, "HEALTH_PROBER", prober)
+
+    # Sem nenhum probe ainda: não pronto, e o liveness aponta o prober parado
+    assert client.get(f"{API}/health/ready").status_code == 503
+    assert client.get(f"{API}/health/live").status_code == 503
+
+    prober.probe_once()
+    pronto = client.get(f"{API}/health/ready")
+    assert pronto.status_code == 200
+    assert pronto.json()["database_status"] == "ok"
+
+    # Pool saturado (limite mínimo): o worker sai do balanceador, mas continua vivo
+    prober.saturation_limit = 0.01
+    with SessionLocal() as db:
+        db.execute(text("SELECT 1"))
+        prober.probe_once()
+    saturado = client.get(f"{API}/health/ready")
+    assert saturado.status_code == 503
+    assert saturado.json()["pool_exhausted"] is True
+
+    # Snapshot velho (prober travado) também tira do ar
+    prober.saturation_limit = 1.0
+    prober.probe_once()
+    prober.snapshot["checked_at"] -= 60 * 3 + 1
+    assert client.get(f"{API}/health/ready").status_code == 503
@@ -0,0 +1,64 @@
+import pytest
+
+API = "/api/v1"
+HISTORICO = f"{API}/dashboard/historico-preco-combustivel"
+
+# Semana de 2 a 8 de março de 2020 (segunda a domingo), só com estas coletas de Diesel do tenant
+LEITURAS = [("2020-03-02T10:15:00", "6.00"), ("2020-03-02T10:45:00", "6.20"),
+            ("2020-03-02T12:00:00", "6.10"), ("2020-03-05T09:00:00", "6.30")]
+
+
+@pytest.fixture(scope="module")
+def leituras(client, auth_header):
+    lote = client.post(f"{API}/coletas/coletas/lote", headers=auth_header, json=[{
+        "posto_identificador": "12.121.212/0001-12", "posto_nome": "Posto Historico", "cidade": "PALMAS",
+        "estado": "TO", "data_coleta": data, "tipo_combustivel": "Diesel S10", "preco_venda": preco,
+        "volume_vendido": "50.00", "motorista_nome": "Motorista Historico", "motorista_cpf": "12121212121",
+        "veiculo_placa": "HST1C00", "tipo_veiculo": "Carreta",
+    } for data, preco in LEITURAS])
+    assert lote.json()["inseridas"] == len(LEITURAS)
+
+
+def historico(client, headers, **params):
+    response = client.get(HISTORICO, headers=headers, params={"tipo_combustivel": "Diesel S10", **params})
+    assert response.status_code == 200, response.text
+    return [(ponto["data_coleta"], ponto["preco_medio_arredondado"]) for ponto in response.json()]
+
+
+@pytest.mark.parametrize("granularidade, data_fim, pontos", [
+    ("hora", "2020-03-02", [("2020-03-02T10:00:00", 6.1), ("2020-03-02T12:00:00", 6.1)]),
+    ("dia", "2020-03-08", [("2020-03-02", 6.1), ("2020-03-05", 6.3)]),
+    ("semana", "2020-03-08", [("2020-03-02", 6.15)]),
+    ("mes", "2020-03-31", [("2020-03-01", 6.15)]),
+])
+def test_granularidades(client, auth_header, leituras, granularidade, data_fim, pontos):
+    assert historico(client, auth_header, granularidade=granularidade,
+                     data_inicio="2020-03-02", data_fim=data_fim) == pontos
+
+
+def test_preenche_lacunas(client, auth_header, leituras):
+    por_hora = historico(client, auth_header, granularidade="hora", data_inicio="2020-03-02",
+                         data_fim="2020-03-02", preencher_lacunas="true")
+    assert len(por_hora) == 24
+    assert por_hora[10:13] == [("2020-03-02T10:00:00", 6.1), ("2020-03-02T11:00:00", None), ("2020-03-02T12:00:00", 6.1)]
+
+    por_dia = historico(client, auth_header, data_inicio="2020-03-01", data_fim="2020-03-07", preencher_lacunas="true")
+    assert [data for data, _ in por_dia] == [f"2020-03-0{dia}" for dia in range(1, 8)]
+    assert [preco for _, preco in por_dia] == [None, 6.1, None, None, 6.3, None, None]
+
+
+@pytest.mark.parametrize("params", [
+    {"granularidade": "hora"},
+    {"granularidade": "hora", "data_inicio": "2020-03-02"},
+    {"granularidade": "hora", "data_inicio": "2020-01-01", "data_fim": "2020-12-31"},
+    {"granularidade": "dia", "data_inicio": "2010-01-01", "data_fim": "2020-12-31"},
+])
+def test_periodo_invalido(client, auth_header, params):
+    assert client.get(HISTORICO, headers=auth_header, params=params).status_code == 400
+
+
+def test_padrao_inalterado(client, auth_header):
+    response = client.get(HISTORICO, headers=auth_header)
+    assert response.status_code == 200
+    assert response.json()
+    assert all(len(ponto["data_coleta"]) == 10 for ponto in response.json())
@@ -0,0 +1,61 @@
+API = "/api/v1"
+VOLUME = f"{API}/dashboard/volume-total-abastecimentos"
+
+
+def coleta(placa: str):
+    return {
+        "posto_identificador": "88.999.000/0001-11", "posto_nome": "Posto Validador", "cidade": "JOINVILLE",
+        "estado": "SC", "data_coleta": "2021-11-01T10:00:00", "tipo_combustivel": "Gasolina",
+        "preco_venda": "5.99", "volume_vendido": "30.00", "motorista_nome": "Motorista Validador",
+        "motorista_cpf": "88899900011", "veiculo_placa": placa, "tipo_veiculo": "Carro",
+    }
+
+
+def condicional(client, headers, etag, path=VOLUME):
+    return client.get(path, headers={**headers, "If-None-Match": etag})
+
+
+def test_etag_e_304(client, auth_header):
+    primeira = client.get(VOLUME, headers=auth_header)
+    etag = primeira.headers["ETag"]
+    assert primeira.headers["Cache-Control"] == "private, no-cache"
+
+    # A segunda vem do cache (bytes) e leva os mesmos validadores
+    assert client.get(VOLUME, headers=auth_header).headers["ETag"] == etag
+
+    nao_modificado = condicional(client, auth_header, etag)
+    assert nao_modificado.status_code == 304
+    assert nao_modificado.content == b""
+    assert nao_modificado.headers["ETag"] == etag
+    assert condicional(client, auth_header, f"{etag[2:]}, \"outro\"").status_code == 304
+
+    # Outra rota ou outros parâmetros: outro ETag
+    ranking = client.get(f"{API}/motoristas/ranking", headers=auth_header).headers["ETag"]
+    assert ranking != etag
+    assert condicional(client, auth_header, etag, f"{API}/motoristas/ranking").status_code == 200
+
+
+def test_escrita_muda_o_etag_so_do_tenant(client, auth_header, outro_auth_header):
+    etag = client.get(VOLUME, headers=auth_header).headers["ETag"]
+    outro_etag = client.get(VOLUME, headers=outro_auth_header).headers["ETag"]
+    assert outro_etag != etag
+
+    # Escrita do outro tenant: o ETag deste segue válido
+    assert client.post(f"{API}/coletas/coletas/", headers=outro_auth_header, json=coleta("ETG1A01")).status_code == 201
+    assert condicional(client, auth_header, etag).status_code == 304
+    assert condicional(client, outro_auth_header, outro_etag).status_code == 200
+
+    assert client.post(f"{API}/coletas/coletas/", headers=auth_header, json=coleta("ETG1A02")).status_code == 201
+    atualizada = condicional(client, auth_header, etag)
+    assert atualizada.status_code == 200
+    assert atualizada.headers["ETag"] != etag
+    assert "Last-Modified" in atualizada.headers
+
+    # If-Modified-Since no instante da última escrita: não modificado
+    desde = {**auth_header, "If-Modified-Since": atualizada.headers["Last-Modified"]}
+    assert client.get(VOLUME, headers=desde).status_code == 304
+
+
+def test_token_invalido_nao_recebe_304(client):
+    response = client.get(VOLUME, headers={"Authorization": "Bearer invalido", "If-None-Match": "*"})
+    assert response.status_code == 401
@@ -0,0 +1,100 @@
+import json
+import uuid
+
+import pytest
+
+from conftest import TENANT
+
+VENENO = "VEN0M00"
+
+
+def coleta(placa: str, minuto: int = 0):
+    from models.coleta import ColetaCreate
+    return ColetaCreate.model_validate({
+        "coreid": TENANT, "posto_identificador": "33.444.555/0001-66", "posto_nome": "Posto Fila",
+        "cidade": "SOROCABA", "estado": "SP", "data_coleta": f"2021-08-01T10:{minuto:02d}:00",
+        "tipo_combustivel": "Etanol", "preco_venda": "3.89", "volume_vendido": "40.00",
+        "motorista_nome": "Motorista Fila", "motorista_cpf": "33344455566", "veiculo_placa": placa,
+        "tipo_veiculo": "Carro",
+    })
+
+
+@pytest.fixture
+def worker(monkeypatch, tmp_path, redis_client):
+    # Worker com stream, fila de mortas e WAL próprios; a thread não é iniciada (drain_once no teste)
+    from core import ingestion_queue
+    from core.config import settings
+
+    sufixo = uuid.uuid4().hex
+    monkeypatch.setattr(settings, "INGESTION_STREAM_KEY", f"teste:ingestao:{sufixo}")
+    monkeypatch.setattr(settings, "INGESTION_DEAD_LETTER_KEY", f"teste:ingestao:mortas:{sufixo}")
+    monkeypatch.setattr(settings, "INGESTION_WAL_DIR", str(tmp_path))
+    monkeypatch.setattr(settings, "INGESTION_MAX_ATTEMPTS", 2)
+
+    # Uma coleta "venenosa": passa na validação, mas a gravação sempre falha
+    ingest_coletas = ingestion_queue.ingest_coletas
+    def ingest_com_veneno(db, coletas):
+        if any(c.veiculo_placa == VENENO for c in coletas):
+            raise ValueError("coleta venenosa")
+        return ingest_coletas(db, coletas)
+    monkeypatch.setattr(ingestion_queue, "ingest_coletas", ingest_com_veneno)
+
+    fila = ingestion_queue.IngestionWorker()
+    fila.local_queue = ingestion_queue.LocalWriteAheadQueue(str(tmp_path))
+    yield fila
+    fila.local_queue.close()
+
+
+def test_veneno_no_wal_nao_trava_o_stream(worker, redis_client):
+    from core.config import settings
+
+    worker.local_queue.append(coleta(VENENO).model_dump_json())
+    worker.local_queue.append(coleta("FIL1A01").model_dump_json())
+    assert worker.enqueue(coleta("FIL1A02"))[0] == "redis"
+
+    # Primeira passada: o stream anda; no WAL a coleta válida é gravada isolada, mas só sai da
+    # fila (que confirma pela frente) junto com a venenosa
+    worker.drain_once()
+    assert worker.metrics()["processed_total"] == 2
+    assert worker.metrics()["last_error"] == "wal: coleta venenosa"
+    assert len(worker.local_queue) == 2
+    assert redis_client.xlen(settings.INGESTION_STREAM_KEY) == 0
+
+    # Segunda falha (INGESTION_MAX_ATTEMPTS): a venenosa vai para a fila de mortas e o WAL esvazia
+    worker.drain_once()
+    assert len(worker.local_queue) == 0
+    assert worker.metrics()["dead_letter_total"] == 1
+    assert worker.metrics()["last_error"] is None
+    [(_, morta)] = redis_client.xrange(settings.INGESTION_DEAD_LETTER_KEY)
+    assert json.loads(morta["payload"])["veiculo_placa"] == VENENO
+    assert morta["origem"] == "wal"
+
+
+def test_veneno_no_stream_vai_para_a_fila_de_mortas(worker, redis_client, monkeypatch):
+    from core.config import settings
+
+    # Sem espera para reivindicar as pendentes: cada passada tenta de novo
+    monkeypatch.setattr(settings, "INGESTION_CLAIM_IDLE_SECONDS", 0)
+    worker.enqueue(coleta(VENENO, minuto=1))
+    worker.enqueue(coleta("FIL1A03", minuto=1))
+
+    worker.drain_once()
+    assert worker.metrics()["processed_total"] == 1
+    assert redis_client.xlen(settings.INGESTION_STREAM_KEY) == 1  # a venenosa segue pendente
+
+    worker.drain_once()
+    assert redis_client.xlen(settings.INGESTION_STREAM_KEY) == 0
+    assert redis_client.xlen(settings.INGESTION_DEAD_LETTER_KEY) == 1
+
+
+def test_backpressure_com_o_stream_de_outros_processos(worker, redis_client, monkeypatch):
+    from core.config import settings
+    from core.ingestion_queue import IngestionQueueFull
+
+    # Mensagens enfileiradas por outros processos: o worker deste nunca rodou
+    monkeypatch.setattr(settings, "INGESTION_MAX_PENDING", 2)
+    for placa in ("OUT1A01", "OUT1A02"):
+        redis_client.xadd(settings.INGESTION_STREAM_KEY, {"payload": coleta(placa).model_dump_json()})
+
+    with pytest.raises(IngestionQueueFull):
+        worker.enqueue(coleta("FIL1A04"))
@@ -0,0 +1,52 @@
+API = "/api/v1"
+QUERY = f"{API}/dashboard/query"
+
+
+def test_lote_com_status_por_consulta(client, auth_header, redis_client, capsys):
+    redis_client.flushdb()
+    consultas = [
+        {"kpi": "volume-total-abastecimentos", "params": {}},
+        {"kpi": "percentis-preco", "params": {"tipo_combustivel": "Etanol", "estado": "sp"}},
+        {"kpi": "nao-existe", "params": {}},
+        {"kpi": "percentis-preco", "params": {"estado": "SPX"}},
+        {"kpi": "volume-total-abastecimentos", "params": {"tenant": "CORE-TESTE-002"}},
+        {"kpi": "volume-total-abastecimentos"},
+    ]
+    response = client.post(QUERY, headers=auth_header, json=consultas)
+    assert response.status_code == 200
+    resultados = response.json()
+    # A consulta repetida no lote é calculada uma vez
+    assert "6 consultas, 0 do cache, 2 calculadas" in capsys.readouterr().out
+
+    assert [r["status"] for r in resultados] == [200, 200, 404, 422, 422, 200]
+    assert [r["kpi"] for r in resultados] == [c["kpi"] for c in consultas]
+    assert resultados[2]["dados"] is None and "nao-existe" in resultados[2]["erro"]
+    assert resultados[3]["erro"][0]["loc"] == ["estado"]
+    assert resultados[4]["erro"][0]["loc"] == ["tenant"]
+
+    # Mesmo resultado do GET individual
+    individual = client.get(f"{API}/dashboard/volume-total-abastecimentos", headers=auth_header).json()
+    assert resultados[0]["dados"] == resultados[5]["dados"] == individual
+    percentis = client.get(f"{API}/dashboard/percentis-preco", headers=auth_header,
+                           params={"tipo_combustivel": "Etanol", "estado": "sp"}).json()
+    assert resultados[1]["dados"] == percentis
+
+    novamente = client.post(QUERY, headers=auth_header, json=consultas[:2]).json()
+    assert [r["cache"] for r in novamente] == [True, True]
+    assert [r["dados"] for r in novamente] == [resultados[0]["dados"], resultados[1]["dados"]]
+
+
+def test_resultados_do_tenant(client, auth_header, outro_auth_header):
+    consulta = [{"kpi": "volume-total-abastecimentos", "params": {}}]
+    meu = client.post(QUERY, headers=auth_header, json=consulta).json()[0]["dados"]
+    outro = client.post(QUERY, headers=outro_auth_header, json=consulta).json()[0]["dados"]
+    assert meu != outro
+    assert outro == client.get(f"{API}/dashboard/volume-total-abastecimentos", headers=outro_auth_header).json()
+
+
+def test_limite_de_consultas(client, auth_header):
+    from core.config import settings
+
+    consultas = [{"kpi": "volume-total-abastecimentos", "params": {}}] * (settings.DASHBOARD_QUERY_MAX_SPECS + 1)
+    assert client.post(QUERY, headers=auth_header, json=consultas).status_code == 422
+    assert client.post(QUERY, headers=auth_header, json=consultas[:-1]).status_code == 200
@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+from sqlalchemy import text
+
+from conftest import TENANT
+
+API = "/api/v1"
+COLETAS = f"{API}/coletas/coletas"
+
+# Referência: percentile_cont sobre as coletas originais do período (como antes dos histogramas)
+PERCENTIS_RECALCULADOS = """
+    SELECT tipo_combustivel_codigo,
+           percentile_cont(ARRAY[0.1, 0.5, 0.9]) WITHIN GROUP (ORDER BY preco_centavos) AS percentis
+    FROM coletas c JOIN postos p ON p.id = c.posto_id
+    WHERE c.coreid = :coreid AND upper(p.estado) = :estado AND data_coleta::date BETWEEN :inicio AND :fim
+    GROUP BY 1
+"""
+
+
+@pytest.mark.parametrize("precos", [[599], [589, 599], [549, 559, 559, 599, 629, 629, 629, 689]])
+def test_percentis_do_histograma(precos):
+    from core.rollups import histogram_percentiles
+
+    buckets = [(preco, precos.count(preco)) for preco in sorted(set(precos))]
+    esperado = [round(float(v) / 100, 2) for v in np.percentile(precos, [10, 50, 90])]
+    assert histogram_percentiles(buckets, (0.1, 0.5, 0.9)) == esperado
+
+
+def test_percentis_iguais_ao_percentile_cont(client, auth_header, redis_client):
+    from core.database import SessionLocal
+    from models.coleta import FUEL_TYPE_BY_CODE
+
+    lote = client.post(f"{COLETAS}/lote", headers=auth_header, json=[{
+        "posto_identificador": "66.777.888/0001-99", "posto_nome": "Posto Percentil", "cidade": "MACAPA",
+        "estado": "AP", "data_coleta": f"2021-10-0{dia}T08:{minuto:02d}:00", "tipo_combustivel": "Etanol",
+        "preco_venda": preco, "volume_vendido": "20.00", "motorista_nome": "Motorista Percentil",
+        "motorista_cpf": "66677788899", "veiculo_placa": "PCT1L00", "tipo_veiculo": "Carro",
+    } for dia in (1, 2) for minuto, preco in enumerate(("4.19", "4.29", "4.29", "4.49", "4.59"))])
+    assert lote.json()["inseridas"] == 10
+    redis_client.flushdb()
+
+    periodo = {"estado": "AP", "inicio": "2021-10-01", "fim": "2021-10-02"}
+    percentis = client.get(f"{API}/dashboard/percentis-preco", headers=auth_header, params={
+        "estado": "ap", "data_inicio": periodo["inicio"], "data_fim": periodo["fim"],
+    }).json()
+
+    with SessionLocal() as db:
+        esperado = {
+            FUEL_TYPE_BY_CODE[row.tipo_combustivel_codigo]: [round(p / 100, 2) for p in row.percentis]
+            for row in db.execute(text(PERCENTIS_RECALCULADOS), {"coreid": TENANT, **periodo})
+        }
+    assert "Etanol" in esperado
+    assert {p["tipo_combustivel"]: [p["p10"], p["p50"], p["p90"]] for p in percentis} == esperado
+    assert all(p["estado"] == "AP" for p in percentis)
@@ -0,0 +1,155 @@
+import itertools
+import statistics
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Optional
+import pytest
+from budget import Budget, measure, report, timed, violations
+
+# Orçamentos por endpoint sobre a massa de dados do conftest. "frio" = cache vazio (o caminho que
+# vai ao banco), "quente" = a mesma requisição logo em seguida. SQL e Redis são contagens exatas
+# do caminho atual (o SQL inclui a leitura do usuário do token); a latência é a mediana em
+# múltiplos da requisição de referência (REFERENCIA), com folga para ruído de máquina.
+#
+# Um orçamento estourado é uma regressão até prova em contrário: N+1, consulta nova, pipeline
+# desfeito, cache que deixou de responder. Se o aumento for intencional, ajuste o número aqui
+# no mesmo PR, com a justificativa na descrição.
+
+REFERENCIA = ("GET", "/api/v1/status-dados")
+REFERENCIA_AMOSTRAS = 15
+
+
+@dataclass(frozen=True)
+class PerfCase:
+    name: str
+    method: str
+    path: str
+    frio: Budget
+    quente: Optional[Budget] = None  # None: endpoint sem cache (só uma medição, sem esvaziar o Redis)
+    body: Optional[Callable[[], Any]] = None  # gerado a cada chamada (escritas com chave natural nova)
+
+
+_sequencia = itertools.count()
+
+
+def nova_coleta() -> Dict[str, Any]:
+    # Chave natural sempre nova (data distinta), fora do período da massa de dados
+    data = datetime(2020, 1, 1) + timedelta(minutes=next(_sequencia))
+    return {
+        "posto_identificador": "99.999.999/0001-99", "posto_nome": "Posto Perf", "cidade": "CAMPINAS",
+        "estado": "SP", "data_coleta": data.isoformat(), "tipo_combustivel": "Gasolina",
+        "preco_venda": "5.89", "volume_vendido": "40.00", "motorista_nome": "Motorista Perf",
+        "motorista_cpf": "55566677788", "veiculo_placa": "PRF1A23", "tipo_veiculo": "Carro",
+    }
+
+
+DASHBOARD = "/api/v1/dashboard"
+COLETAS = "/api/v1/coletas/coletas"
+MOTORISTAS = "/api/v1/motoristas"
+
+CASES = [
+    # Dashboard: os KPIs leem os agregados (cubo, histograma) e respondem do cache quando quentes
+    PerfCase("dashboard media-preco", "GET", f"{DASHBOARD}/media-preco-combustivel",
+             frio=Budget(sql=2, redis=6, latency=8), quente=Budget(sql=1, redis=2, latency=4)),
+    PerfCase("dashboard percentis", "GET", f"{DASHBOARD}/percentis-preco",
+             frio=Budget(sql=2, redis=6, latency=8), quente=Budget(sql=1, redis=2, latency=4)),
+    PerfCase("dashboard volume-por-veiculo", "GET", f"{DASHBOARD}/volume-por-veiculo",
+             frio=Budget(sql=2, redis=6, latency=8), quente=Budget(sql=1, redis=2, latency=4)),
+    PerfCase("dashboard historico", "GET", f"{DASHBOARD}/historico-preco-combustivel?tipo_combustivel=Gasolina",
+             frio=Budget(sql=2, redis=6, latency=8), quente=Budget(sql=1, redis=2, latency=4)),
+    PerfCase("dashboard cube", "GET", f"{DASHBOARD}/cube?nivel=cidade",
+             frio=Budget(sql=2, redis=6, latency=8), quente=Budget(sql=1, redis=2, latency=4)),
+    PerfCase("dashboard ranking-estado", "GET", f"{DASHBOARD}/ranking-coletas-por-estado?estado=SP",
+             frio=Budget(sql=2, redis=6, latency=8), quente=Budget(sql=1, redis=2, latency=4)),
+    PerfCase("dashboard volume-total", "GET", f"{DASHBOARD}/volume-total-abastecimentos",
+             frio=Budget(sql=2, redis=6, latency=8), quente=Budget(sql=1, redis=2, latency=4)),
+    PerfCase("dashboard maior-consumidor", "GET", f"{DASHBOARD}/maior-consumidor",
+             frio=Budget(sql=2, redis=6, latency=8), quente=Budget(sql=1, redis=2, latency=4)),
+    PerfCase("dashboard receita-total", "GET", f"{DASHBOARD}/receita-total-estimada",
+             frio=Budget(sql=2, redis=6, latency=8), quente=Budget(sql=1, redis=2, latency=4)),
+    PerfCase("dashboard query (lote)", "POST", f"{DASHBOARD}/query",
+             body=lambda: [
+                 {"kpi": "media-preco-combustivel", "params": {}},
+                 {"kpi": "volume-total-abastecimentos", "params": {}},
+                 {"kpi": "cube", "params": {"nivel": "estado"}},
+                 {"kpi": "ranking-coletas-por-estado", "params": {"estado": "RJ"}},
+             ],
+             frio=Budget(sql=5, redis=14, latency=12), quente=Budget(sql=1, redis=1, latency=4)),
+    # Coletas: listagem e detalhe têm cache próprio (core/coletas_cache.py); escritas sem cache
+    PerfCase("coletas listagem", "GET", f"{COLETAS}/?estado=SP&limit=50",
+             frio=Budget(sql=2, redis=2, latency=6), quente=Budget(sql=1, redis=1, latency=4)),
+    PerfCase("coletas detalhe", "GET", f"{COLETAS}/1",
+             frio=Budget(sql=2, redis=2, latency=4), quente=Budget(sql=1, redis=1, latency=4)),
+    PerfCase("coletas arquivo", "GET", f"{COLETAS}/arquivo?data_inicio=2019-01-01&data_fim=2019-12-31",
+             frio=Budget(sql=2, redis=0, latency=4)),
+    PerfCase("coletas criação", "POST", f"{COLETAS}/", body=nova_coleta,
+             frio=Budget(sql=5, redis=12, latency=15)),
+    PerfCase("coletas lote", "POST", f"{COLETAS}/lote", body=lambda: [nova_coleta() for _ in range(100)],
+             frio=Budget(sql=4, redis=12, latency=50)),
+    PerfCase("coletas alteração em lote (dry run)", "PATCH",
+             f"{COLETAS}/?veiculo_placa=PRF1A23&dry_run=true", body=lambda: {"preco_venda": "6.29"},
+             frio=Budget(sql=2, redis=0, latency=4)),
+    # Motoristas
+    PerfCase("motoristas historico", "GET", f"{MOTORISTAS}/historico?nome=Motorista 01",
+             frio=Budget(sql=2, redis=6, latency=15), quente=Budget(sql=1, redis=2, latency=4)),
+    PerfCase("motoristas ranking", "GET", f"{MOTORISTAS}/ranking",
+             frio=Budget(sql=2, redis=6, latency=15), quente=Budget(sql=1, redis=2, latency=4)),
+    PerfCase("motoristas search", "GET", f"{MOTORISTAS}/search?q=Motorista 01",
+             frio=Budget(sql=3, redis=2, latency=8)),
+]
+
+
+def _request(client, auth_header, case: PerfCase):
+    body = case.body() if case.body is not None else None
+    response = client.request(case.method, case.path, headers=auth_header, json=body)
+    assert response.status_code < 400, f"{case.name}: {response.status_code} {response.text[:300]}"
+    return response
+
+
+@pytest.fixture(scope="module")
+def referencia(client, auth_header, redis_client) -> float:
+    method, path = REFERENCIA
+    call = lambda: client.request(method, path, headers=auth_header)
+    call()
+    return statistics.median(timed(call, samples=REFERENCIA_AMOSTRAS))
+
+
+def _check(name: str, measurement, budget: Budget, referencia: float):
+    if violations(measurement, budget, referencia):
+        pytest.fail(report(name, measurement, budget, referencia), pytrace=False)
+
+
+@pytest.mark.parametrize("case", CASES, ids=[case.name for case in CASES])
+def test_orcamento_frio(client, auth_header, redis_client, referencia, case: PerfCase):
+    # Sempre com o Redis vazio: rotas com cache, mesmo sem orçamento "quente", medem aqui o recálculo
+    redis_client.flushdb()
+    _request(client, auth_header, case)  # o mesmo caminho uma vez fora da medição (pools, imports)
+
+    redis_client.flushdb()
+    with measure() as measurement:
+        _request(client, auth_header, case)
+    measurement.latencies = timed(lambda: _request(client, auth_header, case), before=redis_client.flushdb)
+    _check(f"{case.method} {case.path} (frio)", measurement, case.frio, referencia)
+
+
+CACHED_CASES = [case for case in CASES if case.quente is not None]
+
+
+@pytest.mark.parametrize("case", CACHED_CASES, ids=[case.name for case in CACHED_CASES])
+def test_orcamento_quente(client, auth_header, redis_client, referencia, case: PerfCase):
+    _request(client, auth_header, case)
+    with measure() as measurement:
+        _request(client, auth_header, case)
+    measurement.latencies = timed(lambda: _request(client, auth_header, case))
+    _check(f"{case.method} {case.path} (quente)", measurement, case.quente, referencia)
+
+
+def test_orcamento_revalidacao(client, auth_header, redis_client, referencia):
+    # If-None-Match com o ETag atual: 304 sem ir ao banco (nem para ler o usuário)
+    path = f"{DASHBOARD}/volume-total-abastecimentos"
+    etag = client.get(path, headers=auth_header).headers["etag"]
+    headers = {**auth_header, "If-None-Match": etag}
+    with measure() as measurement:
+        assert client.get(path, headers=headers).status_code == 304
+    measurement.latencies = timed(lambda: client.get(path, headers=headers))
+    _check(f"GET {path} (304)", measurement, Budget(sql=0, redis=1, latency=2), referencia)
@@ -0,0 +1,170 @@
+import uuid
+from datetime import datetime
+
+import pytest
+
+API = "/api/v1"
+COLETAS = f"{API}/coletas/coletas"
+QUARENTENA = f"{API}/quarentena"
+
+POSTO = "22.333.444/0001-55"
+
+
+def coleta(minuto: int, preco: str = "5.09", **campos):
+    return {
+        "posto_identificador": POSTO, "posto_nome": "Posto Quarentena", "cidade": "SANTOS", "estado": "SP",
+        "data_coleta": f"2021-10-01T{minuto // 60:02d}:{minuto % 60:02d}:00", "tipo_combustivel": "Gasolina",
+        "preco_venda": preco, "volume_vendido": "30.00", "motorista_nome": "Motorista Quarentena",
+        "motorista_cpf": "22233344455", "veiculo_placa": f"QRT1A{minuto % 100:02d}", "tipo_veiculo": "Carro",
+        **campos,
+    }
+
+
+@pytest.fixture
+def sem_estatisticas(monkeypatch, redis_client):
+    # As estatísticas de preço começam vazias: as coletas dos outros testes não entram no z-score.
+    # E terminam vazias: os preços daqui não viram anomalias nas coletas dos testes seguintes
+    from core.anomaly import PRICE_STATISTICS
+    monkeypatch.setattr(PRICE_STATISTICS, "_local", {})
+    redis_client.delete(PRICE_STATISTICS.key)
+    yield
+    redis_client.delete(PRICE_STATISTICS.key)
+
+
+@pytest.fixture
+def modo_quarentena(monkeypatch):
+    from core.anomaly import MODE_QUARANTINE
+    from core.config import settings
+    monkeypatch.setattr(settings, "ANOMALY_MODE", MODE_QUARANTINE)
+
+
+def test_preco_fora_do_padrao_e_readmitido(client, auth_header, sem_estatisticas, modo_quarentena):
+    # Histórico do posto com preços entre 5,00 e 5,20: estatística suficiente para o z-score
+    historico = [coleta(minuto, f"5.{minuto % 21:02d}") for minuto in range(25)]
+    assert client.post(f"{COLETAS}/lote", headers=auth_header, json=historico).json()["inseridas"] == 25
+
+    retida = client.post(f"{COLETAS}/", headers=auth_header, json=coleta(100, "9.99"))
+    assert retida.status_code == 422
+    quarentena_id = retida.json()["detail"]["quarentena_id"]
+
+    pendentes = client.get(f"{QUARENTENA}/", headers=auth_header, params={"posto_identificador": POSTO}).json()
+    [entrada] = [entrada for entrada in pendentes if entrada["id"] == quarentena_id]
+    assert entrada["motivo"].startswith("preco_venda fora do padrão")
+    assert entrada["coleta_id"] is None
+
+    readmitida = client.post(f"{QUARENTENA}/{quarentena_id}/readmitir", headers=auth_header).json()
+    assert readmitida["status"] == "readmitida"
+    assert datetime.fromisoformat(readmitida["resolvido_em"]) >= datetime.fromisoformat(readmitida["criado_em"])
+    coleta_gravada = client.get(f"{COLETAS}/{readmitida['coleta_id']}", headers=auth_header).json()
+    assert coleta_gravada["preco_venda"] == "9.99"
+
+    assert client.post(f"{QUARENTENA}/{quarentena_id}/readmitir", headers=auth_header).status_code == 409
+
+
+def test_volume_acima_da_capacidade_e_descartado(client, auth_header, outro_auth_header, sem_estatisticas,
+                                                 modo_quarentena):
+    retida = client.post(f"{COLETAS}/", headers=auth_header,
+                         json=coleta(200, tipo_veiculo="Moto", volume_vendido="80.00"))
+    assert retida.status_code == 422
+    quarentena_id = retida.json()["detail"]["quarentena_id"]
+
+    # Leitura de outro tenant responde 404
+    assert client.delete(f"{QUARENTENA}/{quarentena_id}", headers=outro_auth_header).status_code == 404
+
+    descartada = client.delete(f"{QUARENTENA}/{quarentena_id}", headers=auth_header).json()
+    assert descartada["status"] == "descartada"
+    assert descartada["motivo"].startswith("volume_vendido acima da capacidade")
+    assert client.delete(f"{QUARENTENA}/{quarentena_id}", headers=auth_header).status_code == 409
+
+
+def test_mediana_e_mad_da_janela(redis_client):
+    import numpy as np
+    from core.anomaly import MAD_TO_STD, RollingPriceStatistics
+
+    estatisticas = RollingPriceStatistics(key=f"teste:estatisticas:{uuid.uuid4().hex}", window=1000)
+    precos = np.round(np.random.default_rng(7).normal(5.5, 0.2, 60), 2)
+    chaves = np.array(["a"] * 60)
+    for inicio, fim in ((0, 25), (25, 40), (40, 60)):
+        estatisticas.merge(chaves[inicio:fim], precos[inicio:fim])
+    mediana = np.median(precos)
+    [(n, centro, desvio)] = estatisticas.load(["a"])
+    assert (n, centro, desvio) == pytest.approx((60, mediana, MAD_TO_STD * np.median(np.abs(precos - mediana))))
+
+    # Janela: só as últimas `window` leituras contam; uma anomalia isolada não desloca a mediana,
+    # um preço novo que se mantém passa a ser o centro depois de meia janela
+    janela = RollingPriceStatistics(key=f"teste:estatisticas:{uuid.uuid4().hex}", window=10)
+    janela.merge(np.array(["a"] * 20), np.full(20, 5.0))
+    janela.merge(np.array(["a"]), np.array([50.0]))
+    [(n, centro, desvio)] = janela.load(["a"])
+    assert (n, centro, desvio) == pytest.approx((10, 5.0, 0.0))
+    janela.merge(np.array(["a"] * 5), np.full(5, 6.0))
+    [(_, centro, _)] = janela.load(["a"])
+    assert centro == pytest.approx(6.0)
+
+
+def test_mudanca_de_preco_sustentada_deixa_de_ser_retida(client, auth_header, sem_estatisticas, modo_quarentena,
+                                                        monkeypatch):
+    from core.anomaly import PRICE_STATISTICS
+
+    monkeypatch.setattr(PRICE_STATISTICS, "window", 30)
+    historico = [coleta(400 + minuto, f"5.{minuto % 21:02d}") for minuto in range(25)]
+    assert client.post(f"{COLETAS}/lote", headers=auth_header, json=historico).json()["inseridas"] == 25
+
+    # Reajuste do posto: as primeiras leituras no preço novo ficam retidas, mas entram na janela
+    status_codes = [
+        client.post(f"{COLETAS}/", headers=auth_header, json=coleta(500 + minuto, "6.49")).status_code
+        for minuto in range(20)
+    ]
+    assert status_codes[0] == 422
+    assert 201 in status_codes
+    aceita = status_codes.index(201)
+    assert set(status_codes[:aceita]) == {422} and set(status_codes[aceita:]) == {201}
+
+
+def test_estatisticas_so_depois_do_commit(auth_header, sem_estatisticas):
+    from conftest import TENANT
+    from core.anomaly import PRICE_STATISTICS, _stat_keys
+    from core.database import SessionLocal
+    from core.ingestion import ingest_coletas
+    from models.coleta import ColetaCreate
+
+    leitura = ColetaCreate.model_validate({**coleta(600), "coreid": TENANT})
+    chaves = _stat_keys([leitura]).tolist()
+    with SessionLocal() as db:
+        ingest_coletas(db, [leitura])
+        db.rollback()
+    assert PRICE_STATISTICS.load(chaves)[0][0] == 0
+
+    with SessionLocal() as db:
+        ingest_coletas(db, [leitura])
+        db.commit()
+    assert PRICE_STATISTICS.load(chaves)[0][0] == 1
+
+
+def test_posto_novo_usa_a_estatistica_do_combustivel(sem_estatisticas):
+    from conftest import TENANT
+    from core.anomaly import score_coletas, update_statistics
+    from models.coleta import ColetaCreate
+
+    def leitura(posto: str, preco: str):
+        return ColetaCreate.model_validate({**coleta(0, preco, posto_identificador=posto), "coreid": TENANT})
+
+    update_statistics([leitura(POSTO, f"5.{i % 21:02d}") for i in range(25)])
+    novo = "22.333.444/0001-99"
+    moto = leitura(novo, "5.10").model_copy(update={"tipo_veiculo": "Moto", "volume_vendido": 80})
+    [normal, fora, volume] = score_coletas([leitura(novo, "5.10"), leitura(novo, "9.99"), moto])
+    assert normal is None
+    assert fora[0].startswith("preco_venda fora do padrão") and fora[1] > 4
+    assert volume[0].startswith("volume_vendido acima da capacidade")
+
+
+def test_modo_sinalizar_grava_e_registra(client, auth_header, sem_estatisticas):
+    from core.database import QuarentenaModel, SessionLocal
+
+    # "sinalizar" é o modo padrão
+    response = client.post(f"{COLETAS}/", headers=auth_header,
+                           json=coleta(300, tipo_veiculo="Moto", volume_vendido="80.00"))
+    assert response.status_code == 201
+    with SessionLocal() as db:
+        entrada = db.query(QuarentenaModel).filter(QuarentenaModel.coleta_id == response.json()["id"]).one()
+    assert entrada.status == "sinalizada"
@@ -0,0 +1,67 @@
+import time
+import warnings
+
+import pytest
+import redis
+
+API = "/api/v1"
+
+
+def test_circuito_abre_e_testa_uma_vez():
+    from core.redis_config import CircuitBreaker
+
+    breaker = CircuitBreaker(failure_threshold=2, reset_seconds=0.05)
+    breaker.record_failure()
+    assert breaker.state == "fechado"
+    breaker.record_failure()
+    assert breaker.state == "aberto" and not breaker.allow_request()
+
+    # Depois do reset, uma única requisição de teste passa (meio-aberto)
+    time.sleep(0.06)
+    assert breaker.state == "meio-aberto"
+    assert breaker.allow_request()
+    assert not breaker.allow_request()
+    breaker.record_success()
+    assert breaker.state == "fechado" and breaker.allow_request()
+
+
+@pytest.fixture
+def circuito(monkeypatch):
+    from core import redis_config
+    breaker = redis_config.CircuitBreaker(failure_threshold=1, reset_seconds=60)
+    monkeypatch.setattr(redis_config, "REDIS_BREAKER", breaker)
+    return breaker
+
+
+def test_falha_do_redis_vira_o_valor_padrao(app, circuito):
+    from core.redis_config import run_redis_command
+
+    def fora_do_ar(r):
+        raise redis.exceptions.ConnectionError("Connection refused")
+    assert run_redis_command(fora_do_ar, default="padrao") == "padrao"
+    assert circuito.state == "aberto"
+
+    # Circuito aberto: o comando nem é tentado
+    chamadas = []
+    assert run_redis_command(lambda r: chamadas.append(r), default="padrao") == "padrao"
+    assert chamadas == []
+
+
+def test_api_sem_redis(client, auth_header, circuito):
+    circuito.record_failure()
+    response = client.get(f"{API}/dashboard/volume-total-abastecimentos", headers=auth_header)
+    assert response.status_code == 200
+    assert float(response.json()["volume_total"]) > 0
+
+
+def test_cache_gravado_sem_comandos_obsoletos(redis_client):
+    from core.cache_utils import STALE_PREFIX, store_cached
+
+    # SETEX é obsoleto no redis-py; como erro, a gravação falharia (o circuito engole) e a chave não existiria
+    with warnings.catch_warnings():
+        warnings.simplefilter("error", DeprecationWarning)
+        store_cached("teste:gravacao", b"1", ttl=60, index_keys=["teste:gravacao:indice"], stale_ttl=120)
+    assert 0 < redis_client.ttl("teste:gravacao") <= 60
+    assert 60 < redis_client.ttl(f"{STALE_PREFIX}teste:gravacao") <= 120
+    assert redis_client.smembers("teste:gravacao:indice") == {"teste:gravacao"}
+    redis_client.delete("teste:gravacao", f"{STALE_PREFIX}teste:gravacao", "teste:gravacao:indice")
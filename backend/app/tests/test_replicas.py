@@ -0,0 +1,100 @@
+import pytest
+from sqlalchemy import create_engine, event, text
+
+from conftest import TENANT
+
+API = "/api/v1"
+
+
+@pytest.fixture
+def replica_fora_do_ar(monkeypatch, redis_client):
+    # Toda leitura vai à "réplica", que não responde: o que for lido dela falha. O tenant já escreveu,
+    # então antes de preencher o cache a posição da réplica é conferida, falha, e o primário responde
+    from core import replicas
+    from core.config import settings
+    from core.database import _session_factory
+
+    engine = create_engine(
+        f"postgresql+psycopg2://{settings.DB_USER}:{settings.DB_PASSWORD}@{settings.DB_HOST}:{settings.DB_PORT}"
+        "/replica_inexistente",
+        connect_args={"connect_timeout": 3},
+    )
+    monkeypatch.setattr(replicas.REPLICA_MONITOR, "pick", lambda: "replica-1")
+    monkeypatch.setattr(replicas, "_wrote_recently", lambda request: False)
+    monkeypatch.setattr(replicas, "ReplicaSessionLocal", lambda name: _session_factory(bind=engine))
+    redis_client.flushdb()
+    redis_client.zadd(replicas.WRITE_POSITION_KEY, {TENANT: 1})
+    yield
+    engine.dispose()
+
+
+@pytest.fixture
+def replica_local(monkeypatch, redis_client):
+    # "Réplica" que é o próprio banco de teste, por outra engine: as consultas feitas nela são contadas
+    from core import replicas
+    from core.database import _session_factory, get_engine
+
+    engine = create_engine(get_engine().url)
+    consultas = []
+    event.listen(engine, "before_cursor_execute", lambda conn, cursor, statement, *args: consultas.append(statement))
+    monkeypatch.setattr(replicas, "REPLICA_URLS", ["replica-1"])
+    monkeypatch.setattr(replicas.REPLICA_MONITOR, "pick", lambda: "replica-1")
+    monkeypatch.setattr(replicas, "_wrote_recently", lambda request: False)
+    monkeypatch.setattr(replicas, "ReplicaSessionLocal", lambda name: _session_factory(bind=engine))
+    redis_client.flushdb()
+    yield consultas
+    engine.dispose()
+
+
+@pytest.mark.parametrize("path", [
+    f"{API}/dashboard/volume-total-abastecimentos",
+    f"{API}/motoristas/ranking",
+    f"{API}/coletas/coletas/?limit=5",
+])
+def test_cache_preenchido_pelo_primario(client, auth_header, redis_client, replica_fora_do_ar, path):
+    response = client.get(path, headers=auth_header)
+    assert response.status_code == 200
+    assert redis_client.dbsize() > 0
+
+
+def test_consulta_em_lote_pelo_primario(client, auth_header, replica_fora_do_ar):
+    response = client.post(f"{API}/dashboard/query", headers=auth_header, json=[
+        {"kpi": "volume-total-abastecimentos", "params": {}},
+    ])
+    assert [resultado["status"] for resultado in response.json()] == [200]
+
+
+def coleta(minuto: int):
+    return {
+        "posto_identificador": "77.888.999/0001-00", "posto_nome": "Posto Replica", "cidade": "MACAPA",
+        "estado": "AP", "data_coleta": f"2021-11-01T10:{minuto:02d}:00", "tipo_combustivel": "Gasolina",
+        "preco_venda": "6.19", "volume_vendido": "30.00", "motorista_nome": "Motorista Replica",
+        "motorista_cpf": "77788899900", "veiculo_placa": "RPL1E00", "tipo_veiculo": "Carro",
+    }
+
+
+KPI = f"{API}/dashboard/volume-total-abastecimentos"
+
+
+def test_replica_em_dia_preenche_o_cache(client, auth_header, redis_client, replica_local):
+    from core.replicas import WRITE_POSITION_KEY
+
+    # A escrita registra a posição do WAL do tenant; a réplica (o próprio banco) já passou dela
+    assert client.post(f"{API}/coletas/coletas/", headers=auth_header, json=coleta(0)).status_code == 201
+    assert redis_client.zscore(WRITE_POSITION_KEY, TENANT) > 0
+
+    assert client.get(KPI, headers=auth_header).status_code == 200
+    assert any("kpi_cubo" in consulta for consulta in replica_local)
+
+
+def test_replica_atrasada_preenche_pelo_primario(client, auth_header, redis_client, replica_local, monkeypatch):
+    from core import replicas
+
+    # Réplica parada antes da escrita do tenant: ela só responde a posição, o KPI vem do primário
+    monkeypatch.setattr(replicas, "REPLAY_POSITION_SQL", text("SELECT 0"))
+    assert client.post(f"{API}/coletas/coletas/", headers=auth_header, json=coleta(1)).status_code == 201
+    assert client.get(KPI, headers=auth_header).status_code == 200
+    assert client.post(f"{API}/dashboard/query", headers=auth_header, json=[
+        {"kpi": "receita-total-estimada", "params": {}},
+    ]).json()[0]["status"] == 200
+    assert replica_local and not any("kpi_cubo" in consulta for consulta in replica_local)
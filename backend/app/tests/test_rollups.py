@@ -0,0 +1,81 @@
+from sqlalchemy import text
+
+from conftest import TENANT
+
+API = "/api/v1"
+COLETAS = f"{API}/coletas/coletas"
+
+# O cubo mantido pelas dobras deve ser igual ao recalculado do zero a partir de coletas. Os dias antes
+# do último corte do arquivamento (core/archive.py) ficam de fora: as coletas deles já saíram da tabela.
+# Cidade e estado são os do posto
+DESDE_O_CORTE = "(SELECT coalesce(max(corte), '-infinity') FROM coletas_arquivo)"
+CUBO_RECALCULADO = f"""
+    SELECT upper(p.estado), p.cidade, c.posto_id, tipo_combustivel_codigo, tipo_veiculo_codigo, data_coleta::date,
+           count(*), sum(volume_centilitros), sum(preco_centavos), sum(preco_centavos::bigint * volume_centilitros)
+    FROM coletas c JOIN postos p ON p.id = c.posto_id
+    WHERE c.coreid = :coreid AND data_coleta >= {DESDE_O_CORTE}
+    GROUP BY 1, 2, 3, 4, 5, 6
+"""
+CUBO_MANTIDO = f"""
+    SELECT estado, cidade, posto_id, tipo_combustivel_codigo, tipo_veiculo_codigo, dia,
+           quantidade, volume_centilitros, soma_preco_centavos, receita_centesimos_centavo
+    FROM kpi_cubo WHERE coreid = :coreid AND dia >= {DESDE_O_CORTE}
+"""
+HISTOGRAMA_RECALCULADO = f"""
+    SELECT tipo_combustivel_codigo, upper(p.estado), data_coleta::date, preco_centavos, count(*)
+    FROM coletas c JOIN postos p ON p.id = c.posto_id
+    WHERE c.coreid = :coreid AND data_coleta >= {DESDE_O_CORTE} GROUP BY 1, 2, 3, 4
+"""
+HISTOGRAMA_MANTIDO = f"""
+    SELECT tipo_combustivel_codigo, estado, dia, preco_centavos, quantidade
+    FROM preco_histograma WHERE coreid = :coreid AND dia >= {DESDE_O_CORTE}
+"""
+
+PLACA = "ROL1E23"
+
+
+def coleta(dia: str, preco: str):
+    return {
+        "posto_identificador": "55.666.777/0001-88", "posto_nome": "Posto Rollup", "cidade": "SANTOS",
+        "estado": "sp", "data_coleta": f"2021-07-{dia}T09:00:00", "tipo_combustivel": "Gasolina",
+        "preco_venda": preco, "volume_vendido": "30.00", "motorista_nome": "Motorista Rollup",
+        "motorista_cpf": "55566677788", "veiculo_placa": PLACA, "tipo_veiculo": "Carro",
+    }
+
+
+def agregados(consulta: str):
+    from core.database import SessionLocal
+    with SessionLocal() as db:
+        return sorted(tuple(row) for row in db.execute(text(consulta), {"coreid": TENANT}))
+
+
+def test_dobras_igual_ao_recalculo(client, auth_header):
+    lote = client.post(f"{COLETAS}/lote", headers=auth_header,
+                       json=[coleta(dia, "5.99") for dia in ("01", "02", "03")])
+    assert lote.json()["inseridas"] == 3
+
+    # Alteração e exclusão retiram (-1) e devolvem (+1) as contribuições; as células que zeram somem
+    alteracao = client.patch(f"{COLETAS}/", headers=auth_header, params={"veiculo_placa": PLACA},
+                             json={"preco_venda": "6.09"})
+    assert alteracao.json()["afetadas"] == 3
+    exclusao = client.delete(f"{COLETAS}/", headers=auth_header, params={
+        "veiculo_placa": PLACA, "data_inicio": "2021-07-03T00:00:00", "data_fim": "2021-07-03T23:59:59",
+    })
+    assert exclusao.json()["afetadas"] == 1
+
+    assert agregados(CUBO_MANTIDO) == agregados(CUBO_RECALCULADO)
+    assert agregados(HISTOGRAMA_MANTIDO) == agregados(HISTOGRAMA_RECALCULADO)
+
+
+def test_filtros_do_cubo_sao_literais(client, auth_header):
+    cubo = f"{API}/dashboard/cube"
+    cidade = client.get(cubo, headers=auth_header, params={"nivel": "cidade", "cidade": "sao paulo"}).json()
+    assert cidade and {linha["cidade"] for linha in cidade} == {"SAO PAULO"}
+    # % e _ não são curingas: nenhuma cidade se chama assim
+    for termo in ("%", "SAO_PAULO", "S%"):
+        assert client.get(cubo, headers=auth_header, params={"nivel": "cidade", "cidade": termo}).json() == []
+
+    ranking = f"{API}/dashboard/ranking-coletas-por-estado"
+    estados = client.get(ranking, headers=auth_header, params={"estado": "sp"}).json()
+    assert estados and {linha["estado"].upper() for linha in estados} == {"SP"}
+    assert client.get(ranking, headers=auth_header, params={"estado": "S_"}).json() == []
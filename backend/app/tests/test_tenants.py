@@ -0,0 +1,89 @@
+from conftest import OUTRO_TENANT, TENANT
+
+API = "/api/v1"
+COLETAS = f"{API}/coletas/coletas"
+
+# Mesmo posto, motorista e placa enviados pelos dois tenants, cada um com os próprios nomes
+POSTO = "77.777.777/0001-77"
+CPF = "77788899900"
+PLACA = "TNT7A77"
+
+
+def coleta_compartilhada(posto_nome: str, motorista_nome: str, data: str):
+    return {
+        "posto_identificador": POSTO, "posto_nome": posto_nome, "cidade": "RIO BRANCO", "estado": "AC",
+        "data_coleta": data, "tipo_combustivel": "Gasolina", "preco_venda": "6.19", "volume_vendido": "35.00",
+        "motorista_nome": motorista_nome, "motorista_cpf": CPF, "veiculo_placa": PLACA, "tipo_veiculo": "Carro",
+    }
+
+
+def test_dimensoes_por_tenant(client, auth_header, outro_auth_header):
+    # O segundo tenant envia depois: antes da migração 0007 o upsert renomeava o posto do primeiro
+    primeira = client.post(f"{COLETAS}/", headers=auth_header,
+                           json=coleta_compartilhada("Posto Alfa", "Motorista Alfa", "2021-05-01T10:00:00"))
+    segunda = client.post(f"{COLETAS}/", headers=outro_auth_header,
+                          json=coleta_compartilhada("Posto Beta", "Motorista Beta", "2021-05-01T11:00:00"))
+    assert primeira.status_code == segunda.status_code == 201
+
+    cubo = client.get(f"{API}/dashboard/cube", headers=auth_header, params={"nivel": "posto", "estado": "AC"}).json()
+    assert [(celula["posto_identificador"], celula["posto_nome"]) for celula in cubo] == [(POSTO, "Posto Alfa")]
+
+    ranking = client.get(f"{API}/dashboard/ranking-coletas-por-estado", headers=auth_header, params={"estado": "AC"}).json()
+    assert [posto["posto_nome"] for posto in ranking] == ["Posto Alfa"]
+
+    busca = client.get(f"{API}/motoristas/search", headers=auth_header, params={"q": "Motorista Beta"}).json()
+    assert busca["motoristas"] == []
+    busca = client.get(f"{API}/motoristas/search", headers=auth_header, params={"q": "Motorista Alfa"}).json()
+    assert [motorista["motorista_nome"] for motorista in busca["motoristas"]] == ["Motorista Alfa"]
+
+    from core.database import PostoModel, SessionLocal
+    with SessionLocal() as db:
+        postos = db.query(PostoModel.coreid, PostoModel.nome).filter(PostoModel.identificador == POSTO).all()
+    assert sorted(postos) == [(TENANT, "Posto Alfa"), (OUTRO_TENANT, "Posto Beta")]
+
+
+def test_estatisticas_de_preco_por_tenant(client, auth_header, outro_auth_header, monkeypatch):
+    # O outro tenant pratica um preço bem acima neste posto: o preço normal do primeiro não é anomalia
+    from core.anomaly import MODE_QUARANTINE
+    from core.config import settings
+    monkeypatch.setattr(settings, "ANOMALY_MODE", MODE_QUARANTINE)
+
+    def coleta(preco: str, minuto: int):
+        return {
+            **coleta_compartilhada("Posto Alfa", "Motorista Alfa", f"2021-06-01T10:{minuto:02d}:00"),
+            "tipo_combustivel": "Diesel S10", "preco_venda": preco,
+        }
+
+    lote = client.post(f"{COLETAS}/lote", headers=outro_auth_header, json=[coleta("12.00", minuto) for minuto in range(30)])
+    assert lote.json()["inseridas"] == 30
+
+    response = client.post(f"{COLETAS}/", headers=auth_header, json=coleta("6.10", 0))
+    assert response.status_code == 201, response.text
+
+
+def test_escritas_e_caches_por_tenant(client, auth_header, outro_auth_header, redis_client):
+    from core.cache_utils import TENANT_KWARG, build_cache_key
+
+    def coleta(minuto: int):
+        return coleta_compartilhada("Posto Alfa", "Motorista Alfa", f"2021-05-02T10:{minuto:02d}:00")
+
+    minha = client.post(f"{COLETAS}/", headers=auth_header, json=coleta(0)).json()["id"]
+    client.post(f"{COLETAS}/", headers=outro_auth_header, json=coleta(0))
+
+    # A coleta de um tenant não existe para o outro, nem na listagem nem por id
+    assert minha not in [c["id"] for c in client.get(f"{COLETAS}/", headers=outro_auth_header, params={"limit": 1000}).json()]
+    assert client.put(f"{COLETAS}/{minha}", headers=outro_auth_header, json={"preco_venda": "1.00"}).status_code == 404
+    assert client.delete(f"{COLETAS}/{minha}", headers=outro_auth_header).status_code == 404
+
+    # Alteração em lote pela mesma placa: só as coletas do próprio tenant
+    filtro = {"veiculo_placa": PLACA, "data_inicio": "2021-05-02T00:00:00", "data_fim": "2021-05-02T23:59:59"}
+    alteracao = client.patch(f"{COLETAS}/", headers=outro_auth_header, params=filtro, json={"preco_venda": "6.29"})
+    assert alteracao.json()["afetadas"] == 1
+    assert client.get(f"{COLETAS}/{minha}", headers=auth_header).json()["preco_venda"] == "6.19"
+
+    # A escrita do outro tenant não invalida os KPIs em cache deste
+    redis_client.flushdb()
+    volume = client.get(f"{API}/dashboard/volume-total-abastecimentos", headers=auth_header).json()
+    client.post(f"{COLETAS}/", headers=outro_auth_header, json=coleta(1))
+    assert redis_client.exists(build_cache_key("kpi_volume_total", {TENANT_KWARG: TENANT}))
+    assert client.get(f"{API}/dashboard/volume-total-abastecimentos", headers=outro_auth_header).json() != volume
@@ -60,6 +60,12 @@ export interface DataStatus {
   friendly_status: string; // O campo que você quer exibir
 }
 
+// Evento SSE enviado pelo backend quando os dados de coletas mudam
+export interface DataChangeEvent {
+  eventos?: number;
+  last_update_timestamp: number | null;
+}
+
 export interface FuelAveragePrice {
   tipo_combustivel: 'Gasolina' | 'Etanol' | 'Diesel S10';
   media_preco: number;
@@ -1,4 +1,4 @@
-import { Component, OnInit, inject } from '@angular/core';
+import { Component, OnDestroy, OnInit, inject } from '@angular/core';
 import { CommonModule } from '@angular/common';
 import { FormsModule } from '@angular/forms';
 import { AuthService } from '../../services/auth.service';
@@ -11,6 +11,7 @@ import {
   debounceTime,
   distinctUntilChanged,
   startWith,
+  Subscription,
 } from 'rxjs';
 
 import {
@@ -41,7 +42,7 @@ import { ChartInputData, PieChartInputData } from '../../interfaces/auth.interfa
   ],
   templateUrl: './dashboard.html',
 })
-export class Dashboard implements OnInit {
+export class Dashboard implements OnInit, OnDestroy {
   private dashboardService = inject(DashboardService);
   private authService = inject(AuthService);
 
@@ -72,6 +73,7 @@ export class Dashboard implements OnInit {
   searchTerm: string = '';
   historicalRecords$!: Observable<HistoricalRecord[]>;
   isTableLoading: boolean = true;
+  private dataChangesSubscription?: Subscription;
 
   onLogout(): void {
     this.authService.logout();
@@ -81,6 +83,19 @@ export class Dashboard implements OnInit {
     this.loadAllDashboardData();
     this.setupHistoricalDataStream();
     this.loadDataStatus();
+    this.listenForDataChanges();
+  }
+
+  ngOnDestroy(): void {
+    this.dataChangesSubscription?.unsubscribe();
+  }
+
+  // Recarrega os KPIs apenas quando o backend avisa que os dados mudaram
+  listenForDataChanges(): void {
+    this.dataChangesSubscription = this.dashboardService.dataChanges().subscribe(() => {
+      this.loadAllDashboardData();
+      this.loadDataStatus();
+    });
   }
   loadAllDashboardData(): void {
     this.loadHistoricalData();
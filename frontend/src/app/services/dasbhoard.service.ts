@@ -1,8 +1,10 @@
 import { Injectable, inject } from '@angular/core';
 import { HttpClient, HttpParams, HttpErrorResponse } from '@angular/common/http';
-import { Observable, BehaviorSubject, tap, catchError, of, map } from 'rxjs';
+import { Observable, BehaviorSubject, tap, catchError, of, map, EMPTY } from 'rxjs';
+import { AuthService } from './auth.service';
 import {
   ConsumptionDistribution,
+  DataChangeEvent,
   DataStatus,
   FuelAveragePrice,
   HistoricalRecord,
@@ -18,6 +20,7 @@ import {
 export class DashboardService {
   private readonly apiUrl = 'http://localhost:8000/api/v1';
   private http = inject(HttpClient);
+  private authService = inject(AuthService);
   private recordsSubject = new BehaviorSubject<HistoricalRecord[]>([]);
   public records$: Observable<HistoricalRecord[]> = this.recordsSubject.asObservable();
 
@@ -28,6 +31,38 @@ export class DashboardService {
     return this.http.get<DataStatus>(url);
   }
 
+  // Notificações de mudança via SSE: o dashboard só recarrega quando os dados mudam (sem polling).
+  // O EventSource reconecta sozinho; no "conectado" de uma reconexão, compara o timestamp para
+  // não perder mudanças que aconteceram enquanto a conexão estava caída.
+  dataChanges(): Observable<DataChangeEvent> {
+    const token = this.authService.getToken();
+    if (!token || typeof EventSource === 'undefined') {
+      return EMPTY;
+    }
+
+    return new Observable<DataChangeEvent>((subscriber) => {
+      const url = `${this.apiUrl}/eventos?token=${encodeURIComponent(token)}`;
+      const source = new EventSource(url);
+      let lastSeen: number | null | undefined = undefined;
+
+      source.addEventListener('conectado', (message: MessageEvent) => {
+        const event: DataChangeEvent = JSON.parse(message.data);
+        if (lastSeen !== undefined && event.last_update_timestamp !== lastSeen) {
+          subscriber.next(event);
+        }
+        lastSeen = event.last_update_timestamp;
+      });
+
+      source.addEventListener('dados_atualizados', (message: MessageEvent) => {
+        const event: DataChangeEvent = JSON.parse(message.data);
+        lastSeen = event.last_update_timestamp;
+        subscriber.next(event);
+      });
+
+      return () => source.close();
+    });
+  }
+
   private buildFilterParams(fuel: string, state: string, vehicle: string): HttpParams {
     let params = new HttpParams();
 
@@ -170,4 +205,5 @@ export type {
   TotalRevenue,
   RawPriceEvolutionData,
   DataStatus,
+  DataChangeEvent,
 };